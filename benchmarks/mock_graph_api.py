@@ -0,0 +1,456 @@
+"""
+Local stand-in for the Graph API endpoints used by `graph_etl.py`, for offline benchmarks.
+
+Serves page insights, the page feed (with inline post insights), post insights, the
+Instagram business account and media, ads lists, account-level and per-entity ads
+insights, async report runs and batch requests. Data is generated on the fly, so large
+scales (tens of thousands of posts or ads) cost no memory. Metric values are derived from
+the seed and what they describe, so repeated runs see the same data unless `--drift-rate`
+changes some of them. Latency, page sizes, usage headers, error-17 throttling, 5xx errors
+and slow outliers are configurable.
+
+Run standalone with:
+    python benchmarks/mock_graph_api.py --port 8000 --posts 10000 --ads 50000
+and point the ETL at it with GRAPH_API_URL_BASE=http://127.0.0.1:8000/v22.0/
+"""
+import argparse
+import json
+import random
+import zlib
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+PAGE_ID = "1000"
+IG_ACCOUNT_ID = "1700"
+AD_ACCOUNT_ID = "2000"
+
+# First id of every kind of generated ads entity
+ENTITY_ID_BASES = {"campaigns": 3000000, "adsets": 4000000, "ads": 5000000}
+MEDIA_ID_BASE = 18000000  # First id of the generated Instagram media
+LEVEL_CATEGORIES = {"campaign": "campaigns", "adset": "adsets", "ad": "ads"}
+
+# Usage headers report the share of this window's request budget already spent
+USAGE_WINDOW_SECONDS = 60
+
+
+class MockSettings:
+    """Scale and behaviour of the mock API."""
+
+    def __init__(self, posts_per_interval=1000, media=1000, ads=5000, page_size=25, latency_ms=0.0,
+                 jitter_ms=0.0, usage_capacity=0, error17_rate=0.0, regain_minutes=0, error5xx_rate=0.0,
+                 slow_rate=0.0, slow_ms=0.0, max_limit=0, item_latency_ms=0.0, drift_rate=0.0, seed=0):
+        self.posts_per_interval = posts_per_interval
+        self.media = media
+        self.entity_counts = {
+            "campaigns": max(1, ads // 100),
+            "adsets": max(1, ads // 10),
+            "ads": ads
+        }
+        self.page_size = page_size  # Used when a request has no `limit`
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.usage_capacity = usage_capacity  # Requests per USAGE_WINDOW_SECONDS; 0 = no usage headers
+        self.error17_rate = error17_rate  # Share of requests answered with error 17
+        self.regain_minutes = regain_minutes  # estimated_time_to_regain_access reported when throttled
+        self.error5xx_rate = error5xx_rate  # Share of requests answered with a transient 500
+        self.slow_rate = slow_rate  # Share of requests delayed by another `slow_ms` (tail latency)
+        self.slow = slow_ms / 1000
+        self.max_limit = max_limit  # Larger `limit`s are rejected with "reduce the amount of data"; 0 = no maximum
+        self.item_latency = item_latency_ms / 1000  # Added latency per item of a page, so large pages are slower
+        self.drift_rate = drift_rate  # Share of metric values that differ from what an earlier run saw
+        self.seed = seed
+        self.random = random.Random(seed)
+
+
+class MockGraphAPI:
+    """Routes Graph API requests to generated responses and keeps request statistics."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.stats = {"http_requests": 0, "batch_requests": 0, "sub_requests": 0, "throttled": 0, "errors_5xx": 0,
+                      "bytes_out": 0}
+        self.reports = {}
+        self._recent = deque()  # Request timestamps within the usage window
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, params, base_url):
+        """
+        Answer one request.
+
+        Args:
+            method (str): "GET" or "POST".
+            path (str): URL path, e.g. "/v22.0/1000/insights".
+            params (dict): Query parameters or form fields.
+            base_url (str): Scheme and host, used to build `paging.next` links.
+
+        Returns:
+            tuple[int, dict | list, dict]: Status code, body and extra headers.
+        """
+        segments = [segment for segment in path.split("/") if segment]
+        version = segments.pop(0) if segments and segments[0].startswith("v") else "v22.0"
+
+        with self._lock:
+            self.stats["http_requests"] += 1
+            usage = self._usage()
+            throttled = self.settings.random.random() < self.settings.error17_rate or usage >= 100
+            if throttled:
+                self.stats["throttled"] += 1
+            failed = self.settings.random.random() < self.settings.error5xx_rate
+            if failed:
+                self.stats["errors_5xx"] += 1
+        headers = self._usage_headers(usage, segments)
+
+        if failed and segments[:2] != ["oauth", "access_token"]:
+            return 500, {"error": {"message": "An unexpected error has occurred. Please retry your request later.",
+                                   "type": "OAuthException", "is_transient": True, "code": 2}}, headers
+
+        if throttled and segments[:2] != ["oauth", "access_token"]:
+            return 400, self._error17(), headers
+
+        if self.settings.max_limit and int(params.get("limit") or 0) > self.settings.max_limit:
+            return 500, {"error": {"message": "Please reduce the amount of data you're asking for, then retry your request",
+                                   "type": "OAuthException", "code": 1}}, headers
+
+        if method == "POST" and not segments:
+            return 200, self._batch(params, f"{base_url}/{version}"), headers
+
+        status, body = self.route(method, segments, params, f"{base_url}/{version}")
+        return status, body, headers
+
+    def route(self, method, segments, params, api_base):
+        """Return the status and body of a (sub-)request."""
+        if segments == ["oauth", "access_token"]:
+            return 200, {"access_token": "mock-long-lived-token", "token_type": "bearer", "expires_in": 5184000}
+        if segments == ["debug_token"]:
+            return 200, {"data": {"is_valid": True, "expires_at": int(time.time()) + 5184000}}
+
+        if segments == [PAGE_ID]:
+            return 200, {"id": PAGE_ID, "instagram_business_account": {"id": IG_ACCOUNT_ID}}
+        if segments == [PAGE_ID, "insights"]:
+            return self._page_insights(params)
+        if segments == [PAGE_ID, "feed"]:
+            return 200, self._paginate(segments, params, self.settings.posts_per_interval, self._post, api_base)
+        if segments == [IG_ACCOUNT_ID, "media"]:
+            return 200, self._paginate(segments, params, self.settings.media, self._media, api_base)
+
+        if len(segments) == 2 and segments[0] == f"act_{AD_ACCOUNT_ID}":
+            if segments[1] in ENTITY_ID_BASES:
+                category = segments[1]
+                return 200, self._paginate(
+                    segments, params, self.settings.entity_counts[category],
+                    # Requested fields first and `id` last, like the API (and not in sorted order)
+                    lambda index, _: {"name": f"{category} {index}", "status": "ACTIVE",
+                                      "id": str(ENTITY_ID_BASES[category] + index)},
+                    api_base)
+            if segments[1] == "insights" and method == "POST":
+                return 200, {"report_run_id": self._create_report(params)}
+            if segments[1] == "insights":
+                return 200, self._account_insights(segments, params, api_base)
+
+        if len(segments) == 1 and segments[0] in self.reports:
+            return 200, {"id": segments[0], "async_status": "Job Completed", "async_percent_completion": 100}
+        if len(segments) == 2 and segments[0] in self.reports and segments[1] == "insights":
+            return 200, self._account_insights(segments, {**self.reports[segments[0]], **params}, api_base)
+
+        if len(segments) == 2 and segments[1] == "insights":
+            if "_" in segments[0]:
+                return 200, {"data": self._metrics(params.get("metric", ""), 1, entity_id=segments[0])}
+            if segments[0].isdigit() and min(ENTITY_ID_BASES.values()) <= int(segments[0]) < MEDIA_ID_BASE:
+                return 200, {"data": [self._insights_row(params, "id", segments[0])]}
+            return 200, {"data": self._metrics(params.get("metric", ""), 1, entity_id=segments[0])}
+
+        return 404, {"error": {"message": f"Unknown path /{'/'.join(segments)}", "type": "GraphMethodException",
+                               "code": 100}}
+
+    def _batch(self, params, api_base):
+        """Answer every sub-request of a batch POST."""
+        batch = json.loads(params.get("batch", "[]"))
+        with self._lock:
+            self.stats["batch_requests"] += 1
+            self.stats["sub_requests"] += len(batch)
+
+        results = []
+        for sub_request in batch:
+            if self.settings.random.random() < self.settings.error17_rate:
+                with self._lock:
+                    self.stats["throttled"] += 1
+                results.append({"code": 400, "body": json.dumps(self._error17())})
+                continue
+            parts = urlsplit(sub_request["relative_url"])
+            segments = [segment for segment in parts.path.split("/") if segment]
+            status, body = self.route(sub_request.get("method", "GET"), segments,
+                                      dict(parse_qsl(parts.query)), api_base)
+            results.append({"code": status, "body": json.dumps(body)})
+        return results
+
+    def _paginate(self, segments, params, total, make_item, api_base):
+        """Return one page of `total` generated items, with an `after` cursor to the next page."""
+        limit = int(params.get("limit") or self.settings.page_size)
+        offset = int(params.get("after") or 0)
+        data = [make_item(index, params) for index in range(offset, min(offset + limit, total))]
+
+        body = {"data": data}
+        if offset + limit < total:
+            next_params = {key: value for key, value in params.items() if key != "after"}
+            next_params["after"] = str(offset + limit)
+            body["paging"] = {
+                "cursors": {"before": str(offset), "after": str(offset + limit)},
+                "next": f"{api_base}/{'/'.join(segments)}?{urlencode(next_params)}"
+            }
+        return body
+
+    def _post(self, index, params):
+        """Generate one feed post, with inline insights when they were requested."""
+        since = params.get("since", "2025-01-01")
+        post = {
+            "id": f"{PAGE_ID}_{since.replace('-', '')}{index:06d}",
+            "message": f"Post {index}",
+            "created_time": f"{since}T12:00:00+0000"
+        }
+        fields = params.get("fields", "")
+        if "insights.metric(" in fields:
+            metrics = fields.split("insights.metric(", 1)[1].split(")", 1)[0]
+            post["insights"] = {"data": self._metrics(metrics, 1, entity_id=post["id"])}
+        return post
+
+    def _media(self, index, params):
+        """Generate one Instagram media object."""
+        return {
+            "id": str(MEDIA_ID_BASE + index),
+            "caption": f"Media {index}",
+            "media_type": "VIDEO" if index % 4 == 0 else "IMAGE",
+            "media_product_type": "REELS" if index % 4 == 0 else "FEED",
+            "timestamp": "2025-01-01T12:00:00+0000"
+        }
+
+    def _page_insights(self, params):
+        """Generate daily page metrics for the requested range, rejecting ranges over 93 days like the API."""
+        try:
+            since = datetime.strptime(params["since"], "%Y-%m-%d")
+            days = (datetime.strptime(params["until"], "%Y-%m-%d") - since).days
+        except (KeyError, ValueError):
+            since, days = datetime(2024, 12, 31), 30
+        if days > 93:
+            return 400, {"error": {"message": "(#100) There cannot be more than 93 days (8035200 s) between since "
+                                              "and until", "type": "OAuthException", "code": 100}}
+        return 200, {"data": self._metrics(params.get("metric", ""), max(1, days), since + timedelta(days=1))}
+
+    def _metrics(self, metrics, days, start=datetime(2025, 1, 1), entity_id=PAGE_ID):
+        """Generate insights entries of an entity for a comma-separated list of metrics."""
+        return [
+            {
+                "name": metric,
+                "period": "day" if days > 1 else "lifetime",
+                "values": [
+                    {"value": int(self._value(entity_id, metric, start + timedelta(days=day)) * 1001),
+                     "end_time": (start + timedelta(days=day)).strftime("%Y-%m-%dT08:00:00+0000")}
+                    for day in range(days)
+                ],
+                "id": f"{PAGE_ID}/insights/{metric}/day"
+            }
+            for metric in metrics.split(",") if metric
+        ]
+
+    def _account_insights(self, segments, params, api_base):
+        """Return one page of account-level insights rows, one per entity of the requested level."""
+        level = params.get("level", "campaign")
+        category = LEVEL_CATEGORIES.get(level, "campaigns")
+        return self._paginate(
+            segments, params, self.settings.entity_counts[category],
+            lambda index, page_params: self._insights_row(
+                page_params, f"{level}_id", str(ENTITY_ID_BASES[category] + index)),
+            api_base)
+
+    def _insights_row(self, params, id_field, entity_id):
+        """Generate one insights row."""
+        try:
+            time_range = json.loads(params.get("time_range", "{}"))
+        except ValueError:
+            time_range = {}
+        def value(field, scale):
+            return self._value(entity_id, field, time_range.get("since"), time_range.get("until")) * scale
+
+        return {
+            id_field: entity_id,
+            "spend": f"{value('spend', 500):.2f}",
+            "clicks": str(int(value("clicks", 1001))),
+            "impressions": str(int(value("impressions", 100001))),
+            "reach": str(int(value("reach", 50001))),
+            "ctr": f"{value('ctr', 5):.4f}",
+            "cpc": f"{value('cpc', 3):.4f}",
+            "date_start": time_range.get("since", ""),
+            "date_stop": time_range.get("until", "")
+        }
+
+    def _value(self, *key):
+        """Return a value in [0, 1) that only depends on the seed and `key`, unless it drifts."""
+        if self.settings.drift_rate and self.settings.random.random() < self.settings.drift_rate:
+            return self.settings.random.random()
+        return zlib.crc32(repr((self.settings.seed,) + key).encode()) / 2 ** 32
+
+    def _create_report(self, params):
+        """Register an async report run; it completes immediately."""
+        with self._lock:
+            report_run_id = str(9000000 + len(self.reports))
+            self.reports[report_run_id] = {key: value for key, value in params.items() if key != "access_token"}
+        return report_run_id
+
+    def _usage(self):
+        """Return the usage percentage of the current window. Must be called with the lock held."""
+        if not self.settings.usage_capacity:
+            return 0.0
+        now = time.monotonic()
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - USAGE_WINDOW_SECONDS:
+            self._recent.popleft()
+        return 100.0 * len(self._recent) / self.settings.usage_capacity
+
+    def _usage_headers(self, usage, segments):
+        """Build X-App-Usage and X-Business-Use-Case-Usage headers, when usage reporting is on."""
+        if not self.settings.usage_capacity:
+            return {}
+        pct = min(int(usage), 100)
+        regain = self.settings.regain_minutes if usage >= 100 else 0
+        use_case = "ads_insights" if segments and segments[0].startswith("act_") else "pages"
+        owner = AD_ACCOUNT_ID if use_case == "ads_insights" else PAGE_ID
+        return {
+            "X-App-Usage": json.dumps({"call_count": pct, "total_cputime": pct // 2, "total_time": pct // 2}),
+            "X-Business-Use-Case-Usage": json.dumps({owner: [{
+                "type": use_case, "call_count": pct, "total_cputime": pct // 2, "total_time": pct // 2,
+                "estimated_time_to_regain_access": regain
+            }]})
+        }
+
+    @staticmethod
+    def _error17():
+        """Body of a Graph API "User request limit reached" error."""
+        return {"error": {"message": "(#17) User request limit reached", "type": "OAuthException", "code": 17,
+                          "fbtrace_id": "mock"}}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 keep-alive handler delegating to the server's MockGraphAPI."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        self._answer("GET", parts.path, dict(parse_qsl(parts.query, keep_blank_values=True)))
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True))
+        self._answer("POST", parts.path, {**dict(parse_qsl(parts.query)), **form})
+
+    def _answer(self, method, path, params):
+        api = self.server.api
+        if api.settings.latency or api.settings.jitter:
+            time.sleep(api.settings.latency + api.settings.random.random() * api.settings.jitter)
+        if api.settings.slow_rate and api.settings.random.random() < api.settings.slow_rate:
+            time.sleep(api.settings.slow)
+
+        status, body, headers = api.handle(method, path, params, f"http://{self.headers.get('Host')}")
+        if api.settings.item_latency and isinstance(body, dict) and isinstance(body.get("data"), list):
+            time.sleep(api.settings.item_latency * len(body["data"]))
+        payload = json.dumps(body).encode()
+        with api._lock:
+            api.stats["bytes_out"] += len(payload)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """
+    Start the mock API on a background thread.
+
+    Args:
+        settings (MockSettings): Scale and behaviour of the mock.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free one.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its `api` attribute holds the statistics.
+    """
+    server = ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.api = MockGraphAPI(settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_mock_arguments(parser):
+    """Add the mock's scale and behaviour options to an argument parser."""
+    parser.add_argument("--posts", type=int, default=10000, help="Posts per run (spread over the intervals)")
+    parser.add_argument("--media", type=int, default=1000, help="Instagram media objects")
+    parser.add_argument("--ads", type=int, default=50000, help="Ads (ad sets = ads/10, campaigns = ads/100)")
+    parser.add_argument("--page-size", type=int, default=25, help="Items per page when a request sets no limit")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Added latency per HTTP request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Random extra latency per HTTP request")
+    parser.add_argument("--usage-capacity", type=int, default=0,
+                        help="Requests per minute reported as 100%% usage (0 = no usage headers)")
+    parser.add_argument("--error17-rate", type=float, default=0.0, help="Share of requests failing with error 17")
+    parser.add_argument("--regain-minutes", type=int, default=0,
+                        help="estimated_time_to_regain_access reported once usage reaches 100%%")
+    parser.add_argument("--error5xx-rate", type=float, default=0.0, help="Share of requests failing with a 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra latency of slow requests")
+    parser.add_argument("--max-limit", type=int, default=0,
+                        help="Largest page `limit` accepted; larger ones fail with \"reduce the amount of data\"")
+    parser.add_argument("--item-latency-ms", type=float, default=0.0, help="Added latency per item of a page")
+    parser.add_argument("--drift-rate", type=float, default=0.0,
+                        help="Share of metric values that change from run to run (the rest are stable)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+
+def settings_from_args(args, intervals=1):
+    """Build MockSettings from parsed arguments, spreading the posts over `intervals` feed queries."""
+    return MockSettings(
+        posts_per_interval=max(1, args.posts // max(intervals, 1)),
+        media=args.media,
+        ads=args.ads,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        usage_capacity=args.usage_capacity,
+        error17_rate=args.error17_rate,
+        regain_minutes=args.regain_minutes,
+        error5xx_rate=args.error5xx_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        max_limit=args.max_limit,
+        item_latency_ms=args.item_latency_ms,
+        drift_rate=args.drift_rate,
+        seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Graph API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--intervals", type=int, default=2, help="Feed queries the posts are spread over")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(settings_from_args(args, args.intervals), args.host, args.port)
+    print(f"Mock Graph API listening on http://{args.host}:{server.server_port}/v22.0/")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(server.api.stats))
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,185 @@
+"""
+Offline throughput benchmark of the ETL against the local mock Graph API.
+
+Every scenario runs `etl()` in a fresh subprocess against `mock_graph_api.py`, with its output,
+state and token in a temporary directory (through a one-tenant TENANT_MANIFEST), and
+reports wall time, HTTP requests per second and peak RSS of the ETL process.
+
+Usage:
+    python benchmarks/run_benchmark.py --posts 10000 --ads 50000 --output bench.json
+    python benchmarks/run_benchmark.py --baseline bench.json --tolerance 0.25   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from mock_graph_api import AD_ACCOUNT_ID, PAGE_ID, add_mock_arguments, settings_from_args, start_server
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+# Scenario name -> environment of the ETL run
+SCENARIOS = {
+    "social": {"ETL_MODE": "social"},
+    "ads": {"ETL_MODE": "ads"},
+    "ads_entity": {"ETL_MODE": "ads", "ADS_INSIGHTS_MODE": "entity"},
+    "ads_async": {"ETL_MODE": "ads", "ADS_INSIGHTS_MODE": "async"},
+}
+
+
+def run_scenario(name, args):
+    """
+    Run one scenario and measure it.
+
+    Args:
+        name (str): Scenario name, see SCENARIOS.
+        args (argparse.Namespace): Benchmark options.
+
+    Returns:
+        dict: Wall time, requests, requests/s, peak RSS and the ETL's own run report summary.
+    """
+    intervals = args.months + 1  # get_last_months_intervals returns the current month too
+    server = start_server(settings_from_args(args, intervals))
+
+    with tempfile.TemporaryDirectory(prefix=f"graph-bench-{name}-") as work_dir:
+        manifest = os.path.join(work_dir, "tenants.json")
+        with open(manifest, "w", encoding="utf-8") as file:
+            json.dump([{"name": "bench", "page_id": PAGE_ID, "ads_account": AD_ACCOUNT_ID,
+                        "access_token": "mock-short-lived-token", "output_path": os.path.join(work_dir, "bench"),
+                        "state_dir": os.path.join(work_dir, "state")}], file)
+
+        env = {
+            **os.environ,
+            "GRAPH_API_URL_BASE": f"http://127.0.0.1:{server.server_port}/v22.0/",
+            "TENANT_MANIFEST": manifest,
+            "METRICS_DIR": os.path.join(work_dir, "metrics"),
+            "FB_APP_ID": "mock-app",
+            "FB_APP_SECRET": "mock-secret",
+            "NUM_MONTHS_DATA": str(args.months),
+            "RATE_LIMIT_RETRY_WAIT": str(args.retry_wait),
+            "RATE_LIMIT_MAX_RPS": str(args.max_rps),
+            "PYTHONPATH": SRC_DIR,
+            **SCENARIOS[name],
+            **dict(item.split("=", 1) for item in args.env)
+        }
+
+        log_path = os.path.join(work_dir, "etl.log")
+        start = time.perf_counter()
+        with open(log_path, "wb") as log:
+            pid = os.posix_spawn(
+                sys.executable,
+                [sys.executable, "-c", "from graph_etl.graph_etl import etl; etl()"],
+                env,
+                file_actions=[(os.POSIX_SPAWN_DUP2, log.fileno(), 1), (os.POSIX_SPAWN_DUP2, log.fileno(), 2)]
+            )
+            _, status, usage = os.wait4(pid, 0)
+        wall_seconds = time.perf_counter() - start
+        server.shutdown()
+
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code != 0:
+            with open(log_path, "r", encoding="utf-8", errors="replace") as log:
+                tail = log.read()[-3000:]
+            print(f"Scenario {name} failed with exit code {exit_code}:\n{tail}", file=sys.stderr)
+
+        etl_report = {}
+        report_path = os.path.join(work_dir, "metrics", "run_report.json")
+        if os.path.exists(report_path):
+            with open(report_path, "r", encoding="utf-8") as file:
+                report = json.load(file)
+            etl_report = {
+                "throttle_wait_seconds": round(sum(report["throttle_wait_seconds"].values()), 3),
+                "pool_utilization": report["pool"]["utilization"],
+                "peak_in_flight": report["pool"]["peak_in_flight"]
+            }
+
+    stats = server.api.stats
+    return {
+        "exit_code": exit_code,
+        "wall_seconds": round(wall_seconds, 3),
+        "http_requests": stats["http_requests"],
+        "sub_requests": stats["sub_requests"],
+        "throttled": stats["throttled"],
+        "errors_5xx": stats["errors_5xx"],
+        "requests_per_second": round(stats["http_requests"] / wall_seconds, 1),
+        "api_calls_per_second": round((stats["http_requests"] - stats["batch_requests"] + stats["sub_requests"])
+                                      / wall_seconds, 1),
+        "mb_received": round(stats["bytes_out"] / 1e6, 2),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is in KiB on Linux
+        **etl_report
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare results with a baseline run.
+
+    Args:
+        results (dict): Scenario results of this run.
+        baseline (dict): Scenario results of the baseline run.
+        tolerance (float): Allowed relative increase of wall time and peak RSS.
+
+    Returns:
+        list[str]: One message per regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if result["exit_code"] != 0:
+            regressions.append(f"{name}: ETL failed with exit code {result['exit_code']}")
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb"):
+            if result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]} "
+                                   f"(+{result[metric] / previous[metric] - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL against a local mock Graph API.")
+    parser.add_argument("--scenarios", default="social,ads", help=f"Comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--months", type=int, default=1, help="NUM_MONTHS_DATA of the ETL run")
+    parser.add_argument("--retry-wait", type=float, default=1.0, help="RATE_LIMIT_RETRY_WAIT of the ETL run")
+    parser.add_argument("--max-rps", type=float, default=1000.0,
+                        help="RATE_LIMIT_MAX_RPS of the ETL run; lower it to include the governor's pacing")
+    parser.add_argument("--env", action="append", default=[], help="Extra ETL environment variable, KEY=VALUE")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/growth versus the baseline")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name in [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]:
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario '{name}'")
+        print(f"Running scenario {name}...", flush=True)
+        results[name] = run_scenario(name, args)
+        print(json.dumps(results[name]), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+
+    print(f"\n{'scenario':<12} {'wall s':>8} {'requests':>9} {'req/s':>8} {'calls/s':>8} {'peak MB':>8}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['wall_seconds']:>8} {result['http_requests']:>9} "
+              f"{result['requests_per_second']:>8} {result['api_calls_per_second']:>8} {result['peak_rss_mb']:>8}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+    else:
+        regressions = [f"{name}: ETL failed" for name, result in results.items() if result["exit_code"] != 0]
+
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
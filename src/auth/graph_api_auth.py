@@ -1,22 +1,41 @@
 import requests
 import os
 import json
+import time
+import threading
+from contextlib import contextmanager
 from cryptography.fernet import Fernet
-from config.config import URL_BASE,ENCRYPTION_KEY_FILE,TOKEN_FILE  # Importing your BASE URL
+from config.config import (URL_BASE,ENCRYPTION_KEY_FILE,TOKEN_FILE,TOKEN_REFRESH_WINDOW_DAYS,  # Importing your BASE URL
+                           HTTP_CONNECT_TIMEOUT,HTTP_READ_TIMEOUT)
+from extract.http_session import get_session
+
+try:
+    import fcntl  # POSIX only; the token store is not locked where it is unavailable
+except ImportError:
+    fcntl = None
+
+# One Fernet cipher per key file and process
+_ciphers = {}
+_ciphers_lock = threading.Lock()
 
 class FacebookTokenManager:
     """
     Manages Facebook long-lived tokens securely.
-    - Encrypts and stores tokens in a file.
-    - Refreshes tokens when they expire.
+    - Encrypts and stores tokens in a file, together with their expiry.
+    - Refreshes tokens only when they are close to expiring.
     - Retrieves the stored token if valid.
     """
 
     ENCRYPTION_KEY_FILE = ENCRYPTION_KEY_FILE
     TOKEN_FILE = TOKEN_FILE
 
-    def __init__(self, short_lived_token=None):
+    def __init__(self, short_lived_token=None, session=None, refresh_window_days=TOKEN_REFRESH_WINDOW_DAYS,
+                 token_file=None, encryption_key_file=None):
         self.short_lived_token = short_lived_token
+        self.TOKEN_FILE = token_file or self.TOKEN_FILE  # Per-tenant token store in multi-tenant runs
+        self.ENCRYPTION_KEY_FILE = encryption_key_file or self.ENCRYPTION_KEY_FILE
+        self.session = session or get_session()  # Shares the Graph API connection pool
+        self.refresh_window = refresh_window_days * 24 * 3600  # Refresh this long before expiry
         self.GRAPH_API_URL = f"{URL_BASE}oauth/access_token"  # Uses the imported BASE URL
         self._ensure_encryption_key()
 
@@ -38,38 +57,59 @@ class FacebookTokenManager:
         with open(self.ENCRYPTION_KEY_FILE, "rb") as key_file:
             return key_file.read()
 
+    def _cipher(self):
+        """Returns the process-wide cipher of the key file, reading the key only once."""
+        key_file = str(self.ENCRYPTION_KEY_FILE)
+        with _ciphers_lock:
+            if key_file not in _ciphers:
+                _ciphers[key_file] = Fernet(self._load_encryption_key())
+            return _ciphers[key_file]
+
     # 🔒 Step 3: Encrypt Data Before Saving
     def _encrypt_data(self, data):
         """Encrypts data using the stored encryption key."""
-        cipher = Fernet(self._load_encryption_key())
-        return cipher.encrypt(data.encode()).decode()
+        return self._cipher().encrypt(data.encode()).decode()
 
     # 🔓 Step 4: Decrypt Data When Loading
     def _decrypt_data(self, data):
         """Decrypts data using the stored encryption key."""
-        cipher = Fernet(self._load_encryption_key())
-        return cipher.decrypt(data.encode()).decode()
+        return self._cipher().decrypt(data.encode()).decode()
 
     # 🔄 Step 5: Save Token Securely
-    def _save_token(self, token):
-        """Encrypts and stores the token securely."""
+    def _save_token(self, token, expires_at=None):
+        """Encrypts and stores the token securely, with its expiry (epoch seconds) when known."""
         encrypted_token = self._encrypt_data(token)
-        with open(self.TOKEN_FILE, "w") as file:
-            json.dump({"token": encrypted_token}, file)
+        tmp_file = f"{self.TOKEN_FILE}.tmp"
+        with open(tmp_file, "w") as file:
+            json.dump({"token": encrypted_token, "expires_at": expires_at}, file)
+        os.replace(tmp_file, self.TOKEN_FILE)
         print("✅ Token securely saved.")
 
     # 📂 Step 6: Load Token from File
     def _load_token(self):
-        """Loads the stored encrypted token and decrypts it."""
+        """Loads the stored encrypted token and decrypts it. Returns (token, expires_at)."""
         if not os.path.exists(self.TOKEN_FILE):
-            return None
+            return None, None
         with open(self.TOKEN_FILE, "r") as file:
             data = json.load(file)
-        return self._decrypt_data(data["token"])
-
-    # 🔄 Step 7: Get a Long-Lived Token (First Time)
+        return self._decrypt_data(data["token"]), data.get("expires_at")
+
+    # 🔐 Step 7: Lock the Token Store
+    @contextmanager
+    def _token_lock(self):
+        """Holds an exclusive lock on the token store, so concurrent runs don't refresh twice."""
+        with open(f"{self.TOKEN_FILE}.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # 🔄 Step 8: Get a Long-Lived Token (First Time)
     def _get_long_lived_token(self):
-        """Fetches a new long-lived token from the short-lived token."""
+        """Fetches a new long-lived token from the short-lived token. Returns (token, expires_at)."""
 
         # Load your App ID and App Secret from environment variables
         client_id = os.getenv("FB_APP_ID")
@@ -85,22 +125,22 @@ class FacebookTokenManager:
             "fb_exchange_token": self.short_lived_token  # Short-lived token
         }
 
-        response = requests.get(self.GRAPH_API_URL, params=params)
+        response = self.session.get(self.GRAPH_API_URL, params=params, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
 
         if response.status_code == 200:
             token = response.json().get("access_token")
             print("✅ New Long-Lived Token")
-            return token
+            return token, self._expiry_from_response(response.json(), token)
         else:
             raise requests.exceptions.RequestException(
                 f"❌ Error fetching long-lived token: {response.status_code} - {response.text}"
             )
 
-    # 🔄 Step 8: Refresh Token (Every 60 Days)
+    # 🔄 Step 9: Refresh Token (Close to Expiry)
     def _refresh_token(self, long_lived_token):
-        """Refreshes the stored long-lived token when it nears expiration."""
+        """Refreshes the stored long-lived token when it nears expiration. Returns (token, expires_at)."""
 
-        refresh_url = f"https://graph.facebook.com/v22.0/oauth/access_token"  # Corrected URL
+        refresh_url = self.GRAPH_API_URL
 
         params = {
             "grant_type": "fb_exchange_token",
@@ -109,35 +149,84 @@ class FacebookTokenManager:
             "fb_exchange_token": long_lived_token
         }
 
-        response = requests.get(refresh_url, params=params)
+        response = self.session.get(refresh_url, params=params, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
 
         if response.status_code == 200:
             new_token = response.json().get("access_token")
             print("✅ Refreshed Token")
-            return new_token
+            return new_token, self._expiry_from_response(response.json(), new_token)
         else:
             raise requests.exceptions.RequestException(
                 f"❌ Error refreshing token: {response.status_code} - {response.text}"
             )
 
+    # ⏳ Step 10: Find Out When a Token Expires
+    def _expiry_from_response(self, payload, token):
+        """Returns the expiry of a token from `expires_in`, falling back to `debug_token`."""
+        if payload.get("expires_in"):
+            return int(time.time()) + int(payload["expires_in"])
+        return self._debug_token_expiry(token)
+
+    def _debug_token_expiry(self, token):
+        """
+        Asks `debug_token` when a token expires.
+        Returns epoch seconds, 0 for a token that never expires, or None when unknown.
+        """
+        client_id = os.getenv("FB_APP_ID")
+        client_secret = os.getenv("FB_APP_SECRET")
+        if not client_id or not client_secret:
+            return None
+
+        params = {"input_token": token, "access_token": f"{client_id}|{client_secret}"}
+        response = self.session.get(f"{URL_BASE}debug_token", params=params,
+                                    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+        if response.status_code != 200:
+            print(f"⚠️ Could not inspect token expiry: {response.status_code} - {response.text}")
+            return None
+
+        data = response.json().get("data", {})
+        if not data.get("is_valid", True):
+            return None
+        return data.get("expires_at")
+
+    def _needs_refresh(self, expires_at):
+        """Checks whether a token with this expiry falls inside the refresh window."""
+        if expires_at is None:
+            return True  # Unknown expiry: refresh to be safe
+        if expires_at == 0:
+            return False  # Never expires
+        return expires_at - time.time() <= self.refresh_window
+
     # 🚀 Main Process: Manage Token Securely
     def get_token(self):
         """
         Returns a valid long-lived token.
         - If no token exists, fetch a new one.
-        - If a token exists, refresh it when needed.
+        - If a token exists, reuse it until it is close to expiring, then refresh it.
         """
-        token = self._load_token()
-
-        if not token:
-            print("🔄 No saved token found. Fetching new long-lived token...")
-            if not self.short_lived_token:
-                raise ValueError("❌ No short-lived token provided. Cannot generate a new token.")
-            token = self._get_long_lived_token()
-            self._save_token(token)
-        else:
-            print("🔄 Existing token found. Refreshing...")
-            token = self._refresh_token(token)
-            self._save_token(token)
+        with self._token_lock():
+            token, expires_at = self._load_token()
+
+            if not token:
+                print("🔄 No saved token found. Fetching new long-lived token...")
+                if not self.short_lived_token:
+                    raise ValueError("❌ No short-lived token provided. Cannot generate a new token.")
+                token, expires_at = self._get_long_lived_token()
+                self._save_token(token, expires_at)
+                return token
+
+            if expires_at is None:
+                # Token saved before expiries were recorded
+                expires_at = self._debug_token_expiry(token)
+                if expires_at is not None:
+                    self._save_token(token, expires_at)
+
+            if self._needs_refresh(expires_at):
+                print("🔄 Existing token close to expiry. Refreshing...")
+                token, expires_at = self._refresh_token(token)
+                self._save_token(token, expires_at)
+            else:
+                print("✅ Existing token is still valid.")
 
         return token
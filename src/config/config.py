@@ -6,8 +6,65 @@ PAGE_ID = os.getenv("PAGE_ID", "")
 PAGE_NAME = os.getenv("PAGE_NAME", "default_page")
 ADS_ACCOUNT = os.getenv("ADS_ACCOUNT", "")
 
-# Base URLs
-URL_BASE = "https://graph.facebook.com/v22.0/"
+# Base URLs (overridable to point the ETL at a local stand-in server)
+URL_BASE = os.getenv("GRAPH_API_URL_BASE", "https://graph.facebook.com/v22.0/")
+
+# Batch Requests (Graph API accepts at most 50 sub-requests per batch)
+BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "50"))
+
+# Concurrency & HTTP Connection Pool (pool defaults to one connection per worker thread)
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", str(MAX_WORKERS)))
+
+# ETL Engine: "threads" (TaskScheduler over MAX_WORKERS threads) or "async" (one asyncio event loop keeping
+# up to ASYNC_MAX_CONCURRENCY requests in flight; needs aiohttp)
+ETL_ENGINE = os.getenv("ETL_ENGINE", "threads").lower()
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "100"))
+
+# Multi-Tenant Runs: JSON list of pages/ad accounts run by one process (see config/tenants.py);
+# TENANT_MAX_TASKS caps the tasks one tenant may run at once so a large account cannot starve the rest
+TENANT_MANIFEST = os.getenv("TENANT_MANIFEST", "")
+TENANT_MAX_TASKS = int(os.getenv("TENANT_MAX_TASKS", str(max(1, MAX_WORKERS // 2))))
+
+# Rate Governor (requests per second per business use case, scaled down above RATE_LIMIT_SOFT_PCT usage)
+RATE_LIMIT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "20"))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.2"))
+RATE_LIMIT_SOFT_PCT = float(os.getenv("RATE_LIMIT_SOFT_PCT", "75"))
+# Fallback wait (seconds, doubled per attempt) after a rate-limit error that did not say when access returns
+RATE_LIMIT_RETRY_WAIT = float(os.getenv("RATE_LIMIT_RETRY_WAIT", "240"))
+
+# Transient Errors: 5xx responses, timeouts and connection errors of idempotent requests are retried up to
+# RETRY_MAX_ATTEMPTS attempts with decorrelated-jitter backoff between RETRY_BASE_SECONDS and RETRY_MAX_SECONDS.
+# A run retries at most RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO x its requests, so retries cannot amplify an outage
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "60"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN = int(os.getenv("RETRY_BUDGET_MIN", "20"))
+# Circuit Breaker per endpoint family: opens after CIRCUIT_FAILURES consecutive transient failures, failing
+# requests fast, and lets one probe request through every CIRCUIT_COOLDOWN_SECONDS until one succeeds
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "10"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))
+# Hedged Requests: a GET still unanswered after the HEDGE_PERCENTILE latency of its endpoint family (known
+# once HEDGE_MIN_SAMPLES requests finished) is sent again and the first response wins; hedges use the retry budget
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Adaptive Page Size: paginated requests that pass a `limit` have it tuned per endpoint between PAGE_SIZE_MIN and
+# PAGE_SIZE_MAX. It doubles while a twice-as-large full page would still stay under PAGE_SIZE_TARGET_SECONDS and
+# PAGE_SIZE_MAX_MB, and halves on slower/larger pages and "too much data" errors; sizes persist across runs
+PAGE_SIZE_TUNING = os.getenv("PAGE_SIZE_TUNING", "true").lower() == "true"
+PAGE_SIZE_MIN = int(os.getenv("PAGE_SIZE_MIN", "25"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+PAGE_SIZE_TARGET_SECONDS = float(os.getenv("PAGE_SIZE_TARGET_SECONDS", "5"))
+PAGE_SIZE_MAX_MB = float(os.getenv("PAGE_SIZE_MAX_MB", "8"))
+# A rejected size caps its endpoint until PAGE_SIZE_CEILING_DAYS have passed or PAGE_SIZE_CEILING_PAGES full pages
+# at the cap came back fast enough to grow, whichever comes first
+PAGE_SIZE_CEILING_DAYS = int(os.getenv("PAGE_SIZE_CEILING_DAYS", "7"))
+PAGE_SIZE_CEILING_PAGES = int(os.getenv("PAGE_SIZE_CEILING_PAGES", "50"))
 
 # Page Metrics
 PAGE_ENDPOINT_BASE = f"{PAGE_ID}"
@@ -33,6 +90,9 @@ POST_METRICS = ",".join([
     "post_impressions_nonviral_unique"
 ])
 
+# Request post insights inline on the feed call (nested field) instead of one call per post
+INLINE_POST_INSIGHTS = os.getenv("INLINE_POST_INSIGHTS", "false").lower() == "true"
+
 # Instagram Metrics
 INSTA_PAGE_METRICS = ",".join([
     "reach", "accounts_engaged", "likes", "comments", "shares", "saves", "replies",
@@ -49,12 +109,114 @@ INSTA_REEL_METRICS = ",".join([
     "ig_reels_avg_watch_time", "ig_reels_video_view_total_time"
 ])
 
+# Threads draining the batched per-media Instagram insights requests
+INSTA_INSIGHTS_WORKERS = int(os.getenv("INSTA_INSIGHTS_WORKERS", str(MAX_WORKERS)))
+
 # Output Paths (Using Pathlib)
 OUTPUT_PATH = Path(f"/datalake/raw/graph/{PAGE_NAME}")
 
+# State Paths: response cache, checkpoints, sync state, learned page sizes, content hashes, the work queue and
+# run metrics live under STATE_DIR, outside OUTPUT_PATH, so readers of the output only see data;
+# tenants of a manifest keep theirs under STATE_ROOT/{name} unless they set a `state_dir`
+STATE_ROOT = Path(os.getenv("STATE_ROOT", "/datalake/state/graph"))
+STATE_DIR = Path(os.getenv("STATE_DIR", str(STATE_ROOT / PAGE_NAME)))
+
+# Output Format: "json" (one indented document per file) or "ndjson" (paginated endpoints are
+# streamed page by page, one record per line); OUTPUT_COMPRESSION=gzip compresses ndjson files
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "json").lower()
+OUTPUT_COMPRESSION = os.getenv("OUTPUT_COMPRESSION", "").lower()
+
+# Output Backend of per-entity files (one per post, media or ads entity and month): "files" or "segments"
+# (records appended to per-month segment files with an offset index under {category}/_segments/)
+OUTPUT_BACKEND = os.getenv("OUTPUT_BACKEND", "files").lower()
+SEGMENT_CATEGORIES = [
+    name.strip() for name in os.getenv(
+        "SEGMENT_CATEGORIES",
+        "facebook_post_metrics,instagram_media_insights,campaigns_insights,adsets_insights,ads_insights"
+    ).split(",") if name.strip()
+]
+SEGMENT_MAX_MB = int(os.getenv("SEGMENT_MAX_MB", "256"))
+
+# Change Tracking: outputs whose canonical content hash is unchanged are not rewritten; hashes are kept in
+# {state_dir}/content_hashes.json and every run writes {output_path}/manifests/{run}.json listing new,
+# changed and unchanged outputs with record counts (the newest CHANGE_MANIFESTS_KEEP manifests are kept)
+CHANGE_TRACKING = os.getenv("CHANGE_TRACKING", "true").lower() == "true"
+CHANGE_MANIFESTS_KEEP = int(os.getenv("CHANGE_MANIFESTS_KEEP", "30"))
+
+# Normalization: after extraction, flatten page/post metrics and ads insights into typed long-format tables
+# under {output_path}/normalized/{table}/month=YYYY-MM/; "parquet" and "arrow" need pyarrow, "ndjson" does not
+NORMALIZE_OUTPUT = os.getenv("NORMALIZE_OUTPUT", "false").lower() == "true"
+NORMALIZE_FORMAT = os.getenv("NORMALIZE_FORMAT", "ndjson").lower()
+NORMALIZE_BATCH_ROWS = int(os.getenv("NORMALIZE_BATCH_ROWS", "100000"))
+
+# Incremental Sync: skip intervals/posts already fetched after they became final;
+# anything ending within the last SYNC_REFRESH_DAYS days (attribution window) is always refetched
+SYNC_INCREMENTAL = os.getenv("SYNC_INCREMENTAL", "true").lower() == "true"
+SYNC_REFRESH_DAYS = int(os.getenv("SYNC_REFRESH_DAYS", "28"))
+
+# Backfill window planner: page insights months are merged into windows of up to PAGE_METRICS_MAX_DAYS
+# days per request; windows the API rejects as too large are bisected down to WINDOW_MIN_DAYS days
+PAGE_METRICS_MAX_DAYS = int(os.getenv("PAGE_METRICS_MAX_DAYS", "93"))
+WINDOW_MIN_DAYS = int(os.getenv("WINDOW_MIN_DAYS", "1"))
+
+# Response Cache: GET responses cached on disk by how old their data is (TTLs in seconds, 0 = never cached)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(STATE_DIR / "cache" / "http")))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "512"))
+CACHE_TTL_FINAL = float(os.getenv("CACHE_TTL_FINAL", str(30 * 24 * 3600)))  # Data older than SYNC_REFRESH_DAYS
+CACHE_TTL_RECENT = float(os.getenv("CACHE_TTL_RECENT", "0"))  # Data inside the attribution window
+CACHE_TTL_UNDATED = float(os.getenv("CACHE_TTL_UNDATED", "0"))  # Lists and per-post insights
+
+# Run Checkpoints: journal pagination cursors and finished work units so a crashed run resumes
+RUN_CHECKPOINTS = os.getenv("RUN_CHECKPOINTS", "true").lower() == "true"
+# Progress older than this is ignored by a restarted run: recent data must be refetched and cursors go stale
+RUN_CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("RUN_CHECKPOINT_MAX_AGE_HOURS", "24"))
+
+# Distributed Runs: ETL_ROLE "coordinator" fills a durable work queue (and starts QUEUE_LOCAL_WORKERS worker
+# processes), "worker" drains it; any number of workers (processes or containers sharing OUTPUT_PATH and STATE_DIR)
+# can join.
+# A unit leased by a worker that stopped renewing it is handed out again after QUEUE_LEASE_SECONDS.
+ETL_ROLE = os.getenv("ETL_ROLE", "standalone").lower()
+WORK_QUEUE_FILE = Path(os.getenv("WORK_QUEUE_FILE", str(STATE_DIR / "work_queue.sqlite")))
+QUEUE_LOCAL_WORKERS = int(os.getenv("QUEUE_LOCAL_WORKERS", str(os.cpu_count() or 1)))
+# Workers of the run across every host; each one paces itself at 1/QUEUE_WORKERS of RATE_LIMIT_MAX_RPS (and of
+# RATE_LIMIT_MIN_RPS and RETRY_BUDGET_MIN) so together they stay within the limits of one process
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", str(QUEUE_LOCAL_WORKERS)))
+QUEUE_WORKER_THREADS = int(os.getenv("QUEUE_WORKER_THREADS", str(MAX_WORKERS)))
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "300"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+
+# Run Metrics: per-endpoint request counts, latencies, bytes, pages, retries, throttle waits and pool
+# utilization, written as a JSON run report and a Prometheus textfile at the end of every run
+RUN_METRICS = os.getenv("RUN_METRICS", "true").lower() == "true"
+METRICS_DIR = Path(os.getenv("METRICS_DIR", str(STATE_DIR / "metrics")))
+METRICS_TEXTFILE = Path(os.getenv("METRICS_TEXTFILE", str(METRICS_DIR / "graph_etl.prom")))
+# Profiling hook: "cprofile" dumps one .pstats file per section of the RUN_PROFILE_SECTIONS categories
+RUN_PROFILE = os.getenv("RUN_PROFILE", "").lower()
+RUN_PROFILE_SECTIONS = [name.strip() for name in os.getenv("RUN_PROFILE_SECTIONS", "stage").split(",") if name.strip()]
+
 # Ads Account
 ADS_ACCOUNT = f"{ADS_ACCOUNT}"
 
+# Ads Insights Mode: "entity" (one insights call per campaign/ad set/ad),
+# "account" (one act_{ADS_ACCOUNT}/insights query per level and interval) or
+# "async" (the same account-level queries submitted as async report runs).
+# Account-level rows also carry a {level}_id field (campaign_id, adset_id or ad_id)
+ADS_INSIGHTS_MODE = os.getenv("ADS_INSIGHTS_MODE", "entity").lower()
+
+# Threads draining the (entity x interval) work queue in "entity" mode
+ADS_INSIGHTS_WORKERS = int(os.getenv("ADS_INSIGHTS_WORKERS", str(MAX_WORKERS)))
+
+# Async Insights Report Runs (ADS_INSIGHTS_MODE=async)
+REPORT_MAX_IN_FLIGHT = int(os.getenv("REPORT_MAX_IN_FLIGHT", "8"))
+REPORT_POLL_INITIAL_WAIT = float(os.getenv("REPORT_POLL_INITIAL_WAIT", "2"))
+REPORT_POLL_MAX_WAIT = float(os.getenv("REPORT_POLL_MAX_WAIT", "60"))
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "3600"))
+
 # Security
 TOKEN_FILE = Path(f"/datalake/raw/graph/{PAGE_NAME}/security/secure_token.json")
 ENCRYPTION_KEY_FILE = Path(f"/datalake/raw/graph/{PAGE_NAME}/security/key.key")
+
+# Refresh the stored long-lived token only when it expires within this many days
+TOKEN_REFRESH_WINDOW_DAYS = int(os.getenv("TOKEN_REFRESH_WINDOW_DAYS", "7"))
@@ -0,0 +1,110 @@
+import json
+import os
+from pathlib import Path
+
+from config.config import ADS_ACCOUNT, CACHE_DIR, OUTPUT_PATH, PAGE_ID, PAGE_NAME, STATE_DIR, STATE_ROOT
+
+
+class Tenant:
+    """
+    One page/ad account the ETL runs for, with its own token, output location and state location.
+
+    In the default single-tenant mode the tenant is built from the PAGE_ID, PAGE_NAME,
+    ADS_ACCOUNT and ACCESS_TOKEN environment variables. With TENANT_MANIFEST set, one
+    process runs every tenant listed in the manifest.
+    """
+
+    def __init__(self, name, page_id="", ads_account="", access_token="", output_path=None, state_dir=None,
+                 cache_dir=None):
+        self.name = name
+        self.page_id = str(page_id or "")
+        self.ads_account = str(ads_account or "")
+        self.access_token = access_token or ""  # Short-lived token, only needed until a long-lived one is stored
+        self.output_path = Path(output_path or f"/datalake/raw/graph/{name}")
+        self.state_dir = Path(state_dir or STATE_ROOT / name)  # Cache, checkpoints, sync state and other run state
+        self.cache_dir = Path(cache_dir or self.state_dir / "cache" / "http")
+
+    @classmethod
+    def from_env(cls):
+        """Build the single tenant described by the environment."""
+        return cls(
+            name=PAGE_NAME,
+            page_id=PAGE_ID,
+            ads_account=ADS_ACCOUNT,
+            access_token=os.getenv("ACCESS_TOKEN", ""),
+            output_path=OUTPUT_PATH,
+            state_dir=STATE_DIR,
+            cache_dir=CACHE_DIR
+        )
+
+    @property
+    def page_endpoint(self):
+        """Endpoint of the Facebook page itself."""
+        return f"{self.page_id}"
+
+    @property
+    def page_metrics_endpoint(self):
+        """Endpoint of the page insights."""
+        return f"{self.page_id}/insights"
+
+    @property
+    def post_endpoint(self):
+        """Endpoint of the page feed."""
+        return f"{self.page_id}/feed"
+
+    @property
+    def token_file(self):
+        """Encrypted long-lived token of the tenant."""
+        return self.output_path / "security" / "secure_token.json"
+
+    @property
+    def encryption_key_file(self):
+        """Key the tenant's token is encrypted with."""
+        return self.output_path / "security" / "key.key"
+
+    def __repr__(self):
+        return f"Tenant(name={self.name!r}, page_id={self.page_id!r}, ads_account={self.ads_account!r})"
+
+
+def load_tenants(manifest_path):
+    """
+    Load the tenants of a manifest file.
+
+    The manifest is a JSON list of objects with a `name` and any of `page_id`, `ads_account`,
+    `output_path`, `state_dir` and `cache_dir`. The short-lived token is read from the environment
+    variable named by `access_token_env`, or taken literally from `access_token`.
+
+    Args:
+        manifest_path (str): Path to the manifest.
+
+    Returns:
+        list[Tenant]: The tenants, in manifest order.
+
+    Raises:
+        ValueError: If the manifest is not a list or tenant names are missing or repeated.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+    if not isinstance(entries, list):
+        raise ValueError(f"Tenant manifest {manifest_path} must be a JSON list.")
+
+    tenants = []
+    for entry in entries:
+        if not entry.get("name"):
+            raise ValueError(f"Tenant manifest entry without a name: {entry}")
+        access_token = os.getenv(entry["access_token_env"], "") if entry.get("access_token_env") else entry.get(
+            "access_token", "")
+        tenants.append(Tenant(
+            name=entry["name"],
+            page_id=entry.get("page_id", ""),
+            ads_account=entry.get("ads_account", ""),
+            access_token=access_token,
+            output_path=entry.get("output_path"),
+            state_dir=entry.get("state_dir"),
+            cache_dir=entry.get("cache_dir")
+        ))
+
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Tenant names in {manifest_path} must be unique.")
+    return tenants
@@ -1,9 +1,63 @@
-import time
 import requests
 import os
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlencode
+
+from config.config import (
+    URL_BASE, BATCH_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT, OUTPUT_COMPRESSION, OUTPUT_FORMAT,
+    RATE_LIMIT_RETRY_WAIT
+)
+from config.tenants import Tenant
+from extract.http_session import get_request_slots, get_session
+from extract.page_sizer import limit_rejected, page_family, page_limit, resizable, with_limit
+from extract.rate_limiter import get_rate_governor, use_case_for
+from extract.retry_policy import get_retry_policy
+from extract.stream_writer import NDJSONWriter, streamed_file_name, write_json_from_ndjson
+from state.change_index import UNCHANGED, content_hash, record_count
+from utils.run_metrics import endpoint_label, get_run_metrics
+
+# Graph API refuses batches with more than 50 sub-requests
+MAX_BATCH_SIZE = 50
+
+# Error codes/subcodes that mean "slow down" rather than "this request is wrong"
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+RATE_LIMIT_ERROR_SUBCODES = {2446079}
+
+# Request failures without a response that are worth retrying
+TRANSIENT_EXCEPTIONS = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError
+)
+
+# Errors that mean the requested date range holds too much data or too many days
+WINDOW_TOO_LARGE_ERROR_SUBCODES = {1487534}
+WINDOW_TOO_LARGE_MESSAGES = ("reduce the amount of data", "cannot be more than", "too many days")
+
+
+class GraphAPIError(requests.exceptions.RequestException):
+    """
+    A Graph API request that failed with an error response (other than a rate limit).
+    Keeps the HTTP status and the parsed `error` object for callers that react to specific errors.
+    """
+
+    def __init__(self, message, status_code=None, error=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error = error or {}
+
+    @property
+    def window_too_large(self):
+        """Whether the API rejected the request's date range as too large or too dense."""
+        message = str(self.error.get("message", "")).lower()
+        return (self.error.get("error_subcode", 0) in WINDOW_TOO_LARGE_ERROR_SUBCODES
+                or any(text in message for text in WINDOW_TOO_LARGE_MESSAGES))
+
+    @property
+    def page_too_large(self):
+        """Whether a smaller `limit` may get the request through: too much data, or a `limit` above the maximum."""
+        return self.window_too_large or limit_rejected(self)
 
-from config.config import URL_BASE
 
 class GraphAPIClient:
     """
@@ -11,9 +65,27 @@ class GraphAPIClient:
     and save it to a specified location, including support for pagination and retry on rate limits.
     """
 
-    def __init__(self, max_retries=5, initial_wait=240):
+    def __init__(self, max_retries=5, initial_wait=RATE_LIMIT_RETRY_WAIT, pool_size=HTTP_POOL_SIZE, session=None,
+                 rate_governor=None, output_format=OUTPUT_FORMAT, compression=OUTPUT_COMPRESSION, checkpoints=None, cache=None,
+                 tenant=None, access_token=None, metrics=None, segments=None, retry_policy=None, page_sizer=None,
+                 changes=None, request_slots=None):
         self.max_retries = max_retries
-        self.initial_wait = initial_wait  # Initial wait time in seconds
+        self.initial_wait = initial_wait  # Fallback wait (seconds) when the API does not say when to retry
+        self.session = session or get_session(pool_size)  # Pooled keep-alive connections
+        self.request_slots = request_slots or get_request_slots()  # Process-wide cap on requests in flight
+        self.rate_governor = rate_governor or get_rate_governor()  # Shared pacing across all clients/threads
+        self.output_format = output_format  # "json" (one document per file) or "ndjson" (streamed, one record per line)
+        self.compression = compression  # "" or "gzip", only used for ndjson output
+        self.checkpoints = checkpoints  # Optional CheckpointJournal to resume interrupted paginations
+        self.cache = cache  # Optional ResponseCache for immutable historical responses
+        self.tenant = tenant or Tenant.from_env()  # Page/ad account the client fetches for
+        self.access_token = access_token  # Tenant's long-lived token; ACCESS_TOKEN env var when None
+        self.rate_scope = self.tenant.name if tenant else ""  # Keeps per-account rate buckets apart
+        self.metrics = metrics or get_run_metrics()  # Shared run-level counters and timings
+        self.segments = segments  # Optional SegmentStore for per-entity files
+        self.retry_policy = retry_policy or get_retry_policy()  # Shared transient-error retries, budget and circuits
+        self.page_sizer = page_sizer  # Optional PageSizer tuning the `limit` of paginated requests
+        self.changes = changes  # Optional ChangeIndex: skip unchanged writes and list the run's changes
 
     def fetch_data(self, endpoint, params, output_dir, file_name, extend_data=True, page=True):
         """
@@ -30,70 +102,609 @@ class GraphAPIClient:
         Raises:
             Exception: If the API response status is not 200 after retries.
         """
-        url = f"{URL_BASE}{endpoint}"
-        params["access_token"] = os.getenv("ACCESS_TOKEN",'')
+        with self.metrics.timer("fetch_data", endpoint_label(endpoint)):
+            streamable = self.segments is None or not self.segments.handles(output_dir)
+            if extend_data and streamable and (self.output_format == "ndjson" or self.checkpoints is not None):
+                self.__stream_to_file(endpoint, params, output_dir, file_name)
+                return
 
-        if not params["access_token"]:
-            raise EnvironmentError("Access token is not set.")
+            if extend_data:
+                all_data = []
+                for data in self.iter_pages(endpoint, params):
+                    all_data.extend(data.get("data", []))
+            else:
+                all_data = next(self.iter_pages(endpoint, params, paginate=False))
+
+            # Save all the fetched data to the file
+            self._write_to_file(output_dir, file_name, {"data": all_data})
 
-        all_data = []
+    def iter_pages(self, endpoint, params, paginate=True, prefetch=False, start_url=None):
+        """
+        Yield each raw response page of an endpoint, following `paging.next` links.
+
+        With a page sizer, a `limit` in `params` is only the starting size: the learned size of
+        the endpoint is requested instead, also on `paging.next` links that page by cursor (see
+        `resizable`).
+
+        Args:
+            endpoint (str): API endpoint to query.
+            params (dict): Query parameters for the first request.
+            paginate (bool): Whether to follow `paging.next` after the first page.
+            prefetch (bool): Whether to request the next page in the background while
+                the caller is still processing the current one.
+            start_url (str, optional): A saved `paging.next` URL (without access token) to
+                resume from instead of the first page.
+
+        Yields:
+            dict: Parsed JSON body of each page.
+        """
+        family = page_family(endpoint, params) if self.page_sizer is not None and "limit" in params else None
+        if start_url:
+            url, params = start_url, {"access_token": self._access_token()}
+        else:
+            url = f"{URL_BASE}{endpoint}"
+            params = {**params, "access_token": self._access_token()}
+        use_case = use_case_for(endpoint)
+
+        if not (paginate and prefetch):
+            while url:
+                data = self._request_page(url, params, use_case, family)
+                self.metrics.record_page(endpoint)
+                yield data
+                url = data.get("paging", {}).get("next") if paginate else None  # Get next page URL
+                params = {}  # The next URL already carries every query parameter
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._request_page, url, params, use_case, family)
+            while future:
+                data = future.result()
+                next_url = data.get("paging", {}).get("next")
+                future = executor.submit(self._request_page, next_url, {}, use_case, family) if next_url else None
+                self.metrics.record_page(endpoint)
+                yield data
+
+    def save_data(self, output_dir, file_name, data):
+        """
+        Save already-fetched data with the same layout and rules as `fetch_data`.
+
+        In ndjson mode a `{"data": [...]}` payload is written one record per line, like a
+        streamed endpoint would be. Directories handled by the segment store are appended to it.
+
+        Args:
+            output_dir (str): Directory where the file will be saved.
+            file_name (str): Name of the output file.
+            data (dict): Data to save.
+        """
+        if self.output_format == "ndjson" and isinstance(data.get("data"), list) and (
+                self.segments is None or not self.segments.handles(output_dir)):
+            file_path = os.path.join(output_dir, streamed_file_name(file_name, self.compression))
+            with self.metrics.timer("write", "ndjson"), \
+                    NDJSONWriter(file_path, self.compression, changes=self.changes) as writer:
+                writer.write_records(data["data"])
+            if not writer.records:
+                print(f"⚠️ No data found. Skipping file creation for {file_name}")
+            return
+
+        self._write_to_file(output_dir, file_name, data)
+
+    def post_data(self, endpoint, data):
+        """
+        POST form data to an endpoint (e.g. to start an async insights report) and return the JSON reply.
+
+        Args:
+            endpoint (str): API endpoint to post to.
+            data (dict): Form fields to send.
+
+        Returns:
+            dict: Parsed JSON response.
+        """
+        return self._request_json(
+            f"{URL_BASE}{endpoint}", {**data, "access_token": self._access_token()}, use_case_for(endpoint), method="POST"
+        )
+
+    def get_object(self, endpoint, params=None):
+        """
+        GET a single Graph API object without saving it (e.g. to poll a report run's status).
+
+        Args:
+            endpoint (str): API endpoint to query.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            dict: Parsed JSON response.
+        """
+        return self._request_json(
+            f"{URL_BASE}{endpoint}", {**(params or {}), "access_token": self._access_token()}, use_case_for(endpoint)
+        )
+
+    def _request_page(self, url, params, use_case, family):
+        """
+        Request one page with the learned page size of its family, halving the size and asking
+        again while the API rejects the page as too large.
+
+        Args:
+            url (str): Absolute request URL (the first page's, or a `paging.next` link).
+            params (dict): Query parameters.
+            use_case (str): Business use case the request counts against.
+            family (str | None): Page size family (see `page_family`); None to send the request unchanged.
+
+        Returns:
+            dict: Parsed JSON response.
+        """
+        limit = page_limit(url, params) if family is not None else None
+        if limit is None:
+            return self._request_json(url, params, use_case)
+
+        if resizable(url, params):
+            limit = self.page_sizer.limit_for(family, limit)
+        while True:
+            url, params = with_limit(url, params, limit)
+            stats = {}
+            try:
+                data = self._request_json(url, params, use_case, stats=stats)
+            except GraphAPIError as e:
+                limit = self.page_sizer.shrink(family, limit) if e.page_too_large else None
+                if limit is None:
+                    raise
+                print(f"Page of {family} too large, retrying with limit={limit}...")
+                continue
+            if stats:
+                self.page_sizer.observe(family, limit, len(data.get("data", [])), stats["seconds"], stats["bytes"])
+            return data
+
+    def _request_json(self, url, params, use_case, method="GET", stats=None):
+        """
+        Perform one request, retrying while the API reports a rate limit.
+
+        Args:
+            url (str): Absolute request URL.
+            params (dict): Query parameters, or form fields for a POST.
+            use_case (str): Business use case the request counts against.
+            method (str): HTTP method, "GET" or "POST".
+            stats (dict, optional): Filled with the `seconds` and `bytes` of a response that came from the API.
+
+        Returns:
+            dict: Parsed JSON response.
+
+        Raises:
+            GraphAPIError: If the API answers with an error other than a rate limit.
+            requests.exceptions.RequestException: If the rate limit persists after retries or the request fails.
+        """
         attempt = 0  # Track retry attempts
 
-        while url:
+        stale, headers = None, {}
+        if method == "GET" and self.cache is not None:
+            cached, stale = self.cache.lookup(url, params)
+            if cached is not None:
+                return cached
+            if stale:
+                headers["If-None-Match"] = stale["etag"]  # Revalidate instead of refetching
+
+        while True:
             try:
-                response = requests.get(url, params=params, timeout=200)
+                if method == "POST":
+                    response = self._send("POST", url, use_case, data=params)
+                else:
+                    response = self._send("GET", url, use_case, params=params, headers=headers)
+            except requests.exceptions.RequestException as e:
+                print(f"API request failed: {str(e)}")
+                raise
+
+            if response.status_code == 304 and stale:
+                self.cache.touch(url, params, stale)
+                return stale["body"]
 
-                if response.status_code == 200:
+            if response.status_code == 200:
+                with self.metrics.timer("parse", endpoint_label(url)):
                     data = response.json()
-                    if extend_data:
-                        all_data.extend(data.get("data", []))
-                        paging = data.get("paging", {})
-                        url = paging.get("next", None)  # Get next page URL
-                        params = {}  # Reset params
-                    else:
-                        all_data = data
-                        url = None
-
-                elif response.status_code == 400:
-                    error_data = response.json()
-                    error_code = error_data.get("error", {}).get("code", 0)
-                    error_subcode = error_data.get("error", {}).get("error_subcode", 0)
-
-                    # **Handle Rate Limit Error**
-                    if error_code == 17 or error_subcode == 2446079:
-                        attempt += 1
-                        if attempt >= self.max_retries:
-                            raise requests.exceptions.RequestException(
-                                f"Rate limit reached. Max retries ({self.max_retries}) exceeded."
-                            )
-
-                        wait_time = self.initial_wait * (2 ** (attempt - 1))
-                        print(f"Rate limit reached. Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)  # Wait and retry
-                        continue  # Restart loop
+                if method == "GET" and self.cache is not None:
+                    self.cache.store(url, params, data, response.headers.get("ETag"))
+                if stats is not None:
+                    stats.update(seconds=response.elapsed.total_seconds(), bytes=len(response.content))
+                return data
 
-                    else:
+            # **Handle Rate Limit Error**
+            if response.status_code == 400 and self._is_rate_limit_error(self._safe_json(response)):
+                attempt += 1
+                if attempt >= self.max_retries:
+                    print(f"API request failed: rate limit reached, max retries ({self.max_retries}) exceeded.")
+                    raise requests.exceptions.RequestException(
+                        f"Rate limit reached. Max retries ({self.max_retries}) exceeded."
+                    )
+
+                self._wait_for_rate_limit(attempt, use_case)
+                self.metrics.record_retry(url, method)
+                continue  # Restart loop
+
+            print(f"API request failed: {response.status_code}, {response.text}")
+            error_data = self._safe_json(response)
+            raise GraphAPIError(
+                f"Error fetching data: {response.status_code}, {response.text}",
+                status_code=response.status_code,
+                error=error_data.get("error") if isinstance(error_data, dict) else None
+            )
+
+    def fetch_batch(self, sub_requests, extend_data=True, batch_size=BATCH_SIZE):
+        """
+        Fetch many small endpoints through Graph API batch requests and save each one to its own file.
+
+        Sub-requests are packed into POSTs of up to 50 items. Every sub-response is written
+        exactly as `fetch_data` would have written it, so callers can swap an N+1 loop of
+        `fetch_data` calls for a single `fetch_batch` call without changing the output layout.
+        Only the sub-requests that failed with a transient error are sent again.
+
+        Args:
+            sub_requests (list[dict]): Items with `endpoint`, `params`, `output_dir` and `file_name` keys.
+            extend_data (bool): Whether to follow `paging.next` and save only the `data` list.
+            batch_size (int): Number of sub-requests per batch POST (capped at 50).
+
+        Returns:
+            list[dict]: Sub-requests that could not be fetched, each with an extra `error` key.
+        """
+        access_token = self._access_token()
+        batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+
+        failed = []
+        for start in range(0, len(sub_requests), batch_size):
+            failed.extend(self._fetch_batch_chunk(sub_requests[start:start + batch_size], access_token, extend_data))
+
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(sub_requests)} batched requests failed.")
+        return failed
+
+    def _fetch_batch_chunk(self, chunk, access_token, extend_data):
+        """
+        Send one batch POST and retry only its failed sub-requests.
+
+        Args:
+            chunk (list[dict]): Up to 50 sub-requests.
+            access_token (str): Token used for the whole batch.
+            extend_data (bool): See `fetch_batch`.
+
+        Returns:
+            list[dict]: Sub-requests that still failed after retries.
+        """
+        pending = list(chunk)
+        failed = []
+        attempt = 0
+        use_case = use_case_for(chunk[0]["endpoint"])
+
+        if self.cache is not None:
+            pending = []
+            for item in chunk:
+                cached, _ = self.cache.lookup(f"{URL_BASE}{item['endpoint']}", item.get("params", {}))
+                if cached is None:
+                    pending.append(item)
+                else:
+                    self._save_batch_result(item, cached, extend_data)
+
+        while pending:
+            batch = [
+                {"method": "GET", "relative_url": self._relative_url(item["endpoint"], item.get("params", {}))}
+                for item in pending
+            ]
+            response = self._send(
+                "POST",
+                URL_BASE,
+                use_case,
+                idempotent=True,  # A batch of GETs
+                data={"access_token": access_token, "batch": json.dumps(batch), "include_headers": "false"}
+            )
+
+            if response.status_code != 200:
+                error_data = self._safe_json(response)
+                if response.status_code == 400 and self._is_rate_limit_error(error_data):
+                    attempt += 1
+                    if attempt >= self.max_retries:
                         raise requests.exceptions.RequestException(
-                            f"Error fetching data: {response.status_code}, {response.text}"
+                            f"Rate limit reached. Max retries ({self.max_retries}) exceeded."
                         )
+                    self._wait_for_rate_limit(attempt, use_case)
+                    self.metrics.record_retry(URL_BASE, "POST")
+                    continue
+                raise requests.exceptions.RequestException(
+                    f"Error fetching batch: {response.status_code}, {response.text}"
+                )
+
+            retry, throttled = [], False
+            with self.metrics.timer("parse", "batch"):
+                results = response.json()
+                # Sub-requests missing from a short result list are retried like those that timed out
+                results = (results if isinstance(results, list) else [])[:len(pending)]
+                results += [None] * (len(pending) - len(results))
+                bodies = [self._safe_json(result.get("body")) if result is not None else None for result in results]
+
+            for item, result, body in zip(pending, results, bodies):
+                # A null entry means the sub-request timed out inside the batch
+                if result is None:
+                    retry.append(item)
+                    continue
 
+                if result.get("code") == 200:
+                    if self.cache is not None:
+                        self.cache.store(f"{URL_BASE}{item['endpoint']}", item.get("params", {}), body)
+                    self._save_batch_result(item, body, extend_data)
+                elif self._is_rate_limit_error(body):
+                    throttled = True
+                    retry.append(item)
+                elif result.get("code", 0) >= 500:
+                    retry.append(item)
                 else:
-                    raise requests.exceptions.RequestException(
-                        f"Error fetching data: {response.status_code}, {response.text}"
-                    )
+                    print(f"API request failed: {item['endpoint']} - {result.get('body')}")
+                    failed.append({**item, "error": body.get("error", body)})
 
-            except requests.exceptions.RequestException as e:
-                print(f"API request failed: {str(e)}")
-                raise requests.exceptions.RequestException(
-                        f"Error fetching data: {response.status_code}, {response.text}"
-                    )
+            attempt += 1
+            if retry and attempt >= self.max_retries:
+                print(f"API request failed: max retries ({self.max_retries}) exceeded for {len(retry)} batched requests.")
+                failed.extend({**item, "error": "Max retries exceeded"} for item in retry)
+                retry = []
+            if retry:
+                self.metrics.record_retry(URL_BASE, "POST", len(retry))
+            if retry and throttled:
+                self._wait_for_rate_limit(attempt, use_case)
+
+            pending = retry
+
+        return failed
+
+    def _save_batch_result(self, item, body, extend_data):
+        """
+        Save one successful sub-response, following its pagination when needed.
+
+        Args:
+            item (dict): The originating sub-request.
+            body (dict): Parsed sub-response body.
+            extend_data (bool): See `fetch_batch`.
+        """
+        if not extend_data:
+            self._write_to_file(item["output_dir"], item["file_name"], {"data": body})
+            return
+
+        next_url = body.get("paging", {}).get("next")
+        if next_url:
+            # Rare for per-entity endpoints; hand the remaining pages to the regular paginator
+            self.fetch_data(
+                endpoint=item["endpoint"],
+                params=dict(item.get("params", {})),
+                output_dir=item["output_dir"],
+                file_name=item["file_name"]
+            )
+            return
+
+        self._write_to_file(item["output_dir"], item["file_name"], {"data": body.get("data", [])})
 
-        # Save all the fetched data to the file
-        self.__write_to_file(output_dir, file_name, {"data": all_data})
+    def _send(self, method, url, use_case, idempotent=None, **kwargs):
+        """
+        Send one HTTP request through the shared session, retrying transient errors.
+
+        5xx responses, timeouts and connection errors of idempotent requests (GETs, and batch
+        POSTs of GETs) are retried as the retry policy allows; the last response or error is
+        returned or raised once it does not. A 5xx asking for less data is returned at once,
+        for the page sizer or window bisection to act on. GETs may be hedged (see `_send_hedged`).
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute request URL.
+            use_case (str): Business use case the request counts against.
+            idempotent (bool, optional): Whether the request may be sent again; True for GETs by default.
+            **kwargs: Extra arguments for `requests.Session.request`.
+
+        Returns:
+            requests.Response: The raw response.
 
-    def __write_to_file(self, output_dir, file_name, data):
+        Raises:
+            CircuitOpenError: If the endpoint family's circuit is open.
+            requests.exceptions.RequestException: If the request failed without a response.
+        """
+        family = endpoint_label(url)
+        idempotent = method == "GET" if idempotent is None else idempotent
+        self.retry_policy.budget.record_request()
+        attempt, wait_time = 0, None
+
+        while True:
+            self.retry_policy.before_request(family)
+            start, transient = time.perf_counter(), True
+            try:  # Any exception counts as a failure, so a circuit's probe can never stay out forever
+                try:
+                    if method == "GET":
+                        response = self._send_hedged(method, url, use_case, family, **kwargs)
+                    else:
+                        response = self._send_once(method, url, use_case, **kwargs)
+                    error = None
+                except TRANSIENT_EXCEPTIONS as e:
+                    response, error = None, e
+                transient = error is not None or self._is_transient_error(response.status_code, response.content)
+            finally:
+                self.retry_policy.record(family, not transient, time.perf_counter() - start)
+            if not transient:
+                return response
+
+            attempt += 1
+            wait_time = self.retry_policy.backoff(attempt, wait_time) if idempotent else None
+            if wait_time is None:
+                if error is not None:
+                    raise error
+                return response
+
+            print(f"Transient error on {family} ({error or response.status_code}), "
+                  f"retry {attempt} in {wait_time:.1f} seconds...")
+            self.metrics.record_retry(url, method)
+            time.sleep(wait_time)
+
+    def _send_hedged(self, method, url, use_case, family, **kwargs):
+        """
+        Send a request, and send it a second time if it is still unanswered after the hedging
+        delay of its family; the first successful response wins and the other is discarded.
+        Both take a request slot; no hedge is sent while every slot is taken, as it could only queue.
+
+        Returns:
+            requests.Response: The raw response.
+        """
+        delay = self.retry_policy.hedge_delay(family)
+        if delay is None:
+            return self._send_once(method, url, use_case, **kwargs)
+
+        executor = self.retry_policy.executor
+        primary = executor.submit(self._send_once, method, url, use_case, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or self.request_slots.saturated or not self.retry_policy.budget.try_spend():
+            return primary.result()
+
+        self.metrics.record_hedge(url, method)
+        hedge = executor.submit(self._send_once, method, url, use_case, **kwargs)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is None and first.result().status_code < 500:
+            return first.result()
+        return (hedge if first is primary else primary).result()
+
+    def _send_once(self, method, url, use_case, **kwargs):
+        """
+        Send one HTTP request through the shared session, paced by the rate governor, once one
+        of the process-wide request slots is free.
+        Its latency, size and the time spent waiting for the governor are recorded in the run metrics.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute request URL.
+            use_case (str): Business use case the request counts against.
+            **kwargs: Extra arguments for `requests.Session.request`.
+
+        Returns:
+            requests.Response: The raw response.
+        """
+        self.metrics.record_throttle_wait(use_case, self.rate_governor.acquire(use_case, self.rate_scope))
+        with self.request_slots, self.metrics.request(url, method) as sample:
+            response = self.session.request(method, url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), **kwargs)
+            body = response.request.body or b""
+            sample.update(
+                status=response.status_code,
+                bytes_in=len(response.content),
+                bytes_out=len(response.request.url) + len(body.encode() if isinstance(body, str) else body)
+            )
+        self.rate_governor.update(response.headers, self.rate_scope)
+        return response
+
+    def _wait_for_rate_limit(self, attempt, use_case):
+        """
+        Pause a use case after a rate-limit error.
+
+        The governor blocks every worker for the time the usage headers said access would be
+        regained; exponential backoff from `initial_wait` is only used when no header said so.
+        The wait itself happens in the next `RateGovernor.acquire` call.
+        """
+        wait_time = self.rate_governor.throttled(
+            use_case, self.initial_wait * (2 ** (attempt - 1)), self.rate_scope)
+        print(f"Rate limit reached. Retrying in {wait_time:.0f} seconds...")
+
+    def _access_token(self):
+        """Return the client's access token (or the one from the environment), failing fast when it is missing."""
+        access_token = self.access_token or os.getenv("ACCESS_TOKEN", '')
+        if not access_token:
+            raise EnvironmentError("Access token is not set.")
+        return access_token
+
+    @staticmethod
+    def _relative_url(endpoint, params):
+        """Build the `relative_url` of a batch sub-request."""
+        query = urlencode({key: value for key, value in params.items() if key != "access_token"})
+        return f"{endpoint}?{query}" if query else endpoint
+
+    @staticmethod
+    def _is_rate_limit_error(error_data):
+        """Check whether a Graph API error payload is a rate-limit error."""
+        error = error_data.get("error", {}) if isinstance(error_data, dict) else {}
+        return (error.get("code", 0) in RATE_LIMIT_ERROR_CODES
+                or error.get("error_subcode", 0) in RATE_LIMIT_ERROR_SUBCODES)
+
+    @staticmethod
+    def _is_transient_error(status_code, content):
+        """Check whether a response is a server error worth retrying; 5xx errors asking for less data are not."""
+        if status_code < 500:
+            return False
+        error_data = GraphAPIClient._safe_json(content)
+        return not GraphAPIError("", error=error_data.get("error") if isinstance(error_data, dict) else None).page_too_large
+
+    @staticmethod
+    def _safe_json(payload):
+        """Parse a response or a JSON string, returning an empty dict when it is not valid JSON."""
+        try:
+            if isinstance(payload, requests.Response):
+                return payload.json()
+            return json.loads(payload) if payload else {}
+        except ValueError:
+            return {}
+
+    def __stream_to_file(self, endpoint, params, output_dir, file_name):
+        """
+        Write each page's records to disk as soon as the page arrives.
+
+        In ndjson mode the records go straight to the output file, so memory stays at about
+        two pages regardless of the result size: the next page is prefetched while the
+        current one is serialized. The file is written under a temporary name and renamed
+        into place only once the last page has been written.
+
+        With a checkpoint journal, the position after every page is recorded; a restarted run
+        continues from the saved `paging.next` cursor instead of the first page. In json mode
+        the pages are spooled to `{file_name}.pages.ndjson` and the usual JSON document is
+        streamed from the spool at the end, one record at a time.
+
+        Args:
+            endpoint (str): API endpoint to query.
+            params (dict): Query parameters for the first request.
+            output_dir (str): Directory where the file will be saved.
+            file_name (str): Name the non-streaming writer would use; in ndjson mode the
+                extension becomes `.ndjson` (or `.ndjson.gz`).
+        """
+        streamed = self.output_format == "ndjson"
+        if streamed:
+            file_path = spool_path = os.path.join(output_dir, streamed_file_name(file_name, self.compression))
+            compression = self.compression
+        else:
+            file_path = os.path.join(output_dir, file_name)
+            spool_path, compression = f"{file_path}.pages.ndjson", ""
+
+        cursor, resume_records = None, None
+        if self.checkpoints is not None:
+            cursor = self.checkpoints.cursor(file_path)
+            if cursor and not os.path.exists(f"{spool_path}.part"):
+                cursor = None  # The spooled pages are gone, so start over
+            resume_records = cursor["records"] if cursor else 0
+            if cursor:
+                print(f"🔄 Resuming {file_name} after {cursor['records']} records...")
+
+        with NDJSONWriter(spool_path, compression, resume_records, self.changes if streamed else None) as writer:
+            for data in self.iter_pages(endpoint, params, prefetch=True, start_url=cursor and cursor["next"]):
+                with self.metrics.timer("write", "ndjson"):
+                    writer.write_records(data.get("data", []))
+                next_url = data.get("paging", {}).get("next")
+                if self.checkpoints is not None and next_url:
+                    self.checkpoints.save_cursor(file_path, next_url, writer.records)
+
+        if self.checkpoints is not None:
+            self.checkpoints.clear_cursor(file_path)
+
+        if not streamed and writer.records:
+            with self.metrics.timer("write", "json"):
+                _, status = write_json_from_ndjson(spool_path, file_path, self.changes)
+            os.remove(spool_path)
+            if status == UNCHANGED:
+                print(f"➖ {writer.records} records unchanged in {file_path}")
+            else:
+                print(f"✅ Data successfully saved to {file_path}")
+        elif writer.status == UNCHANGED:
+            print(f"➖ {writer.records} records unchanged in {file_path}")
+        elif writer.records:
+            print(f"✅ {writer.records} records successfully streamed to {file_path}")
+        else:
+            print(f"⚠️ No data found. Skipping file creation for {file_name}")
+
+    def _write_to_file(self, output_dir, file_name, data):
         """
         Save data to a JSON file in the specified output directory.
+        Directories handled by the segment store get a record appended instead.
+        With a change index, data identical to what was last written there is not written again.
         
         Args:
             output_dir (str): Directory where the file will be saved.
@@ -105,10 +716,26 @@ class GraphAPIClient:
             print(f"⚠️ No data found. Skipping file creation for {file_name}")
             return  # Exit the function without writing
 
-        os.makedirs(output_dir, exist_ok=True)  # Ensure the directory exists
-
         file_path = os.path.join(output_dir, file_name)
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(data, file, indent=4)
+        segment = self.segments is not None and self.segments.handles(output_dir)
+        digest = status = None
+        if self.changes is not None:
+            with self.metrics.timer("write", "hash"):
+                digest = content_hash(data)
+            exists = bool(self.segments.partitions(output_dir)) if segment else os.path.exists(file_path)
+            status = self.changes.status(file_path, digest, exists)
+            if status == UNCHANGED:
+                self.changes.record(file_path, digest, record_count(data), status, segment)
+                return
+
+        if segment:
+            with self.metrics.timer("write", "segment"):
+                self.segments.append(output_dir, file_name, data)
+        else:
+            os.makedirs(output_dir, exist_ok=True)  # Ensure the directory exists
+            with self.metrics.timer("write", "json"), open(file_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, indent=4)
+            print(f"✅ Data successfully saved to {file_path}")
 
-        print(f"✅ Data successfully saved to {file_path}")
+        if self.changes is not None:
+            self.changes.record(file_path, digest, record_count(data), status, segment)
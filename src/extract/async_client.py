@@ -0,0 +1,465 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+import requests
+
+from config.config import ASYNC_MAX_CONCURRENCY, BATCH_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, URL_BASE
+from extract.api_client import MAX_BATCH_SIZE, GraphAPIClient, GraphAPIError
+from extract.page_sizer import page_family, page_limit, resizable, with_limit
+from extract.rate_limiter import use_case_for
+from utils.run_metrics import endpoint_label
+
+try:
+    import aiohttp
+except ImportError:  # Optional: only the async engine (ETL_ENGINE=async) needs it
+    aiohttp = None
+
+
+def require_aiohttp():
+    """
+    Fail fast when the async engine was selected without aiohttp installed.
+
+    Raises:
+        RuntimeError: If aiohttp is not installed.
+    """
+    if aiohttp is None:
+        raise RuntimeError("ETL_ENGINE=async requires aiohttp; install it with `pip install aiohttp`.")
+
+
+def create_async_session(max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """
+    Create the aiohttp session shared by every async client of a run.
+
+    Must be called from a running event loop; close it with `await session.close()`
+    (or use it as an async context manager).
+
+    Args:
+        max_concurrency (int): Most connections kept open at once.
+
+    Returns:
+        aiohttp.ClientSession: Session with gzip enabled and keep-alive connections.
+
+    Raises:
+        RuntimeError: If aiohttp is not installed.
+    """
+    require_aiohttp()
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_concurrency),
+        headers={"Accept-Encoding": "gzip, deflate"},
+        timeout=aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+    )
+
+
+class AsyncResponse:
+    """The parts of an aiohttp response the client needs once the body has been read."""
+
+    __slots__ = ("status_code", "headers", "content", "seconds")
+
+    def __init__(self, status_code, headers, content, seconds=0.0):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.seconds = seconds  # Time from sending the request to having read the body
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncGraphAPIClient:
+    """
+    asyncio counterpart of `GraphAPIClient` for one tenant.
+
+    Wraps the tenant's sync client, whose token, checkpoint journal, response cache and file
+    writers it reuses, so both engines write identical files. Requests go through a shared
+    aiohttp session; the process-wide request slots of the sync clients bound how many are in
+    flight, counting the requests of sync code run in threads too, and the rate governor
+    paces them without blocking the event loop. File writes and state saves run in threads.
+
+    Unlike the sync client it does not stream: every page of a result is kept in memory and the
+    file is written once the last page arrived (in the same format, NDJSON included), and
+    pagination cursors are not journaled, so an interrupted run resumes from the last completed
+    interval rather than mid-pagination.
+    """
+
+    def __init__(self, client, session):
+        self.client = client  # Sync client of the tenant: token, cache, checkpoints and file output
+        self.session = session  # aiohttp.ClientSession shared by every tenant
+        self.request_slots = client.request_slots  # RequestSlots shared with every thread of the process
+        self.tenant = client.tenant
+        self.checkpoints = client.checkpoints
+        self.cache = client.cache
+        self.rate_governor = client.rate_governor
+        self.metrics = client.metrics
+        self.max_retries = client.max_retries
+        self.retry_policy = client.retry_policy
+        self.page_sizer = client.page_sizer
+
+    async def fetch_data(self, endpoint, params, output_dir, file_name, extend_data=True):
+        """
+        Fetch every page of an endpoint and save it like `GraphAPIClient.fetch_data`.
+
+        Args:
+            endpoint (str): API endpoint to query.
+            params (dict): Query parameters to include in the request.
+            output_dir (str): Directory where the output file will be saved.
+            file_name (str): Name of the file to save the fetched data.
+            extend_data (bool): Whether to follow pagination and save only the `data` lists.
+        """
+        with self.metrics.timer("fetch_data", endpoint_label(endpoint)):
+            if extend_data:
+                all_data = []
+                async for data in self.iter_pages(endpoint, params):
+                    all_data.extend(data.get("data", []))
+                await self.save_data(output_dir, file_name, {"data": all_data})
+                return
+
+            async for data in self.iter_pages(endpoint, params, paginate=False):
+                await self.write_to_file(output_dir, file_name, {"data": data})
+
+    async def iter_pages(self, endpoint, params, paginate=True):
+        """
+        Yield each raw response page of an endpoint, following `paging.next` links.
+
+        Args:
+            endpoint (str): API endpoint to query.
+            params (dict): Query parameters for the first request.
+            paginate (bool): Whether to follow `paging.next` after the first page.
+
+        Yields:
+            dict: Parsed JSON body of each page.
+        """
+        family = page_family(endpoint, params) if self.page_sizer is not None and "limit" in params else None
+        url = f"{URL_BASE}{endpoint}"
+        params = {**params, "access_token": self.client._access_token()}
+        use_case = use_case_for(endpoint)
+
+        while url:
+            data = await self._request_page(url, params, use_case, family)
+            self.metrics.record_page(endpoint)
+            yield data
+            url = data.get("paging", {}).get("next") if paginate else None
+            params = {}  # The next URL already carries every query parameter
+
+    async def save_data(self, output_dir, file_name, data):
+        """Save already-fetched data with the same layout as `GraphAPIClient.save_data`, in a thread."""
+        await asyncio.to_thread(self.client.save_data, output_dir, file_name, data)
+
+    async def write_to_file(self, output_dir, file_name, data):
+        """Write one output file like `GraphAPIClient._write_to_file`, in a thread."""
+        await asyncio.to_thread(self.client._write_to_file, output_dir, file_name, data)
+
+    async def fetch_batch(self, sub_requests, extend_data=True, batch_size=BATCH_SIZE):
+        """
+        Fetch many small endpoints through batch requests, sending every batch concurrently.
+
+        Args:
+            sub_requests (list[dict]): Items with `endpoint`, `params`, `output_dir` and `file_name` keys.
+            extend_data (bool): Whether to follow `paging.next` and save only the `data` list.
+            batch_size (int): Number of sub-requests per batch POST (capped at 50).
+
+        Returns:
+            list[dict]: Sub-requests that could not be fetched, each with an extra `error` key.
+        """
+        access_token = self.client._access_token()
+        batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+        chunks = [sub_requests[start:start + batch_size] for start in range(0, len(sub_requests), batch_size)]
+
+        failed = []
+        results = await asyncio.gather(
+            *(self._fetch_batch_chunk(chunk, access_token, extend_data) for chunk in chunks), return_exceptions=True)
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                failed.extend({**item, "error": str(result)} for item in chunk)
+            else:
+                failed.extend(result)
+
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(sub_requests)} batched requests failed.")
+        return failed
+
+    async def _fetch_batch_chunk(self, chunk, access_token, extend_data):
+        """
+        Send one batch POST and retry only its failed sub-requests, like `GraphAPIClient._fetch_batch_chunk`.
+
+        Returns:
+            list[dict]: Sub-requests that still failed after retries.
+        """
+        pending = list(chunk)
+        failed = []
+        attempt = 0
+        use_case = use_case_for(chunk[0]["endpoint"])
+
+        if self.cache is not None:
+            pending = []
+            for item in chunk:
+                cached, _ = await asyncio.to_thread(
+                    self.cache.lookup, f"{URL_BASE}{item['endpoint']}", item.get("params", {}))
+                if cached is None:
+                    pending.append(item)
+                else:
+                    await self._save_batch_result(item, cached, extend_data)
+
+        while pending:
+            batch = [
+                {"method": "GET", "relative_url": GraphAPIClient._relative_url(item["endpoint"], item.get("params", {}))}
+                for item in pending
+            ]
+            response = await self._send(
+                "POST",
+                URL_BASE,
+                use_case,
+                data={"access_token": access_token, "batch": json.dumps(batch), "include_headers": "false"}
+            )
+
+            if response.status_code != 200:
+                error_data = GraphAPIClient._safe_json(response.content)
+                if response.status_code == 400 and GraphAPIClient._is_rate_limit_error(error_data):
+                    attempt += 1
+                    if attempt >= self.max_retries:
+                        raise requests.exceptions.RequestException(
+                            f"Rate limit reached. Max retries ({self.max_retries}) exceeded."
+                        )
+                    self.client._wait_for_rate_limit(attempt, use_case)
+                    self.metrics.record_retry(URL_BASE, "POST")
+                    continue
+                raise requests.exceptions.RequestException(
+                    f"Error fetching batch: {response.status_code}, {response.text}"
+                )
+
+            retry, throttled = [], False
+            with self.metrics.timer("parse", "batch"):
+                results = response.json()
+                # Sub-requests missing from a short result list are retried like those that timed out
+                results = (results if isinstance(results, list) else [])[:len(pending)]
+                results += [None] * (len(pending) - len(results))
+                bodies = [
+                    GraphAPIClient._safe_json(result.get("body")) if result is not None else None for result in results
+                ]
+
+            for item, result, body in zip(pending, results, bodies):
+                # A null entry means the sub-request timed out inside the batch
+                if result is None:
+                    retry.append(item)
+                    continue
+
+                if result.get("code") == 200:
+                    if self.cache is not None:
+                        await asyncio.to_thread(
+                            self.cache.store, f"{URL_BASE}{item['endpoint']}", item.get("params", {}), body)
+                    await self._save_batch_result(item, body, extend_data)
+                elif GraphAPIClient._is_rate_limit_error(body):
+                    throttled = True
+                    retry.append(item)
+                elif result.get("code", 0) >= 500:
+                    retry.append(item)
+                else:
+                    print(f"API request failed: {item['endpoint']} - {result.get('body')}")
+                    failed.append({**item, "error": body.get("error", body)})
+
+            attempt += 1
+            if retry and attempt >= self.max_retries:
+                print(f"API request failed: max retries ({self.max_retries}) exceeded for {len(retry)} batched requests.")
+                failed.extend({**item, "error": "Max retries exceeded"} for item in retry)
+                retry = []
+            if retry:
+                self.metrics.record_retry(URL_BASE, "POST", len(retry))
+            if retry and throttled:
+                self.client._wait_for_rate_limit(attempt, use_case)
+
+            pending = retry
+
+        return failed
+
+    async def _save_batch_result(self, item, body, extend_data):
+        """Save one successful sub-response, following its pagination when needed."""
+        if not extend_data:
+            await self.write_to_file(item["output_dir"], item["file_name"], {"data": body})
+            return
+
+        if body.get("paging", {}).get("next"):
+            # Rare for per-entity endpoints; hand the remaining pages to the regular paginator
+            await self.fetch_data(
+                endpoint=item["endpoint"],
+                params=dict(item.get("params", {})),
+                output_dir=item["output_dir"],
+                file_name=item["file_name"]
+            )
+            return
+
+        await self.write_to_file(item["output_dir"], item["file_name"], {"data": body.get("data", [])})
+
+    async def _request_page(self, url, params, use_case, family):
+        """
+        Request one page with the learned page size of its family (see `GraphAPIClient._request_page`).
+
+        Returns:
+            dict: Parsed JSON response.
+        """
+        limit = page_limit(url, params) if family is not None else None
+        if limit is None:
+            return await self._request_json(url, params, use_case)
+
+        if resizable(url, params):
+            limit = self.page_sizer.limit_for(family, limit)
+        while True:
+            url, params = with_limit(url, params, limit)
+            stats = {}
+            try:
+                data = await self._request_json(url, params, use_case, stats=stats)
+            except GraphAPIError as e:
+                limit = await asyncio.to_thread(self.page_sizer.shrink, family, limit) if e.page_too_large else None
+                if limit is None:
+                    raise
+                print(f"Page of {family} too large, retrying with limit={limit}...")
+                continue
+            if stats:
+                await asyncio.to_thread(  # Saves the learned size to disk when it changes
+                    self.page_sizer.observe, family, limit, len(data.get("data", [])), stats["seconds"], stats["bytes"])
+            return data
+
+    async def _request_json(self, url, params, use_case, method="GET", stats=None):
+        """
+        Perform one request, retrying while the API reports a rate limit.
+        `stats` (optional) is filled with the `seconds` and `bytes` of a response that came from the API.
+
+        Returns:
+            dict: Parsed JSON response.
+
+        Raises:
+            GraphAPIError: If the API answers with an error other than a rate limit.
+            requests.exceptions.RequestException: If the rate limit persists after retries or the request fails.
+        """
+        attempt = 0
+
+        stale, headers = None, {}
+        if method == "GET" and self.cache is not None:
+            cached, stale = await asyncio.to_thread(self.cache.lookup, url, params)
+            if cached is not None:
+                return cached
+            if stale:
+                headers["If-None-Match"] = stale["etag"]  # Revalidate instead of refetching
+
+        while True:
+            if method == "POST":
+                response = await self._send("POST", url, use_case, data=params)
+            else:
+                response = await self._send("GET", url, use_case, params=params, headers=headers)
+
+            if response.status_code == 304 and stale:
+                await asyncio.to_thread(self.cache.touch, url, params, stale)
+                return stale["body"]
+
+            if response.status_code == 200:
+                with self.metrics.timer("parse", endpoint_label(url)):
+                    data = response.json()
+                if method == "GET" and self.cache is not None:
+                    await asyncio.to_thread(self.cache.store, url, params, data, response.headers.get("ETag"))
+                if stats is not None:
+                    stats.update(seconds=response.seconds, bytes=len(response.content))
+                return data
+
+            error_data = GraphAPIClient._safe_json(response.content)
+            if response.status_code == 400 and GraphAPIClient._is_rate_limit_error(error_data):
+                attempt += 1
+                if attempt >= self.max_retries:
+                    print(f"API request failed: rate limit reached, max retries ({self.max_retries}) exceeded.")
+                    raise requests.exceptions.RequestException(
+                        f"Rate limit reached. Max retries ({self.max_retries}) exceeded."
+                    )
+
+                self.client._wait_for_rate_limit(attempt, use_case)
+                self.metrics.record_retry(url, method)
+                continue
+
+            print(f"API request failed: {response.status_code}, {response.text}")
+            raise GraphAPIError(
+                f"Error fetching data: {response.status_code}, {response.text}",
+                status_code=response.status_code,
+                error=error_data.get("error") if isinstance(error_data, dict) else None
+            )
+
+    async def _send(self, method, url, use_case, params=None, data=None, headers=None):
+        """
+        Send one HTTP request, retrying transient errors of GETs and batches like `GraphAPIClient._send`
+        (without hedging: the event loop already keeps many requests in flight).
+
+        Returns:
+            AsyncResponse: Status, headers and body of the response.
+
+        Raises:
+            CircuitOpenError: If the endpoint family's circuit is open.
+            requests.exceptions.RequestException: If the request failed without a response.
+        """
+        family = endpoint_label(url)
+        idempotent = method == "GET" or url == URL_BASE
+        self.retry_policy.budget.record_request()
+        attempt, wait_time = 0, None
+
+        while True:
+            self.retry_policy.before_request(family)
+            start, transient = time.perf_counter(), True
+            try:  # Any exception (or cancellation) counts as a failure, so a circuit's probe is always released
+                try:
+                    response = await self._send_once(method, url, use_case, params, data, headers)
+                    error = None
+                except requests.exceptions.RequestException as e:
+                    response, error = None, e
+                transient = error is not None or GraphAPIClient._is_transient_error(
+                    response.status_code, response.content)
+            finally:
+                self.retry_policy.record(family, not transient, time.perf_counter() - start)
+            if not transient:
+                return response
+
+            attempt += 1
+            wait_time = self.retry_policy.backoff(attempt, wait_time) if idempotent else None
+            if wait_time is None:
+                if error is not None:
+                    raise error
+                return response
+
+            print(f"Transient error on {family} ({error or response.status_code}), "
+                  f"retry {attempt} in {wait_time:.1f} seconds...")
+            self.metrics.record_retry(url, method)
+            await asyncio.sleep(wait_time)
+
+    async def _send_once(self, method, url, use_case, params=None, data=None, headers=None):
+        """
+        Send one HTTP request once the rate governor allows it and a request slot is free.
+        Its latency, size and the time spent waiting for the governor are recorded in the run metrics.
+
+        Returns:
+            AsyncResponse: Status, headers and body of the response.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails without a response.
+        """
+        wait_time = self.rate_governor.reserve(use_case, self.client.rate_scope)
+        self.metrics.record_throttle_wait(use_case, wait_time)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+        async with self.request_slots:
+            with self.metrics.request(url, method) as sample:
+                start = time.perf_counter()
+                try:
+                    async with self.session.request(method, url, params=params, data=data, headers=headers) as reply:
+                        response = AsyncResponse(
+                            reply.status, reply.headers, await reply.read(), time.perf_counter() - start)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    print(f"API request failed: {e!r}")
+                    raise requests.exceptions.RequestException(str(e)) from e
+                sample.update(
+                    status=response.status_code,
+                    bytes_in=len(response.content),
+                    bytes_out=len(url) + len(urlencode(params or {})) + len(urlencode(data or {}))
+                )
+
+        self.rate_governor.update(response.headers, self.client.rate_scope)
+        return response
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config import HTTP_POOL_SIZE
+
+_session = None
+_pool_size = 0
+_slots = None
+_lock = threading.Lock()
+
+
+class RequestSlots:
+    """
+    Process-wide limit on the HTTP requests in flight, shared by threads and asyncio tasks.
+
+    Every request holds a slot while it is on the wire, whichever pool, nested executor, hedge
+    or `asyncio.to_thread` call sent it, so the process never has more requests open than the
+    connection pool serves. Waiters are admitted first come, first served: threads with
+    `with slots:`, coroutines with `async with slots:`.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_flight = 0
+        self._waiters = deque()  # (event loop or None for a thread, asyncio.Future or threading.Event)
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self):
+        """Whether every slot is taken, so a new request would have to wait."""
+        with self._lock:
+            return self._in_flight >= self.limit or bool(self._waiters)
+
+    def acquire(self):
+        """Block the calling thread until a slot is free and take it."""
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()  # Set once `release` handed the slot over
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot is free and take it."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)  # Not admitted yet; otherwise `_hand_over` gives the slot back
+            raise
+
+    def release(self):
+        """Give a slot back, handing it to the longest waiter if there is one."""
+        with self._lock:
+            self._in_flight -= 1
+            admitted = self._admit()
+        self._wake(admitted)
+
+    def resize(self, limit):
+        """Change the limit; requests already in flight above a lower limit finish normally."""
+        with self._lock:
+            self.limit = limit
+            admitted = self._admit()
+        self._wake(admitted)
+
+    def _admit(self):
+        """Take a slot for each waiter that fits under the limit. Must be called with the lock held."""
+        admitted = []
+        while self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            admitted.append(self._waiters.popleft())
+        return admitted
+
+    def _wake(self, admitted):
+        for loop, waiter in admitted:
+            if loop is None:
+                waiter.set()
+            else:
+                loop.call_soon_threadsafe(self._hand_over, waiter)
+
+    def _hand_over(self, future):
+        """Resolve an admitted coroutine's future on its loop, or pass the slot on if it was cancelled meanwhile."""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def get_session(pool_size=HTTP_POOL_SIZE):
+    """
+    Return the process-wide pooled HTTP session used for every Graph API call.
+
+    The session keeps connections to graph.facebook.com alive between requests, so each
+    page or batch reuses an open TCP+TLS connection instead of paying a new handshake.
+    Asking for a larger pool than the current one (e.g. from a bigger thread pool) grows it.
+
+    Args:
+        pool_size (int): Minimum number of connections kept open per host.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session, _pool_size
+
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive"
+            })
+
+        if pool_size > _pool_size:
+            # Retries are handled by GraphAPIClient, so the adapter must not retry on its own
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _pool_size = pool_size
+
+        return _session
+
+
+def get_request_slots():
+    """
+    Return the process-wide limit on requests in flight.
+
+    It starts at HTTP_POOL_SIZE, the size of the session pool; the async engine resizes it to
+    ASYNC_MAX_CONCURRENCY.
+
+    Returns:
+        RequestSlots: The shared slots.
+    """
+    global _slots
+
+    with _lock:
+        if _slots is None:
+            _slots = RequestSlots(HTTP_POOL_SIZE)
+        return _slots
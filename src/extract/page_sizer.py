@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import fcntl  # POSIX only; concurrent processes may overwrite each other's updates where it is unavailable
+except ImportError:
+    fcntl = None
+
+from config.config import (
+    PAGE_SIZE_CEILING_DAYS, PAGE_SIZE_CEILING_PAGES, PAGE_SIZE_MAX, PAGE_SIZE_MAX_MB, PAGE_SIZE_MIN,
+    PAGE_SIZE_TARGET_SECONDS
+)
+from utils.run_metrics import endpoint_label
+
+# Graph API error code of an invalid parameter, used when `limit` is above what an edge accepts
+INVALID_PARAMETER_CODE = 100
+
+# Weight of the newest page in the moving average of a family's cost per record
+COST_SMOOTHING = 0.3
+
+
+def page_family(endpoint, params):
+    """
+    Return the key page sizes are learned under, e.g. "{id}/feed" or "act_{id}/insights?level=ad".
+
+    Insights levels return rows of very different sizes, so each level is tuned on its own.
+    """
+    family = endpoint_label(endpoint)
+    return f"{family}?level={params['level']}" if params.get("level") else family
+
+
+def page_limit(url, params):
+    """Return the `limit` of a request, from its parameters or its URL (a `paging.next` link), or None."""
+    value = params.get("limit") or dict(parse_qsl(urlsplit(url).query)).get("limit")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def resizable(url, params):
+    """
+    Whether the page size of a request may be changed: always on a first page, and on a
+    `paging.next` link only when it pages by `after` cursor.
+
+    A cursor marks the last record returned, so the next page starts after it whatever its size.
+    Offset and time-based links were computed by the API from the size they were issued with,
+    so they are followed unchanged.
+    """
+    return "limit" in params or "after" in dict(parse_qsl(urlsplit(url).query))
+
+
+def with_limit(url, params, limit):
+    """
+    Return the URL and parameters of a request with its `limit` replaced.
+
+    Args:
+        url (str): Request URL; a `paging.next` link carries the limit in its query.
+        params (dict): Request parameters.
+        limit (int): New page size.
+
+    Returns:
+        tuple[str, dict]: `(url, params)`.
+    """
+    if "limit" in params:
+        return url, {**params, "limit": limit}
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    if "limit" not in query:
+        return url, params
+    query["limit"] = str(limit)
+    return urlunsplit(parts._replace(query=urlencode(query))), params
+
+
+def limit_rejected(error):
+    """Whether a GraphAPIError rejected the `limit` parameter itself (above the maximum of the edge)."""
+    return error.error.get("code") == INVALID_PARAMETER_CODE and "limit" in str(error.error.get("message", "")).lower()
+
+
+class PageSizer:
+    """
+    Learns the `limit` of paginated requests per endpoint family and remembers it across runs.
+
+    Callers opt in by passing a `limit`, which is the starting size of its family. Every full
+    page fetched from the API (not from the cache) updates a moving average of the family's
+    response time and size per record, from which the cost of a page is projected:
+    - when a page twice as large would stay under `target_seconds` and `max_bytes`, the limit doubles;
+    - when a page of the current size exceeds either, it halves.
+    Smoothing keeps a single slow page from shrinking the size; the last, partial page of a
+    result says little about full pages and is ignored.
+    A rejected page ("too much data", or a `limit` above what the edge accepts) halves the limit
+    before the page is asked for again, and the halved size becomes the family's ceiling so it
+    does not grow straight back into the rejection. A ceiling is lifted after `ceiling_days`, or
+    once `ceiling_pages` full pages at it were fast and small enough to grow: the data or the API
+    may have changed since. Sizes stay between `minimum` and `maximum`; deleting the state file
+    starts over from the callers' sizes.
+
+    State is one JSON file per tenant, updated whenever a size changes; each update is merged into
+    the file under a file lock, so the workers of a distributed run can share it.
+    """
+
+    def __init__(self, file_path, minimum=PAGE_SIZE_MIN, maximum=PAGE_SIZE_MAX, target_seconds=PAGE_SIZE_TARGET_SECONDS,
+                 max_bytes=PAGE_SIZE_MAX_MB * 1024 * 1024, ceiling_days=PAGE_SIZE_CEILING_DAYS,
+                 ceiling_pages=PAGE_SIZE_CEILING_PAGES):
+        self.file_path = str(file_path)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.ceiling_days = ceiling_days
+        self.ceiling_pages = ceiling_pages
+        self._lock = threading.Lock()
+        self._sizes = self._load()
+        self._costs = {}  # Family -> moving average of (seconds, bytes) per record in this run
+        self._clean = {}  # Family -> full pages at its ceiling that were cheap enough to grow, in this run
+
+    def limit_for(self, family, default):
+        """
+        Return the page size to request for a family.
+
+        Args:
+            family (str): Endpoint family (see `page_family`).
+            default (int): The caller's `limit`, used until the family has a learned size.
+
+        Returns:
+            int: Page size.
+        """
+        with self._lock:
+            entry = self._sizes.get(family)
+        return max(self.minimum, min(self.maximum, entry["limit"])) if entry else default
+
+    def observe(self, family, limit, rows, seconds, size):
+        """
+        Adjust a family's page size from one page fetched from the API (see the class docstring).
+
+        Args:
+            family (str): Endpoint family.
+            limit (int): Page size the page was requested with.
+            rows (int): Records on the page.
+            seconds (float): Response time.
+            size (int): Response body size in bytes.
+        """
+        if not limit or rows < limit:
+            return
+        with self._lock:
+            cost = (seconds / rows, size / rows)
+            if family in self._costs:
+                cost = tuple(COST_SMOOTHING * new + (1 - COST_SMOOTHING) * old
+                             for new, old in zip(cost, self._costs[family]))
+            self._costs[family] = cost
+        seconds, size = cost[0] * limit, cost[1] * limit  # Projected cost of a full page
+
+        if seconds > self.target_seconds or size > self.max_bytes:
+            self._update(family, max(self.minimum, limit // 2), limit, shrink=True)
+        elif 2 * seconds <= self.target_seconds and 2 * size <= self.max_bytes:
+            self._update(family, limit * 2, limit, shrink=False)
+
+    def shrink(self, family, limit):
+        """
+        Halve a family's page size and cap it there after the API rejected a page as too large.
+
+        Args:
+            family (str): Endpoint family.
+            limit (int): Page size the rejected page was requested with.
+
+        Returns:
+            int | None: Page size to ask again with; None when it cannot shrink any further.
+        """
+        smaller = max(self.minimum, limit // 2)
+        if smaller >= limit:
+            return None
+        self._update(family, smaller, limit, shrink=True, ceiling=True)
+        return smaller
+
+    def summary(self):
+        """Return the learned page size of every family."""
+        with self._lock:
+            return {family: entry["limit"] for family, entry in sorted(self._sizes.items())}
+
+    def _update(self, family, limit, previous, shrink, ceiling=False):
+        """Move a family's size to `limit` unless a concurrent page already moved it further, then save."""
+        with self._lock:
+            entry = dict(self._sizes.get(family) or {"limit": previous})
+            lifted = "ceiling" in entry and (self._ceiling_expired(entry) or (
+                not shrink and limit > entry["ceiling"] and self._count_clean(family)))
+            if lifted:
+                logging.info(f"Page size ceiling of {family} at {entry['ceiling']} lifted")
+                entry.pop("ceiling")
+                entry.pop("ceiling_at", None)
+            if ceiling:
+                entry["ceiling"] = min(limit, entry.get("ceiling", limit))
+                entry["ceiling_at"] = date.today().isoformat()
+                self._clean.pop(family, None)
+            limit = min(limit, self.maximum, entry.get("ceiling", self.maximum))
+            moved = limit < entry["limit"] if shrink else limit > entry["limit"]
+            if not (moved or ceiling or lifted):
+                return
+            if moved:
+                logging.info(f"Page size of {family}: {entry['limit']} -> {limit}")
+                entry["limit"] = limit
+            entry["updated_at"] = date.today().isoformat()
+            self._sizes[family] = entry
+            self._save(family)
+
+    def _count_clean(self, family):
+        """Count a page that would have grown past the ceiling; True once there were `ceiling_pages`. Lock held."""
+        self._clean[family] = self._clean.get(family, 0) + 1
+        return self._clean[family] >= self.ceiling_pages
+
+    def _ceiling_expired(self, entry):
+        """Whether a ceiling is older than `ceiling_days`."""
+        try:
+            set_on = date.fromisoformat(entry.get("ceiling_at") or entry.get("updated_at", ""))
+        except ValueError:
+            return True
+        return date.today() - set_on >= timedelta(days=self.ceiling_days)
+
+    def _save(self, family):
+        """Atomically write one family's entry to disk, merged with what other processes saved meanwhile."""
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with open(f"{self.file_path}.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                sizes = self._load()
+                sizes[family] = self._sizes[family]
+                tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    json.dump(sizes, file, indent=4, sort_keys=True)
+                os.replace(tmp_path, self.file_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._sizes = {**sizes, **self._sizes}
+
+    def _load(self):
+        """Load the learned sizes, starting empty when the file does not exist or is unreadable."""
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                sizes = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {family: entry for family, entry in sizes.items()
+                if isinstance(entry, dict) and isinstance(entry.get("limit"), int)}
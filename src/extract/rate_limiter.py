@@ -0,0 +1,257 @@
+import json
+import time
+import logging
+import threading
+
+from config.config import RATE_LIMIT_MAX_RPS, RATE_LIMIT_MIN_RPS, RATE_LIMIT_SOFT_PCT
+
+# Bucket shared by every request: X-App-Usage counts all calls made by the app
+APP_USE_CASE = "app"
+# Bucket shared by every ad account call: X-Ad-Account-Usage
+AD_ACCOUNT_USE_CASE = "ad_account"
+
+
+def use_case_for(endpoint):
+    """
+    Guess which business use case a request counts against from its endpoint.
+
+    Args:
+        endpoint (str): API endpoint, e.g. "act_123/insights" or "456/insights".
+
+    Returns:
+        str: A business-use-case type as reported in X-Business-Use-Case-Usage.
+    """
+    if endpoint.startswith("act_"):
+        return "ads_insights" if "/insights" in endpoint else "ads_management"
+    return "pages"
+
+
+class TokenBucket:
+    """A token bucket whose refill rate can be changed while it is in use."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """
+        Take one token, possibly going into debt, and return how long the caller must wait.
+
+        Reserving ahead lets concurrent callers queue up in order instead of polling.
+        """
+        if now > self.updated:
+            # Reservations made for the end of a block sit ahead of the clock; they refill nothing
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateGovernor:
+    """
+    Process-wide pacing of Graph API calls driven by the usage headers of every response.
+
+    Each business use case, the app and the ad account get a token bucket. Its refill rate
+    drops from `max_rps` to `min_rps` as the reported usage goes from `soft_pct` to 100%.
+    When the API reports `estimated_time_to_regain_access` or `reset_time_duration`, every
+    worker waits for that long instead of backing off blindly.
+
+    Ad account and business use case limits are counted per account, so when several
+    tenants share the governor their buckets are kept apart by `scope` (the tenant name);
+    only the app bucket is shared by everyone.
+    """
+
+    def __init__(self, max_rps=RATE_LIMIT_MAX_RPS, min_rps=RATE_LIMIT_MIN_RPS, soft_pct=RATE_LIMIT_SOFT_PCT):
+        self.max_rps = max_rps
+        self.min_rps = min_rps
+        self.soft_pct = soft_pct
+        self._buckets = {}
+        self._usage = {}
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, use_case, scope=""):
+        """
+        Block until a request for `use_case` may be sent.
+
+        Args:
+            use_case (str): Business use case of the request (see `use_case_for`).
+            scope (str): Tenant the request is made for; "" in single-tenant runs.
+
+        Returns:
+            float: Seconds the caller waited.
+        """
+        wait_time = self.reserve(use_case, scope)
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def reserve(self, use_case, scope=""):
+        """
+        Reserve the slot of a request for `use_case` without waiting for it.
+
+        The caller must wait the returned time before sending; asyncio callers use this
+        to wait with `asyncio.sleep` instead of blocking the event loop.
+
+        Args:
+            use_case (str): Business use case of the request (see `use_case_for`).
+            scope (str): Tenant the request is made for; "" in single-tenant runs.
+
+        Returns:
+            float: Seconds to wait before sending.
+        """
+        keys = self._keys(use_case, scope)
+
+        with self._lock:
+            now = time.monotonic()
+            block_wait = max(max(self._blocked_until.get(key, 0) - now for key in keys), 0.0)
+            # Queue up behind the block: waiters are paced from its end instead of all sent when it lifts
+            return block_wait + max(self._bucket(key).reserve(now + block_wait) for key in keys)
+
+    def update(self, headers, scope=""):
+        """
+        Record the usage reported by a response and adjust the pacing.
+
+        Args:
+            headers (Mapping[str, str]): Response headers.
+            scope (str): Tenant the request was made for; "" in single-tenant runs.
+        """
+        usage = {}
+
+        app_usage = self._parse_header(headers, "X-App-Usage")
+        if app_usage:
+            usage[APP_USE_CASE] = (self._max_pct(app_usage), 0)
+
+        account_usage = self._parse_header(headers, "X-Ad-Account-Usage")
+        if account_usage:
+            usage[self._scoped(AD_ACCOUNT_USE_CASE, scope)] = (
+                float(account_usage.get("acc_id_util_pct", 0)),
+                float(account_usage.get("reset_time_duration", 0))
+            )
+
+        for entries in (self._parse_header(headers, "X-Business-Use-Case-Usage") or {}).values():
+            for entry in entries:
+                # estimated_time_to_regain_access is reported in minutes
+                usage[self._scoped(entry.get("type", "unknown"), scope)] = (
+                    self._max_pct(entry),
+                    float(entry.get("estimated_time_to_regain_access", 0)) * 60
+                )
+
+        if usage:
+            with self._lock:
+                for key, (pct, regain_seconds) in usage.items():
+                    self._apply(key, pct, regain_seconds)
+
+    def throttled(self, use_case, fallback_wait, scope=""):
+        """
+        Block a use case after the API rejected a call with a rate-limit error.
+
+        Every bucket the request counted against is blocked, for as long as the latest usage
+        headers said access would take to come back, or `fallback_wait` seconds when no header
+        reported it.
+
+        Args:
+            use_case (str): Business use case of the rejected request.
+            fallback_wait (float): Seconds to wait when the regain time is unknown.
+            scope (str): Tenant the request was made for; "" in single-tenant runs.
+
+        Returns:
+            float: Seconds the use case is blocked for.
+        """
+        with self._lock:
+            now = time.monotonic()
+            keys = self._keys(use_case, scope)
+            remaining = max(self._blocked_until.get(key, 0) - now for key in keys)
+            if remaining <= 0:
+                remaining = fallback_wait
+            for key in keys:
+                self._blocked_until[key] = max(self._blocked_until.get(key, 0), now + remaining)
+        return remaining
+
+    def budget(self):
+        """
+        Return the current usage, request rate and remaining block time of every tracked bucket.
+
+        Returns:
+            dict: `{use_case: {"usage_pct": float, "rate_per_second": float, "blocked_seconds": float}}`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: {
+                    "usage_pct": self._usage.get(key, 0.0),
+                    "rate_per_second": round(bucket.rate, 3),
+                    "blocked_seconds": round(max(self._blocked_until.get(key, 0) - now, 0.0), 1)
+                }
+                for key, bucket in self._buckets.items()
+            }
+
+    def _keys(self, use_case, scope):
+        """Return the buckets a request counts against: the app, its use case and, for ads, its account."""
+        keys = [APP_USE_CASE, self._scoped(use_case, scope)]
+        if use_case.startswith("ads_"):
+            keys.append(self._scoped(AD_ACCOUNT_USE_CASE, scope))
+        return keys
+
+    @staticmethod
+    def _scoped(key, scope):
+        """Prefix a per-account bucket with its tenant."""
+        return f"{scope}:{key}" if scope else key
+
+    def _apply(self, key, pct, regain_seconds):
+        """Update one bucket from its reported usage. Must be called with the lock held."""
+        previous = self._usage.get(key, 0.0)
+        self._usage[key] = pct
+        self._bucket(key).rate = self._rate_for(pct)
+
+        if regain_seconds > 0 or pct >= 100:
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), time.monotonic() + regain_seconds)
+
+        if pct >= self.soft_pct and previous < self.soft_pct:
+            logging.warning(f"Graph API usage for '{key}' at {pct:.0f}%, slowing down to "
+                            f"{self._buckets[key].rate:.2f} requests/s")
+
+    def _rate_for(self, pct):
+        """Map a usage percentage to a request rate."""
+        if pct <= self.soft_pct:
+            return self.max_rps
+        headroom = max(100 - pct, 0) / (100 - self.soft_pct)
+        return max(self.min_rps, self.max_rps * headroom)
+
+    def _bucket(self, key):
+        """Return the bucket for `key`, creating it at full rate. Must be called with the lock held."""
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.max_rps, max(self.max_rps, 1))
+        return self._buckets[key]
+
+    @staticmethod
+    def _parse_header(headers, name):
+        """Parse a JSON usage header, returning None when it is missing or malformed."""
+        value = headers.get(name)
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _max_pct(usage):
+        """Return the highest of the call count, CPU time and total time percentages."""
+        return float(max(usage.get("call_count", 0), usage.get("total_cputime", 0), usage.get("total_time", 0)))
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_rate_governor():
+    """Return the process-wide rate governor shared by every GraphAPIClient."""
+    global _governor
+
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateGovernor()
+        return _governor
@@ -0,0 +1,120 @@
+import time
+import logging
+
+import requests
+
+from config.config import (
+    REPORT_POLL_INITIAL_WAIT, REPORT_POLL_MAX_WAIT, REPORT_TIMEOUT
+)
+
+# Terminal `async_status` values of an ad report run
+JOB_COMPLETED = "Job Completed"
+JOB_FAILED_STATES = {"Job Failed", "Job Skipped"}
+
+
+class ReportJobError(requests.exceptions.RequestException):
+    """Raised when an async insights report run fails, is skipped or times out."""
+
+
+class InsightsReportRunner:
+    """
+    Runs ads insights queries as asynchronous report runs.
+
+    A report run is created by POSTing the insights query to `act_{id}/insights`, polled on
+    `{report_run_id}` until it completes, and its rows are then read from
+    `{report_run_id}/insights` page by page. Large backfills that time out as synchronous
+    `/insights` calls are processed server-side this way. The runner is thread-safe, so
+    callers can keep many report runs in flight from a thread pool.
+    """
+
+    def __init__(self, client, poll_initial_wait=REPORT_POLL_INITIAL_WAIT, poll_max_wait=REPORT_POLL_MAX_WAIT,
+                 timeout=REPORT_TIMEOUT, max_submits=2):
+        self.client = client
+        self.poll_initial_wait = poll_initial_wait
+        self.poll_max_wait = poll_max_wait
+        self.timeout = timeout
+        self.max_submits = max_submits  # A failed job is resubmitted until this many submissions
+
+    def submit(self, account_id, params):
+        """
+        Start a report run.
+
+        Args:
+            account_id (str): Ad account id, without the `act_` prefix.
+            params (dict): Insights query parameters (level, fields, time_range, ...).
+
+        Returns:
+            str: The report run id.
+        """
+        response = self.client.post_data(f"act_{account_id}/insights", params)
+        report_run_id = response.get("report_run_id")
+        if not report_run_id:
+            raise ReportJobError(f"Report run was not created: {response}")
+        return report_run_id
+
+    def wait(self, report_run_id):
+        """
+        Poll a report run with capped exponential backoff until it reaches a terminal state.
+
+        Args:
+            report_run_id (str): The report run id.
+
+        Raises:
+            ReportJobError: If the job fails, is skipped or does not finish within the timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        wait_time = self.poll_initial_wait
+
+        while True:
+            status = self.client.get_object(report_run_id, {"fields": "async_status,async_percent_completion"})
+            async_status = status.get("async_status")
+
+            if async_status == JOB_COMPLETED:
+                return
+            if async_status in JOB_FAILED_STATES:
+                raise ReportJobError(f"Report run {report_run_id} ended with status '{async_status}'")
+            if time.monotonic() + wait_time > deadline:
+                raise ReportJobError(f"Report run {report_run_id} did not finish within {self.timeout} seconds")
+
+            logging.info(f"Report run {report_run_id}: {async_status} "
+                         f"({status.get('async_percent_completion', 0)}%), polling again in {wait_time:.0f}s")
+            time.sleep(wait_time)
+            wait_time = min(wait_time * 2, self.poll_max_wait)
+
+    def iter_results(self, report_run_id, page_size=500):
+        """
+        Yield the result rows of a completed report run, one page at a time.
+
+        Args:
+            report_run_id (str): The report run id.
+            page_size (int): Rows requested per page.
+
+        Yields:
+            list[dict]: The rows of one result page.
+        """
+        for page in self.client.iter_pages(f"{report_run_id}/insights", {"limit": page_size}):
+            yield page.get("data", [])
+
+    def run(self, account_id, params, handle_rows):
+        """
+        Submit one report run, wait for it and stream its rows to `handle_rows`.
+
+        Failed or skipped jobs are resubmitted up to `max_submits` times in total.
+
+        Args:
+            account_id (str): Ad account id, without the `act_` prefix.
+            params (dict): Insights query parameters.
+            handle_rows (Callable[[list[dict]], None]): Called once per result page.
+        """
+        for submission in range(1, self.max_submits + 1):
+            report_run_id = self.submit(account_id, params)
+            try:
+                self.wait(report_run_id)
+                break
+            except ReportJobError as e:
+                if submission == self.max_submits:
+                    raise
+                logging.warning(f"{e}. Resubmitting ({submission}/{self.max_submits})...")
+
+        for rows in self.iter_results(report_run_id):
+            handle_rows(rows)
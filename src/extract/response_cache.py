@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from config.config import (
+    CACHE_DIR, CACHE_MAX_MB, CACHE_TTL_FINAL, CACHE_TTL_RECENT, CACHE_TTL_UNDATED, SYNC_REFRESH_DAYS
+)
+
+# Query parameters that identify the caller rather than the data
+EXCLUDED_PARAMS = {"access_token", "appsecret_proof"}
+
+# Share of `max_bytes` the cache is trimmed down to once it outgrows it, so evictions come in batches
+EVICT_LOW_WATER = 0.9
+
+
+def normalize_request(url, params):
+    """
+    Return the canonical form of a GET request: URL path plus sorted query parameters,
+    merging parameters embedded in `url` (e.g. `paging.next` links) and dropping the token.
+
+    Args:
+        url (str): Request URL.
+        params (dict): Extra query parameters.
+
+    Returns:
+        tuple[str, dict]: The URL path and the normalized parameters.
+    """
+    parts = urlsplit(url)
+    merged = dict(parse_qsl(parts.query, keep_blank_values=True))
+    merged.update({key: str(value) for key, value in (params or {}).items()})
+    normalized = {key: merged[key] for key in sorted(merged) if key not in EXCLUDED_PARAMS}
+    return f"{parts.netloc}{parts.path}", normalized
+
+
+def data_end_date(params):
+    """
+    Return the last day of data a request covers, from its `until` or `time_range` parameter.
+
+    Args:
+        params (dict): Normalized query parameters.
+
+    Returns:
+        date | None: The end date, or None when the request is not bounded in time.
+    """
+    until = params.get("until")
+    if not until and params.get("time_range"):
+        try:
+            until = json.loads(params["time_range"]).get("until")
+        except ValueError:
+            until = None
+    if not until:
+        return None
+    try:
+        if str(until).isdigit():
+            return datetime.fromtimestamp(int(until)).date()
+        return datetime.strptime(str(until)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def ttl_for(params, refresh_days=SYNC_REFRESH_DAYS):
+    """
+    Pick how long a response may be served from cache, based on how old its data is.
+
+    - Data that ended more than `refresh_days` ago no longer changes: CACHE_TTL_FINAL.
+    - Data inside the refresh (attribution) window: CACHE_TTL_RECENT.
+    - Requests without a date range (lists, per-post insights): CACHE_TTL_UNDATED.
+
+    Args:
+        params (dict): Normalized query parameters.
+        refresh_days (int): Days after which data is considered final.
+
+    Returns:
+        float: TTL in seconds; 0 disables caching for the request.
+    """
+    end = data_end_date(params)
+    if end is None:
+        return CACHE_TTL_UNDATED
+    if end < date.today() - timedelta(days=refresh_days):
+        return CACHE_TTL_FINAL
+    return CACHE_TTL_RECENT
+
+
+class ResponseCache:
+    """
+    On-disk cache of Graph API GET responses, shared by all worker threads.
+
+    Entries are keyed by endpoint plus normalized parameters (never the access token) and
+    stored one file per entry. Expired entries that carry an ETag can be revalidated with
+    `If-None-Match`. The cache is bounded in size: once a store takes it over `max_bytes`, the
+    least recently used entries are evicted until it is back under `EVICT_LOW_WATER` of it.
+    Recency is kept in memory (in file modification time order at startup; file modification
+    time is refreshed on every hit), so a store costs O(1) plus the entries it evicts.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        stats = {entry.path: entry.stat() for entry in files}
+        # File -> size, least recently used first
+        self._sizes = OrderedDict(
+            (file_path, stat.st_size) for file_path, stat in sorted(stats.items(), key=lambda item: item[1].st_mtime)
+        )
+        self._bytes = sum(self._sizes.values())
+
+    def lookup(self, url, params):
+        """
+        Look up a request.
+
+        Args:
+            url (str): Request URL.
+            params (dict): Query parameters.
+
+        Returns:
+            tuple[dict | None, dict | None]: A fresh cached body (or None), and the expired
+            entry (or None) whose ETag can be used to revalidate.
+        """
+        path, normalized = normalize_request(url, params)
+        ttl = ttl_for(normalized)
+        if ttl <= 0:
+            return None, None
+
+        entry = self._read(self._entry_path(path, normalized))
+        if entry is None:
+            self._count("misses")
+            return None, None
+        if time.time() - entry["stored_at"] <= ttl:
+            self._count("hits")
+            return entry["body"], None
+        self._count("misses")
+        return None, entry if entry.get("etag") else None
+
+    def store(self, url, params, body, etag=None):
+        """
+        Store a successful response if its data is cacheable.
+
+        Args:
+            url (str): Request URL.
+            params (dict): Query parameters.
+            body (dict): Parsed JSON body.
+            etag (str, optional): ETag header of the response.
+        """
+        path, normalized = normalize_request(url, params)
+        if ttl_for(normalized) <= 0:
+            return
+
+        file_path = self._entry_path(path, normalized)
+        payload = json.dumps({"request": [path, normalized], "stored_at": time.time(), "etag": etag, "body": body})
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(payload)
+        os.replace(tmp_path, file_path)
+
+        with self._lock:
+            self._bytes += len(payload) - self._sizes.pop(file_path, 0)
+            self._sizes[file_path] = len(payload)
+            self.stats["stores"] += 1
+            self._evict()
+
+    def touch(self, url, params, entry):
+        """
+        Mark an expired entry as fresh again after a 304 Not Modified revalidation.
+
+        Args:
+            url (str): Request URL.
+            params (dict): Query parameters.
+            entry (dict): The expired entry returned by `lookup`.
+        """
+        self.store(url, params, entry["body"], entry.get("etag"))
+        self._count("revalidated")
+
+    def summary(self):
+        """Return hit/miss statistics and the current size, for logging."""
+        with self._lock:
+            return {**self.stats, "entries": len(self._sizes), "bytes": self._bytes}
+
+    def _entry_path(self, path, normalized):
+        """Return the file of a cache key."""
+        key = hashlib.sha256(f"{path}?{urlencode(normalized)}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, file_path):
+        """Read an entry and mark it as recently used; None if missing or corrupt."""
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+            os.utime(file_path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if file_path in self._sizes:
+                self._sizes.move_to_end(file_path)
+        return entry
+
+    def _evict(self):
+        """Delete least recently used entries once the cache outgrew `max_bytes`. Must be called with the lock held."""
+        if self._bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_LOW_WATER
+        while self._sizes and self._bytes > target:
+            file_path, size = self._sizes.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            self.stats["evictions"] += 1
+
+    def _count(self, stat):
+        """Increment a statistic."""
+        with self._lock:
+            self.stats[stat] += 1
@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config.config import (
+    CIRCUIT_COOLDOWN_SECONDS, CIRCUIT_FAILURES, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, HEDGE_REQUESTS, HTTP_POOL_SIZE,
+    RETRY_BASE_SECONDS, RETRY_BUDGET_MIN, RETRY_BUDGET_RATIO, RETRY_MAX_ATTEMPTS, RETRY_MAX_SECONDS
+)
+
+# Latencies kept per endpoint family to derive the hedging threshold
+LATENCY_WINDOW = 500
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """A request refused without being sent because its endpoint family keeps failing."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an endpoint family after `failures` consecutive transient failures.
+
+    While open, requests fail fast. Once `cooldown` seconds have passed, one probe request
+    is let through (half-open): its success closes the circuit, its failure opens it again.
+    Callers must `record` the outcome of every allowed request, exceptions included (as a
+    failure), or the circuit would wait for its probe forever.
+    """
+
+    def __init__(self, failures=CIRCUIT_FAILURES, cooldown=CIRCUIT_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None  # Monotonic time the circuit opened; None while closed
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.cooldown:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, success):
+        """Record the outcome of a request that was allowed."""
+        with self._lock:
+            if success:
+                self.consecutive, self.opened_at, self.probing = 0, None, False
+                return
+            self.consecutive += 1
+            if self.probing or self.consecutive >= self.failures:
+                self.opened_at, self.probing = time.monotonic(), False
+
+
+class RetryBudget:
+    """
+    Caps retries at `minimum` plus `ratio` times the requests sent so far in the run, so a
+    failing API sees at most about (1 + ratio) times the normal load instead of max_attempts times.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.requests = 0
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        """Count one request (not its retries) towards the budget."""
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        """Take one retry from the budget; False when it is exhausted."""
+        with self._lock:
+            if self.spent >= self.minimum + self.ratio * self.requests:
+                return False
+            self.spent += 1
+            return True
+
+
+class RetryPolicy:
+    """
+    Process-wide handling of transient errors (5xx, timeouts, connection resets) shared by every client.
+
+    - Retries of idempotent requests wait with decorrelated jitter:
+      `min(max_seconds, uniform(base_seconds, 3 x previous wait))`.
+    - Retries and hedges draw from one `RetryBudget`.
+    - Every endpoint family (see `endpoint_label`) has its own `CircuitBreaker`.
+    - With `hedge` on, a GET still unanswered after the `hedge_percentile` latency of its
+      family is sent a second time; `executor` runs the duplicates. Families with fewer than
+      `hedge_min_samples` (at least one) successful latencies are never hedged. Hedges take a
+      request slot like any other request, so they count against the in-flight limit.
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_seconds=RETRY_BASE_SECONDS, max_seconds=RETRY_MAX_SECONDS,
+                 budget=None, circuit_failures=CIRCUIT_FAILURES, circuit_cooldown=CIRCUIT_COOLDOWN_SECONDS,
+                 hedge=HEDGE_REQUESTS, hedge_percentile=HEDGE_PERCENTILE, hedge_min_samples=HEDGE_MIN_SAMPLES):
+        self.max_attempts = max_attempts
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.budget = budget or RetryBudget()
+        self.circuit_failures = circuit_failures
+        self.circuit_cooldown = circuit_cooldown
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._breakers = {}
+        self._latencies = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def before_request(self, family):
+        """
+        Check the circuit of a family before sending a request (or one of its retries).
+
+        Raises:
+            CircuitOpenError: If the family's circuit is open.
+        """
+        if not self._breaker(family).allow():
+            raise CircuitOpenError(f"Circuit open for {family}: too many consecutive transient errors")
+
+    def record(self, family, success, seconds=None):
+        """
+        Record the outcome of one attempt.
+
+        Args:
+            family (str): Endpoint family.
+            success (bool): False for a transient error.
+            seconds (float, optional): Latency of a successful attempt, for the hedging threshold.
+        """
+        self._breaker(family).record(success)
+        if success and seconds is not None:
+            with self._lock:
+                self._latencies.setdefault(family, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def backoff(self, attempt, previous=None):
+        """
+        Return the wait before retrying, or None when the request must not be retried.
+
+        Args:
+            attempt (int): Attempts made so far (1 after the first failure).
+            previous (float, optional): Previous wait of this request.
+
+        Returns:
+            float | None: Seconds to wait; None when attempts or the retry budget are exhausted.
+        """
+        if attempt >= self.max_attempts or not self.budget.try_spend():
+            return None
+        return min(self.max_seconds, random.uniform(self.base_seconds, 3 * (previous or self.base_seconds)))
+
+    def hedge_delay(self, family):
+        """Return how long to wait for a GET of `family` before hedging it, or None to not hedge."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(family, ()))
+        if not samples or len(samples) < self.hedge_min_samples:
+            return None  # No percentile known yet
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))]
+
+    @property
+    def executor(self):
+        """Thread pool running hedged requests and their duplicates."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2 * HTTP_POOL_SIZE, thread_name_prefix="hedge")
+            return self._executor
+
+    def _breaker(self, family):
+        with self._lock:
+            if family not in self._breakers:
+                self._breakers[family] = CircuitBreaker(self.circuit_failures, self.circuit_cooldown)
+            return self._breakers[family]
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_retry_policy():
+    """Return the process-wide retry policy shared by every GraphAPIClient."""
+    global _policy
+
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
@@ -0,0 +1,347 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config.config import SEGMENT_CATEGORIES, SEGMENT_MAX_MB, TENANT_MANIFEST
+from config.tenants import Tenant, load_tenants
+from extract.stream_writer import read_ndjson
+
+try:
+    import fcntl  # POSIX only; concurrent processes may interleave appends where it is unavailable
+except ImportError:
+    fcntl = None
+
+# Directory of a category's segment files, next to its per-entity files
+SEGMENTS_DIR = "_segments"
+
+INDEX_FILE = "index.tsv"
+
+# File name extensions of per-entity files, longest first
+FILE_EXTENSIONS = (".ndjson.gz", ".ndjson", ".json")
+
+# "{id}_{since}_to_{until}.json": the month of `until` is the month the data belongs to
+_UNTIL_PATTERN = re.compile(r"_to_(\d{4}-\d{2})-\d{2}$")
+
+
+def segment_key(file_name):
+    """Return the key a file is stored under: its name without extension, e.g. "123_2025-01-31_to_2025-02-28"."""
+    for extension in FILE_EXTENSIONS:
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+
+def partition_for(key, written_at=None):
+    """
+    Return the month partition of a key.
+
+    Keys of monthly files (ads insights) go to the month they cover; keys without a date
+    (one file per post or media) go to the month they were written in, so refetches of
+    recent entities land in the newest partition.
+
+    Args:
+        key (str): Segment key.
+        written_at (float, optional): Write time (epoch seconds); now when omitted.
+
+    Returns:
+        str: "YYYY-MM".
+    """
+    match = _UNTIL_PATTERN.search(key)
+    if match:
+        return match.group(1)
+    return datetime.fromtimestamp(written_at or time.time(), timezone.utc).strftime("%Y-%m")
+
+
+class SegmentStore:
+    """
+    Append-only storage for the many small per-entity outputs (post metrics, media insights,
+    ads insights), replacing one JSON file per entity.
+
+    Each record is one NDJSON line `{"key", "written_at", "document"}` where `document` is
+    what the JSON file would have held. Records go to `{category}/_segments/month=YYYY-MM/`,
+    into `segment-NNNNN.ndjson` files rolled at `max_bytes`; `index.tsv` gets one line per
+    record (key, segment, byte offset, length, write time), so a single entity is read with
+    one seek. A key written again is superseded by its newest record; `compact` drops the
+    old ones.
+
+    Appends are serialized by a thread lock and, between processes, by a file lock per partition.
+    """
+
+    def __init__(self, categories=SEGMENT_CATEGORIES, max_bytes=SEGMENT_MAX_MB * 1024 * 1024):
+        self.categories = set(categories)  # Output directory names whose writes go to segments
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def handles(self, output_dir):
+        """Whether files written to `output_dir` are stored in segments."""
+        return os.path.basename(os.path.normpath(str(output_dir))) in self.categories
+
+    def append(self, output_dir, file_name, document, written_at=None):
+        """
+        Append the document of one per-entity file.
+
+        Args:
+            output_dir (str): Directory the file would have been written to.
+            file_name (str): Name the file would have had.
+            document (dict): Its contents.
+            written_at (float, optional): Write time (epoch seconds); now when omitted.
+
+        Returns:
+            str: Path of the segment the record went to.
+        """
+        key = segment_key(file_name)
+        written_at = written_at or time.time()
+        partition_dir = os.path.join(str(output_dir), SEGMENTS_DIR, f"month={partition_for(key, written_at)}")
+        line = (json.dumps({"key": key, "written_at": written_at, "document": document}, separators=(",", ":"))
+                + "\n").encode("utf-8")
+
+        with self._lock, _partition_lock(partition_dir):
+            segment = self._active_segment(partition_dir, len(line))
+            with open(os.path.join(partition_dir, segment), "ab") as file:
+                offset = file.seek(0, os.SEEK_END)
+                file.write(line)
+            with open(os.path.join(partition_dir, INDEX_FILE), "a", encoding="utf-8") as index:
+                index.write(f"{key}\t{segment}\t{offset}\t{len(line)}\t{written_at}\n")
+        return os.path.join(partition_dir, segment)
+
+    def lookup(self, output_dir, file_name):
+        """
+        Read the newest document stored for one entity.
+
+        Args:
+            output_dir (str): Category directory.
+            file_name (str): File name (or key) of the entity.
+
+        Returns:
+            dict | None: The document, or None when the key is not stored.
+        """
+        key = segment_key(file_name)
+        found = None
+        for partition_dir in self.partitions(output_dir):
+            entry = _read_index(partition_dir).get(key)
+            if entry and (found is None or entry[3] >= found[1][3]):
+                found = (partition_dir, entry)
+        if found is None:
+            return None
+
+        partition_dir, (segment, offset, length, _) = found
+        with open(os.path.join(partition_dir, segment), "rb") as file:
+            file.seek(offset)
+            return json.loads(file.read(length))["document"]
+
+    def records(self, output_dir):
+        """
+        Yield the newest record of every key of a category, reading each segment sequentially.
+
+        Args:
+            output_dir (str): Category directory.
+
+        Yields:
+            tuple: `(key, written_at, document)`.
+        """
+        latest = {}
+        for partition_dir in self.partitions(output_dir):
+            for key, entry in _read_index(partition_dir).items():
+                if key not in latest or entry[3] >= latest[key][1][3]:
+                    latest[key] = (partition_dir, entry)
+
+        by_segment = {}
+        for partition_dir, (segment, offset, length, _) in latest.values():
+            by_segment.setdefault(os.path.join(partition_dir, segment), []).append((offset, length))
+
+        for path, entries in sorted(by_segment.items()):
+            with open(path, "rb") as file:
+                for offset, length in sorted(entries):
+                    file.seek(offset)
+                    record = json.loads(file.read(length))
+                    yield record["key"], record["written_at"], record["document"]
+
+    def partitions(self, output_dir):
+        """Return the partition directories of a category, newest month first."""
+        root = os.path.join(str(output_dir), SEGMENTS_DIR)
+        if not os.path.isdir(root):
+            return []
+        return sorted(
+            (entry.path for entry in os.scandir(root) if entry.is_dir() and entry.name.startswith("month=")),
+            reverse=True
+        )
+
+    def compact(self, output_dir):
+        """
+        Roll a category's per-entity files into segments and rewrite its partitions without superseded records.
+
+        Files are appended with their modification time as write time and deleted afterwards.
+        Each partition is rewritten into fresh segments under its file lock; the new index
+        replaces the old one atomically before the old segments are removed.
+
+        Args:
+            output_dir (str): Category directory.
+
+        Returns:
+            dict: Number of `files` rolled in and `dropped` superseded records.
+        """
+        files = 0
+        for path in _entity_files(output_dir):
+            try:
+                if path.endswith(".json"):
+                    with open(path, "r", encoding="utf-8") as file:
+                        document = json.load(file)
+                else:
+                    document = {"data": read_ndjson(path)}
+            except (OSError, ValueError) as e:
+                logging.error(f"Skipping unreadable file {path}: {e}")
+                continue
+            self.append(output_dir, os.path.basename(path), document, written_at=os.path.getmtime(path))
+            os.remove(path)
+            files += 1
+
+        dropped = 0
+        for partition_dir in self.partitions(output_dir):
+            dropped += self._rewrite_partition(partition_dir)
+        return {"files": files, "dropped": dropped}
+
+    def _rewrite_partition(self, partition_dir):
+        """Copy the newest record of every key into new segments and swap the index; returns records dropped."""
+        with self._lock, _partition_lock(partition_dir):
+            index_path = os.path.join(partition_dir, INDEX_FILE)
+            with open(index_path, "r", encoding="utf-8") as index:
+                total = sum(1 for _ in index)
+            live = _read_index(partition_dir)
+            if total == len(live):
+                return 0
+
+            old_segments = _segment_names(partition_dir)
+            number = _segment_number(old_segments[-1]) + 1 if old_segments else 0
+            segment, size, lines = _segment_name(number), 0, []
+            target = open(os.path.join(partition_dir, segment), "wb")
+            try:
+                for key, (source, offset, length, written_at) in sorted(live.items(), key=lambda item: item[1][3]):
+                    with open(os.path.join(partition_dir, source), "rb") as file:
+                        file.seek(offset)
+                        line = file.read(length)
+                    if size and size + length > self.max_bytes:
+                        target.close()
+                        number += 1
+                        segment, size = _segment_name(number), 0
+                        target = open(os.path.join(partition_dir, segment), "wb")
+                    target.write(line)
+                    lines.append(f"{key}\t{segment}\t{size}\t{length}\t{written_at}\n")
+                    size += length
+            finally:
+                target.close()
+
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as index:
+                index.writelines(lines)
+            os.replace(tmp_path, index_path)
+            for name in old_segments:
+                os.remove(os.path.join(partition_dir, name))
+        return total - len(live)
+
+    def _active_segment(self, partition_dir, size):
+        """Return the segment to append `size` bytes to, starting a new one when the last is full."""
+        os.makedirs(partition_dir, exist_ok=True)
+        segments = _segment_names(partition_dir)
+        if not segments:
+            return _segment_name(0)
+        current = os.path.getsize(os.path.join(partition_dir, segments[-1]))
+        if current and current + size > self.max_bytes:
+            return _segment_name(_segment_number(segments[-1]) + 1)
+        return segments[-1]
+
+
+def _segment_name(number):
+    return f"segment-{number:05d}.ndjson"
+
+
+def _segment_number(name):
+    return int(name[len("segment-"):-len(".ndjson")])
+
+
+def _segment_names(partition_dir):
+    return sorted(name for name in os.listdir(partition_dir) if name.startswith("segment-") and name.endswith(".ndjson"))
+
+
+def _read_index(partition_dir):
+    """
+    Read a partition index.
+
+    Returns:
+        dict: Key -> `(segment, offset, length, written_at)` of its newest record; torn lines are ignored.
+    """
+    entries = {}
+    try:
+        with open(os.path.join(partition_dir, INDEX_FILE), "r", encoding="utf-8") as index:
+            for line in index:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 5:
+                    continue
+                try:
+                    entry = (fields[1], int(fields[2]), int(fields[3]), float(fields[4]))
+                except ValueError:
+                    continue
+                if fields[0] not in entries or entry[3] >= entries[fields[0]][3]:
+                    entries[fields[0]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _entity_files(output_dir):
+    """List a category's per-entity files, keeping only the newest when a key exists in several formats."""
+    if not os.path.isdir(output_dir):
+        return []
+    with os.scandir(output_dir) as entries:
+        files = [entry for entry in entries if entry.is_file() and entry.name.endswith(FILE_EXTENSIONS)]
+
+    latest = {}
+    for entry in files:
+        key = segment_key(entry.name)
+        if key not in latest or entry.stat().st_mtime > latest[key].stat().st_mtime:
+            latest[key] = entry
+    for entry in files:
+        if latest[segment_key(entry.name)].path != entry.path:
+            os.remove(entry.path)  # Superseded by a newer copy of the same key
+    return sorted(entry.path for entry in latest.values())
+
+
+@contextmanager
+def _partition_lock(partition_dir):
+    """Hold an exclusive lock on a partition, shared with other processes appending to it."""
+    os.makedirs(partition_dir, exist_ok=True)
+    with open(os.path.join(partition_dir, ".lock"), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def compact_tenant(tenant, store=None):
+    """
+    Compact every segment category of a tenant.
+
+    Args:
+        tenant (Tenant): The tenant.
+        store (SegmentStore, optional): Store to compact with; one for SEGMENT_CATEGORIES by default.
+
+    Returns:
+        dict: Compaction counts per category.
+    """
+    store = store or SegmentStore()
+    counts = {category: store.compact(tenant.output_path / category) for category in sorted(store.categories)}
+    logging.info(f"Compacted segments of {tenant.name}: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    for tenant in load_tenants(TENANT_MANIFEST) if TENANT_MANIFEST else [Tenant.from_env()]:
+        compact_tenant(tenant)
@@ -0,0 +1,204 @@
+import gzip
+import hashlib
+import json
+import os
+import textwrap
+
+
+def streamed_file_name(file_name, compression=""):
+    """
+    Return the name a streamed file gets on disk, e.g. "posts.json" -> "posts.ndjson.gz".
+
+    Args:
+        file_name (str): File name the non-streaming writer would use.
+        compression (str): "" for plain text or "gzip".
+
+    Returns:
+        str: The streamed file name.
+    """
+    base = file_name[:-len(".json")] if file_name.endswith(".json") else file_name
+    return f"{base}.ndjson" + (".gz" if compression == "gzip" else "")
+
+
+def canonical_json(record):
+    """Return the canonical JSON of a record (sorted keys, no whitespace) that content hashes are computed over."""
+    return json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+
+def read_ndjson(file_path):
+    """
+    Read every record of an NDJSON file, plain or gzip-compressed.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        list[dict]: The records in file order.
+    """
+    opener = gzip.open if str(file_path).endswith(".gz") else open
+    with opener(file_path, "rt", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def write_json_from_ndjson(spool_path, file_path, changes=None):
+    """
+    Write the `{"data": [...]}` JSON document of a spooled NDJSON file one record at a time.
+
+    The output is byte for byte what `json.dump({"data": records}, file, indent=4)` writes, keys
+    in the order the API returned them, but only one record is in memory at once. Like
+    `NDJSONWriter`, it is written under a temporary name and renamed into place; with a
+    `ChangeIndex` an unchanged document is left as it was.
+
+    Args:
+        spool_path (str): NDJSON file of records (as written by `NDJSONWriter`).
+        file_path (str): JSON file to write.
+        changes (ChangeIndex, optional): Change index to check and record the file in.
+
+    Returns:
+        tuple[int, str | None]: Records written, and the change status when tracked.
+    """
+    tmp_path = f"{file_path}.part"
+    digest = hashlib.sha256(b'{"data":[')  # Same as `content_hash` of the whole document
+    records = 0
+    with open(spool_path, "r", encoding="utf-8") as spool, open(tmp_path, "w", encoding="utf-8") as file:
+        file.write('{\n    "data": [')
+        for line in spool:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if records:
+                file.write(",")
+                digest.update(b",")
+            digest.update(canonical_json(record).encode("utf-8"))
+            file.write("\n" + textwrap.indent(json.dumps(record, indent=4), " " * 8))
+            records += 1
+        file.write("\n    ]\n}")
+    digest.update(b"]}")
+
+    if not records:
+        os.remove(tmp_path)
+        return 0, None
+    if changes is None:
+        os.replace(tmp_path, file_path)
+        return records, None
+
+    digest = digest.hexdigest()
+    status = changes.status(file_path, digest, os.path.exists(file_path))
+    if status == "unchanged":
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+    changes.record(file_path, digest, records, status)
+    return records, status
+
+
+class NDJSONWriter:
+    """
+    Writes records one JSON object per line to a temporary file and atomically renames it
+    into place on a clean exit, so readers never see a half-written file.
+
+    With `resume_records` set, the writer is resumable: an interrupted `.part` file is kept,
+    and a later writer continues it after its first `resume_records` records.
+
+    Records are written with their keys in API order and hashed in canonical form (sorted keys)
+    as they go, so the hash does not depend on key order. With a `ChangeIndex`, a finished file with the same hash as the one it replaces is discarded
+    instead of renamed into place, and the file is recorded in the run's manifest.
+
+    Usage:
+        with NDJSONWriter(path) as writer:
+            writer.write_records(page["data"])
+    """
+
+    def __init__(self, file_path, compression="", resume_records=None, changes=None):
+        self.file_path = str(file_path)
+        self.compression = compression
+        self.tmp_path = f"{self.file_path}.part"
+        self.resumable = resume_records is not None
+        self.records = resume_records or 0
+        self.changes = changes  # Optional ChangeIndex
+        self.status = None  # "new", "changed" or "unchanged" once a tracked file is finished
+        self._hash = hashlib.sha256()
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+
+        mode = "w"
+        if self.resumable and self.records and os.path.exists(self.tmp_path):
+            self._truncate_part_file(self.records)
+            mode = "a"
+        else:
+            self.records = 0
+
+        if self.compression == "gzip":
+            self._file = gzip.open(self.tmp_path, f"{mode}t", encoding="utf-8")
+        else:
+            self._file = open(self.tmp_path, mode, encoding="utf-8")
+        return self
+
+    def write_records(self, records):
+        """
+        Append records to the file.
+
+        Args:
+            records (list[dict]): Records to write.
+        """
+        for record in records:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._hash.update((canonical_json(record) + "\n").encode("utf-8"))
+        self.records += len(records)
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._file.close()
+
+        # A resumable writer keeps its partial file so the next run can continue it
+        if exc_type is not None and self.resumable:
+            return False
+
+        # Keep the previous complete file when the fetch failed or returned nothing
+        if exc_type is not None or not self.records:
+            os.remove(self.tmp_path)
+            return False
+
+        if self.changes is None:
+            os.replace(self.tmp_path, self.file_path)
+            return False
+
+        digest = self._hash.hexdigest()
+        self.status = self.changes.status(self.file_path, digest, os.path.exists(self.file_path))
+        if self.status == "unchanged":
+            os.remove(self.tmp_path)  # Keep the identical file (and its modification time) in place
+        else:
+            os.replace(self.tmp_path, self.file_path)
+        self.changes.record(self.file_path, digest, self.records, self.status)
+        return False
+
+    def _truncate_part_file(self, records):
+        """Drop records written after the last checkpoint (e.g. a page spooled just before a crash)."""
+        kept = read_ndjson_lines(self.tmp_path, self.compression)[:records]
+        if len(kept) < records:
+            raise ValueError(f"{self.tmp_path} holds fewer records than its checkpoint ({len(kept)} < {records})")
+
+        opener = gzip.open if self.compression == "gzip" else open
+        with opener(self.tmp_path, "wt", encoding="utf-8") as file:
+            file.writelines(kept)
+        for line in kept:
+            self._hash.update((canonical_json(json.loads(line)) + "\n").encode("utf-8"))
+
+
+def read_ndjson_lines(file_path, compression=""):
+    """
+    Return the complete, non-empty lines of a (possibly gzip-compressed) NDJSON file.
+
+    A file cut off by a crash is read up to its last complete line.
+    """
+    lines = []
+    opener = gzip.open if compression == "gzip" else open
+    with opener(file_path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                lines.append(line)
+        except EOFError:
+            pass  # gzip stream without its end marker
+    return [line for line in lines if line.strip() and line.endswith("\n")]
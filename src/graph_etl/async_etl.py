@@ -0,0 +1,592 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config.config import (
+    ADS_INSIGHTS_MODE, ASYNC_MAX_CONCURRENCY, INLINE_POST_INSIGHTS, INSTA_PAGE_METRICS, MAX_WORKERS, NORMALIZE_OUTPUT,
+    PAGE_METRICS, PAGE_METRICS_MAX_DAYS, POST_METRICS, TENANT_MAX_TASKS
+)
+from extract.async_client import AsyncGraphAPIClient, create_async_session, require_aiohttp
+from extract.http_session import get_request_slots, get_session
+from extract.rate_limiter import get_rate_governor
+from graph_etl.graph_etl import (
+    ADS_INSIGHTS_LEVELS, INSTA_MAX_RANGE_DAYS, INSTA_MEDIA_FIELDS, INSTA_TIME_SERIES_METRICS, POST_FIELDS,
+    account_insights_params, ads_insights_units, complete_interval, ensure_directory, fetch_ads_insights_multithreaded,
+    finish_run, group_rows_by_id, instagram_metrics_for, load_ads_entities, load_etl_tenants, load_instagram_account_id,
+    load_output_file, log_batch_failures, parse_etl_modes, pending_intervals, register_tenants, save_insights_rows
+)
+from state.sync_state import SyncStateStore, interval_key
+from transform.normalize import normalize_tenant, require_format
+from utils.run_metrics import get_run_metrics
+from utils.utils import get_last_months_intervals, split_date_range
+from utils.window_planner import fetch_window_async, plan_windows, slice_insights_values
+
+
+class AsyncTaskGraph:
+    """Runs a DAG of ETL coroutines on one event loop, the asyncio counterpart of `TaskScheduler`.
+
+    Every task starts at once and waits for its dependencies; tasks whose dependencies
+    failed are skipped. Concurrency is bounded by the process-wide request slots rather
+    than by a pool of workers, and no `group` (tenant) runs more than `max_per_group`
+    tasks at once. Dependencies must be registered before the tasks that use them.
+    """
+
+    def __init__(self, max_per_group: Optional[int] = None):
+        self.max_per_group = max_per_group
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, fn: Callable, *args, deps: Iterable[str] = (), group: str = "", **kwargs) -> str:
+        """Register a task; `fn` is a coroutine function. See `TaskScheduler.add`."""
+        if name in self._tasks:
+            raise ValueError(f"Task '{name}' is already registered.")
+        missing = [dep for dep in deps if dep not in self._tasks]
+        if missing:
+            raise ValueError(f"Task '{name}' depends on unknown tasks: {missing}")
+        self._tasks[name] = {"fn": fn, "args": args, "kwargs": kwargs, "deps": list(deps), "group": group}
+        return name
+
+    async def run(self) -> Dict[str, Dict[str, Any]]:
+        """Run every registered task, respecting dependencies.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per task, its `status` ("done", "failed" or "skipped"),
+            wall time in `seconds` and `error` message, if any.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        finished = {name: asyncio.Event() for name in self._tasks}
+        group_limits = {
+            task["group"]: asyncio.Semaphore(self.max_per_group)
+            for task in self._tasks.values() if self.max_per_group
+        }
+
+        async def run_when_ready(name):
+            task = self._tasks[name]
+            for dep in task["deps"]:
+                await finished[dep].wait()
+
+            if any(results[dep]["status"] != "done" for dep in task["deps"]):
+                results[name] = {"status": "skipped", "seconds": 0.0, "error": "dependency failed"}
+                logging.warning(f"Skipping task {name}: a dependency failed")
+            elif task["group"] in group_limits:
+                async with group_limits[task["group"]]:
+                    results[name] = await self.run_task(name)
+            else:
+                results[name] = await self.run_task(name)
+            finished[name].set()
+
+        await asyncio.gather(*(run_when_ready(name) for name in self._tasks))
+        return {name: results[name] for name in self._tasks}
+
+    async def run_task(self, name: str) -> Dict[str, Any]:
+        """Run one registered task and time it, turning exceptions into a "failed" result."""
+        task = self._tasks[name]
+        start = time.perf_counter()
+        try:
+            with get_run_metrics().timer("stage", name.split(":")[0]):
+                await task["fn"](*task["args"], **task["kwargs"])
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            logging.error(f"Task {name} failed after {seconds:.1f}s: {e}")
+            return {"status": "failed", "seconds": seconds, "error": str(e)}
+
+        seconds = time.perf_counter() - start
+        logging.info(f"Task {name} finished in {seconds:.1f}s")
+        return {"status": "done", "seconds": seconds, "error": None}
+
+
+async def collect_rows(client: AsyncGraphAPIClient, endpoint: str, params: Dict, paginate: bool = True) -> List[Dict]:
+    """Return the `data` rows of every page of an endpoint.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        endpoint (str): API endpoint to query.
+        params (Dict): Query parameters.
+        paginate (bool, optional): Whether to follow `paging.next`.
+
+    Returns:
+        List[Dict]: Rows of all pages, in order.
+    """
+    rows = []
+    async for page in client.iter_pages(endpoint, params, paginate=paginate):
+        rows.extend(page.get("data", []))
+    return rows
+
+
+async def fetch_page_metrics(client: AsyncGraphAPIClient,
+                             intervals: List[Dict[str, str]],
+                             sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch page-level metrics in windows of up to PAGE_METRICS_MAX_DAYS days, all windows at once.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    def fetch(window):
+        return collect_rows(client, client.tenant.page_metrics_endpoint,
+                            {'metric': PAGE_METRICS, 'since': window["since"], 'until': window["until"], 'period': 'day'})
+
+    async def fetch_and_slice(window):
+        entries = await fetch_window_async(fetch, window, exclusive_since=True)
+        for interval in window["intervals"]:
+            await client.save_data(
+                output_dir,
+                f"{interval['start_date']}_{interval['until']}.json",
+                {"data": slice_insights_values(entries, interval)}
+            )
+            await asyncio.to_thread(complete_interval, client, sync_state, "page_metrics", interval)
+
+    output_dir = str(ensure_directory(f"{client.tenant.output_path}/facebook_page_metrics"))
+    windows = plan_windows(pending_intervals(client, sync_state, "page_metrics", intervals), PAGE_METRICS_MAX_DAYS)
+    await asyncio.gather(*(fetch_and_slice(window) for window in windows))
+
+
+async def fetch_posts(client: AsyncGraphAPIClient,
+                      intervals: List[Dict[str, str]],
+                      sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch posts from the Facebook page, one interval after the other.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    for interval in pending_intervals(client, sync_state, "posts", intervals):
+        await client.fetch_data(
+            endpoint=client.tenant.post_endpoint,
+            params={"fields": POST_FIELDS, 'since': interval["since"], 'until': interval["until"], 'limit': 25},
+            output_dir=str(ensure_directory(f"{client.tenant.output_path}/facebook_posts")),
+            file_name=f"{interval['start_date']}_{interval['until']}.json"
+        )
+        await asyncio.to_thread(complete_interval, client, sync_state, "posts", interval)
+
+
+async def fetch_post_insights(client: AsyncGraphAPIClient,
+                              posts: List[Dict],
+                              label: str,
+                              sync_state: Optional[SyncStateStore] = None) -> List[Dict]:
+    """Fetch the insights of the given posts with concurrent batch requests.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        posts (List[Dict]): Posts with at least an `id`.
+        label (str): Human-readable description used when logging failures.
+        sync_state (Optional[SyncStateStore]): When set, record the posts fetched successfully.
+
+    Returns:
+        List[Dict]: Sub-requests that failed.
+    """
+    output_dir = ensure_directory(f"{client.tenant.output_path}/facebook_post_metrics")
+    failed = await client.fetch_batch([
+        {
+            "endpoint": f"{post['id']}/insights",
+            "params": {"metric": POST_METRICS},
+            "output_dir": str(output_dir),
+            "file_name": f"{post['id']}.json"
+        }
+        for post in posts
+    ])
+    log_batch_failures(failed, label)
+
+    if sync_state:
+        failed_endpoints = {item["endpoint"] for item in failed}
+        sync_state.mark_entities(
+            "post_metrics",
+            [post["id"] for post in posts if f"{post['id']}/insights" not in failed_endpoints]
+        )
+        await asyncio.to_thread(sync_state.save)
+    return failed
+
+
+async def fetch_post_metrics(client: AsyncGraphAPIClient,
+                             intervals: List[Dict[str, str]],
+                             sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch post-level metrics of the posts saved by `fetch_posts`.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, only fetch new posts and posts
+            whose metrics may still change.
+    """
+    for interval in intervals:
+        if client.checkpoints is not None and client.checkpoints.is_done(f"post_metrics:{interval_key(interval)}"):
+            continue
+
+        posts_data = await asyncio.to_thread(
+            load_output_file, f"{client.tenant.output_path}/facebook_posts",
+            f"{interval['start_date']}_{interval['until']}.json")
+        if not posts_data:
+            continue
+
+        posts = [
+            post for post in posts_data.get("data", [])
+            if sync_state is None or sync_state.needs_entity("post_metrics", post["id"], post["created_time"])
+        ]
+        failed = await fetch_post_insights(
+            client, posts, f"post metrics {interval['start_date']} to {interval['until']}", sync_state)
+
+        if client.checkpoints is not None and not failed:
+            await asyncio.to_thread(client.checkpoints.mark_done, f"post_metrics:{interval_key(interval)}")
+
+
+async def fetch_posts_with_insights(client: AsyncGraphAPIClient,
+                                    intervals: List[Dict[str, str]],
+                                    sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch posts with inline insights, like `graph_etl.fetch_posts_with_insights`.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    posts_dir = ensure_directory(f"{client.tenant.output_path}/facebook_posts")
+    metrics_dir = ensure_directory(f"{client.tenant.output_path}/facebook_post_metrics")
+
+    for interval in pending_intervals(client, sync_state, "posts", intervals):
+        posts, inline_ids, fallback = [], [], []
+
+        async for page in client.iter_pages(
+            client.tenant.post_endpoint,
+            {"fields": f"{POST_FIELDS},insights.metric({POST_METRICS})",
+             "since": interval["since"], "until": interval["until"], "limit": 25}
+        ):
+            for post in page.get("data", []):
+                insights = post.pop("insights", None)
+                posts.append(post)
+
+                paging = (insights or {}).get("paging", {})
+                if not insights or (paging.get("next") and paging.get("cursors")):
+                    fallback.append(post)
+                    continue
+
+                await client.save_data(str(metrics_dir), f"{post['id']}.json", {"data": insights.get("data", [])})
+                inline_ids.append(post["id"])
+
+        await client.save_data(str(posts_dir), f"{interval['start_date']}_{interval['until']}.json", {"data": posts})
+        if sync_state:
+            sync_state.mark_entities("post_metrics", inline_ids)
+
+        if fallback:
+            logging.info(f"Fetching insights separately for {len(fallback)} of {len(posts)} posts")
+            await fetch_post_insights(
+                client, fallback, f"post metrics {interval['start_date']} to {interval['until']}", sync_state)
+        await asyncio.to_thread(complete_interval, client, sync_state, "posts", interval)
+
+
+async def fetch_instagram_data(client: AsyncGraphAPIClient, sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch the Instagram business account and its media list, like `graph_etl.fetch_instagram_data`.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        sync_state (Optional[SyncStateStore]): When set, list only media that are new or still changing.
+    """
+    await client.fetch_data(
+        endpoint=client.tenant.page_endpoint,
+        params={"fields": "instagram_business_account"},
+        output_dir=str(ensure_directory(f"{client.tenant.output_path}/instagram_business_account")),
+        file_name="instagram_business_account.json",
+        extend_data=False
+    )
+
+    ig_account_id = await asyncio.to_thread(load_instagram_account_id, client)
+    if not ig_account_id:
+        logging.info(f"No Instagram business account linked to page {client.tenant.page_id}")
+        return
+
+    media_dir = f"{client.tenant.output_path}/instagram_media"
+    known = await asyncio.to_thread(load_output_file, media_dir, "instagram_media.json") if sync_state else None
+    media_by_id = {media["id"]: media for media in (known or {}).get("data", [])}
+
+    listed = 0
+    async for page in client.iter_pages(f"{ig_account_id}/media", {"fields": INSTA_MEDIA_FIELDS, "limit": 100}):
+        items = page.get("data", [])
+        listed += len(items)
+        media_by_id.update((media["id"], media) for media in items)
+        if known and items and not any(
+            sync_state.needs_entity("instagram_media_insights", media["id"], media["timestamp"]) for media in items
+        ):
+            break  # Older media are final too
+
+    logging.info(f"Listed {listed} Instagram media, {len(media_by_id)} known in total")
+    media = sorted(media_by_id.values(), key=lambda item: item.get("timestamp", ""), reverse=True)
+    await client.save_data(str(ensure_directory(media_dir)), "instagram_media.json", {"data": media})
+
+
+async def fetch_instagram_media_insights(client: AsyncGraphAPIClient,
+                                         sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch per-media Instagram insights, sending every batch concurrently.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        sync_state (Optional[SyncStateStore]): When set, only fetch media that are new or
+            whose metrics may still change.
+
+    Raises:
+        RuntimeError: If any media insights request failed.
+    """
+    media_data = await asyncio.to_thread(
+        load_output_file, f"{client.tenant.output_path}/instagram_media", "instagram_media.json")
+    if not media_data:
+        return
+
+    output_dir = str(ensure_directory(f"{client.tenant.output_path}/instagram_media_insights"))
+    units = []
+    for media in media_data.get("data", []):
+        metrics = instagram_metrics_for(media)
+        if not metrics:
+            continue
+        if sync_state and not sync_state.needs_entity("instagram_media_insights", media["id"], media["timestamp"]):
+            continue
+        units.append({
+            "endpoint": f"{media['id']}/insights",
+            "params": {"metric": metrics},
+            "output_dir": output_dir,
+            "file_name": f"{media['id']}.json"
+        })
+
+    logging.info(f"Fetching {len(units)} Instagram media insights units")
+    failed = await client.fetch_batch(units)
+    log_batch_failures(failed, "Instagram media insights")
+
+    if sync_state:
+        failed_endpoints = {item["endpoint"] for item in failed}
+        sync_state.mark_entities(
+            "instagram_media_insights",
+            [unit["endpoint"].split("/")[0] for unit in units if unit["endpoint"] not in failed_endpoints]
+        )
+        await asyncio.to_thread(sync_state.save)
+    if failed:
+        raise RuntimeError(f"{len(failed)} Instagram media insights requests failed")
+
+
+async def fetch_instagram_account_insights(client: AsyncGraphAPIClient,
+                                           intervals: List[Dict[str, str]],
+                                           sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch account-level Instagram metrics per interval, requesting every 30-day window at once.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    ig_account_id = await asyncio.to_thread(load_instagram_account_id, client)
+    if not ig_account_id:
+        return
+
+    metrics = INSTA_PAGE_METRICS.split(",")
+    metric_queries = [
+        {"metric": ",".join(m for m in metrics if m in INSTA_TIME_SERIES_METRICS), "period": "day"},
+        {"metric": ",".join(m for m in metrics if m not in INSTA_TIME_SERIES_METRICS), "period": "day",
+         "metric_type": "total_value"}
+    ]
+
+    for interval in pending_intervals(client, sync_state, "instagram_account_insights", intervals):
+        pages = await asyncio.gather(*(
+            collect_rows(client, f"{ig_account_id}/insights", {**params, **window}, paginate=False)
+            for window in split_date_range(interval["since"], interval["until"], INSTA_MAX_RANGE_DAYS)
+            for params in metric_queries if params["metric"]
+        ))
+
+        await client.save_data(
+            str(ensure_directory(f"{client.tenant.output_path}/instagram_account_insights")),
+            f"{interval['start_date']}_{interval['until']}.json",
+            {"data": [entry for rows in pages for entry in rows]}
+        )
+        await asyncio.to_thread(complete_interval, client, sync_state, "instagram_account_insights", interval)
+
+
+async def fetch_facebook_ads(client: AsyncGraphAPIClient) -> None:
+    """Fetch the Facebook Ads campaign, ad set and ad lists concurrently.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+    """
+    ads_categories = {
+        "campaigns": "id,name,objective,status",
+        "adsets": "id,name,campaign_id,targeting,budget,status",
+        "ads": "id,name,creative{id},campaign_id,adset_id,status"
+    }
+
+    await asyncio.gather(*(
+        client.fetch_data(
+            endpoint=f"act_{client.tenant.ads_account}/{category}",
+            params={"fields": fields, "limit": 100},
+            output_dir=str(ensure_directory(f"{client.tenant.output_path}/{category}")),
+            file_name=f"{category}_list.json"
+        )
+        for category, fields in ads_categories.items()
+    ))
+
+
+async def fetch_account_insights_for_interval(client: AsyncGraphAPIClient, interval: Dict[str, str]) -> None:
+    """Fetch campaign, ad set and ad insights with one account-level query per level, all levels at once.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        interval (Dict[str, str]): The date interval.
+    """
+    async def fetch_level(category, level):
+        def fetch(window):
+            return collect_rows(client, f"act_{client.tenant.ads_account}/insights",
+                                account_insights_params(level, window))
+
+        rows_by_id: Dict[str, List[Dict]] = {}
+        group_rows_by_id(rows_by_id, f"{level}_id", await fetch_window_async(fetch, interval))
+        await asyncio.to_thread(save_insights_rows, client.client, category, interval, rows_by_id)
+
+    await asyncio.gather(*(fetch_level(category, level) for category, level in ADS_INSIGHTS_LEVELS.items()))
+
+
+async def fetch_ads_insights_interval(client: AsyncGraphAPIClient,
+                                      interval: Dict[str, str],
+                                      sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch and record the Ads insights of one interval (account or entity mode).
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client.
+        interval (Dict[str, str]): The date interval.
+        sync_state (Optional[SyncStateStore]): When set, skip the interval if it is already final.
+
+    Raises:
+        RuntimeError: If any insights request of the interval failed.
+    """
+    if not pending_intervals(client, sync_state, "ads_insights", [interval]):
+        return
+
+    failed = []
+    if ADS_INSIGHTS_MODE == "entity":
+        entities = await asyncio.to_thread(load_ads_entities, client.tenant.output_path)
+        failed = await client.fetch_batch(ads_insights_units(entities, [interval], client.tenant.output_path))
+        log_batch_failures(failed, f"ads insights {interval['since']} to {interval['until']}")
+    else:
+        await fetch_account_insights_for_interval(client, interval)
+
+    await asyncio.to_thread(complete_interval, client, sync_state, "ads_insights", interval, complete=not failed)
+    if failed:
+        raise RuntimeError(f"{len(failed)} ads insights requests failed")
+
+
+async def fetch_ads_insights_async_reports(client: AsyncGraphAPIClient,
+                                           intervals: List[Dict[str, str]],
+                                           sync_state: Optional[SyncStateStore] = None) -> None:
+    """Run the report-run mode of the sync engine in a thread; report runs mostly poll and wait.
+
+    Its report pool sends through the sync client, so its requests take the same request slots as the
+    event loop's and the process stays within ASYNC_MAX_CONCURRENCY requests in flight.
+
+    Args:
+        client (AsyncGraphAPIClient): The async API client (its sync client runs the reports).
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    await asyncio.to_thread(fetch_ads_insights_multithreaded, client.client, intervals, sync_state)
+
+
+async def normalize(tenant) -> None:
+    """Rebuild the tenant's columnar tables in a thread, off the event loop."""
+    await asyncio.to_thread(normalize_tenant, tenant)
+
+
+def add_async_etl_tasks(graph: AsyncTaskGraph,
+                        client: AsyncGraphAPIClient,
+                        intervals: List[Dict[str, str]],
+                        modes: List[str],
+                        sync_state: Optional[SyncStateStore] = None,
+                        prefix: str = "") -> None:
+    """Register the ETL steps of the selected modes as async tasks, with the task names of `add_etl_tasks`.
+
+    Args:
+        graph (AsyncTaskGraph): Task graph to add tasks to.
+        client (AsyncGraphAPIClient): The async API client.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        modes (List[str]): Selected ETL modes.
+        sync_state (Optional[SyncStateStore]): Sync state passed to every step.
+        prefix (str, optional): Prefix of the task names, e.g. "page_a/" in multi-tenant runs.
+    """
+    tenant = client.tenant
+    names = []
+
+    def add(name, fn, *args, deps=()):
+        names.append(name)
+        graph.add(f"{prefix}{name}", fn, *args, deps=[f"{prefix}{dep}" for dep in deps], group=tenant.name)
+
+    if "social" in modes:
+        if not tenant.page_id:
+            logging.warning(f"Tenant {tenant.name} has no page id, skipping Social Media ETL")
+        else:
+            logging.info(f"Scheduling async Social Media ETL for {tenant.name}...")
+            for window in plan_windows(intervals, PAGE_METRICS_MAX_DAYS):
+                add(f"page_metrics:{interval_key(window)}", fetch_page_metrics, client, window["intervals"], sync_state)
+            for interval in intervals:
+                key = interval_key(interval)
+                if INLINE_POST_INSIGHTS:
+                    add(f"posts:{key}", fetch_posts_with_insights, client, [interval], sync_state)
+                else:
+                    add(f"posts:{key}", fetch_posts, client, [interval], sync_state)
+                    add(f"post_metrics:{key}", fetch_post_metrics, client, [interval], sync_state,
+                        deps=[f"posts:{key}"])
+            add("instagram", fetch_instagram_data, client, sync_state)
+            add("instagram_media_insights", fetch_instagram_media_insights, client, sync_state, deps=["instagram"])
+            for interval in intervals:
+                add(f"instagram_account_insights:{interval_key(interval)}", fetch_instagram_account_insights,
+                    client, [interval], sync_state, deps=["instagram"])
+
+    if "ads" in modes and not tenant.ads_account:
+        logging.warning(f"Tenant {tenant.name} has no ad account, skipping Ads ETL")
+    elif "ads" in modes:
+        logging.info(f"Scheduling async Ads ETL for {tenant.name}...")
+        add("ads_lists", fetch_facebook_ads, client)
+        if ADS_INSIGHTS_MODE == "async":
+            add("ads_insights", fetch_ads_insights_async_reports, client, intervals, sync_state, deps=["ads_lists"])
+        else:
+            for interval in intervals:
+                add(f"ads_insights:{interval_key(interval)}", fetch_ads_insights_interval,
+                    client, interval, sync_state, deps=["ads_lists"])
+
+    if NORMALIZE_OUTPUT and names:
+        require_format()  # Before anything is fetched rather than at the end of the run
+        add("normalize", normalize, tenant, deps=list(names))
+
+
+async def run_etl_async(max_concurrency: int = ASYNC_MAX_CONCURRENCY) -> None:
+    """Run the complete ETL process for every tenant on one event loop.
+
+    Args:
+        max_concurrency (int, optional): Most requests in flight at once, across tenants.
+    """
+    logging.info(f"Starting async ETL process with up to {max_concurrency} requests in flight...")
+
+    rate_governor = get_rate_governor()  # One governor paces every tenant
+    get_run_metrics().pool_size = max_concurrency
+    intervals = get_last_months_intervals(num_months=int(os.getenv("NUM_MONTHS_DATA", "1")))
+    modes = parse_etl_modes(os.getenv("ETL_MODE", "").lower())
+
+    tenants = load_etl_tenants()
+    multi_tenant = len(tenants) > 1
+    graph = AsyncTaskGraph(max_per_group=TENANT_MAX_TASKS if multi_tenant else None)
+
+    async with create_async_session(max_concurrency) as session:
+        get_request_slots().resize(max_concurrency)  # One in-flight limit for the event loop and the threads it starts
+
+        def add_tasks(graph, client, *args, **kwargs):
+            add_async_etl_tasks(graph, AsyncGraphAPIClient(client, session), *args, **kwargs)
+
+        # Token refreshes and file output use the sync clients and their requests session
+        clients, setup_failed = register_tenants(
+            graph, tenants, get_session(MAX_WORKERS), rate_governor, intervals, modes, add_tasks=add_tasks)
+        results = await graph.run()
+
+    finish_run(results, rate_governor, clients, setup_failed, multi_tenant)
+
+
+def etl_async() -> None:
+    """Entry point of the asyncio engine (ETL_ENGINE=async); fails before any work when aiohttp is missing."""
+    require_aiohttp()
+    asyncio.run(run_etl_async())
+
+
+if __name__ == "__main__":
+    etl_async()
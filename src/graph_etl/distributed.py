@@ -0,0 +1,205 @@
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config.config import (
+    ETL_ROLE, MAX_WORKERS, QUEUE_LEASE_SECONDS, QUEUE_LOCAL_WORKERS, QUEUE_POLL_SECONDS, QUEUE_WORKER_THREADS,
+    QUEUE_WORKERS, RATE_LIMIT_MAX_RPS, RATE_LIMIT_MIN_RPS, RETRY_BUDGET_MIN, RUN_METRICS
+)
+from extract.http_session import get_session
+from extract.rate_limiter import RateGovernor, get_rate_governor
+from extract.retry_policy import RetryBudget, RetryPolicy
+from graph_etl.graph_etl import (
+    export_run_metrics, load_etl_tenants, log_task_results, parse_etl_modes, raise_for_failures, register_tenants,
+    save_changes
+)
+from graph_etl.scheduler import TaskScheduler
+from state.work_queue import WorkQueue
+from utils.utils import get_last_months_intervals
+
+
+def build_task_graph(intervals: List[Dict[str, str]], modes: List[str], use_checkpoints: bool = False,
+                     workers: int = 1):
+    """Create the clients and tasks of every tenant, exactly as a standalone run would.
+
+    The coordinator and every worker build the same graph from the same tenants, intervals
+    and modes, so a unit name identifies the same task in every process.
+
+    Rate limits and retry budgets are per process, so with `workers` processes sharing the run each
+    one paces itself at 1/`workers` of RATE_LIMIT_MAX_RPS and RATE_LIMIT_MIN_RPS and gets 1/`workers`
+    of RETRY_BUDGET_MIN; the budget ratio applies to each worker's own requests already.
+
+    Args:
+        intervals (List[Dict[str, str]]): List of date intervals.
+        modes (List[str]): Selected ETL modes.
+        use_checkpoints (bool, optional): Whether clients journal progress (the queue does it in distributed runs).
+        workers (int, optional): Worker processes sharing the run.
+
+    Returns:
+        tuple: The scheduler holding the tasks, clients per tenant, the rate governor and the tenants not set up.
+    """
+    if workers > 1:
+        rate_governor = RateGovernor(max_rps=RATE_LIMIT_MAX_RPS / workers, min_rps=RATE_LIMIT_MIN_RPS / workers)
+        retry_policy = RetryPolicy(budget=RetryBudget(minimum=math.ceil(RETRY_BUDGET_MIN / workers)))
+    else:
+        rate_governor, retry_policy = get_rate_governor(), None
+    scheduler = TaskScheduler(max_workers=MAX_WORKERS)
+    clients, setup_failed = register_tenants(
+        scheduler, load_etl_tenants(), get_session(MAX_WORKERS), rate_governor, intervals, modes, use_checkpoints,
+        retry_policy=retry_policy)
+    return scheduler, clients, rate_governor, setup_failed
+
+
+def run_coordinator(local_workers: int = QUEUE_LOCAL_WORKERS) -> None:
+    """Fill the work queue, run local worker processes and report the outcome of the run.
+
+    A queue left unfinished by an earlier coordinator is resumed instead of refilled. With
+    `local_workers` set to 0 the coordinator only fills the queue, for workers started elsewhere
+    (e.g. containers sharing OUTPUT_PATH); running it again once they are done reports the run.
+
+    Args:
+        local_workers (int, optional): Worker processes to start on this host.
+
+    Raises:
+        RuntimeError: If units failed, tenants could not be set up, or the queue was not drained.
+    """
+    queue = WorkQueue()
+    counts = queue.counts()
+    # Workers split the rate limits between them; set before the intervals, which workers wait for
+    queue.set_meta("workers", max(QUEUE_WORKERS, local_workers, 1))
+
+    if counts.get("pending") or counts.get("leased"):
+        logging.info(f"Resuming unfinished work queue {queue.file_path}: {counts}")
+        setup_failed = queue.get_meta("setup_failed") or []
+    elif counts:
+        logging.info(f"Reporting finished work queue {queue.file_path}")
+        setup_failed = queue.get_meta("setup_failed") or []
+    else:
+        intervals = get_last_months_intervals(num_months=int(os.getenv("NUM_MONTHS_DATA", "1")))
+        modes = parse_etl_modes(os.getenv("ETL_MODE", "").lower())
+        scheduler, _, _, setup_failed = build_task_graph(intervals, modes)
+
+        queue.set_meta("intervals", intervals)
+        queue.set_meta("modes", modes)
+        queue.set_meta("setup_failed", setup_failed)
+        queue.enqueue(scheduler.graph())
+        logging.info(f"Queued {len(scheduler.graph())} work units in {queue.file_path}")
+
+    if local_workers:
+        context = multiprocessing.get_context("spawn")  # Fresh interpreters: no inherited locks or sessions
+        processes = [
+            context.Process(target=run_worker, args=(f"{socket.gethostname()}-{os.getpid()}-{index}",))
+            for index in range(local_workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    if not queue.drained():
+        if local_workers:
+            raise RuntimeError(f"Work queue not drained: {queue.counts()}; rerun the coordinator or a worker to finish it")
+        logging.info("Work queue filled; waiting for workers")
+        return
+
+    results = queue.results()
+    log_task_results(results)
+    queue.reset()  # Finished runs are not resumed; the sync state skips final data next time
+    raise_for_failures(results, setup_failed)
+    logging.info("Distributed ETL process completed successfully.")
+
+
+def run_worker(worker_id: Optional[str] = None, threads: int = QUEUE_WORKER_THREADS) -> None:
+    """Lease, run and acknowledge work units until the queue is drained.
+
+    Args:
+        worker_id (Optional[str]): Unique id of the worker; host and process id by default.
+        threads (int, optional): Units this worker runs at once.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue()
+
+    deadline = time.monotonic() + QUEUE_LEASE_SECONDS
+    while queue.get_meta("intervals") is None:  # The coordinator may still be filling the queue
+        if time.monotonic() > deadline:
+            logging.warning(f"Worker {worker_id}: no work queue found in {queue.file_path}")
+            return
+        time.sleep(QUEUE_POLL_SECONDS)
+
+    workers = queue.get_meta("workers") or 1
+    scheduler, clients, rate_governor, _ = build_task_graph(
+        queue.get_meta("intervals"), queue.get_meta("modes"), workers=workers)
+    tasks = scheduler.graph()
+    held: Dict[str, str] = {}  # Thread name -> unit it is running
+    held_lock = threading.Lock()
+    results: Dict[str, Dict] = {}
+    stop = threading.Event()
+
+    def renew_leases():
+        while not stop.wait(QUEUE_LEASE_SECONDS / 3):
+            with held_lock:
+                units = list(held.values())
+            for unit in units:
+                if not queue.renew(unit, worker_id):
+                    logging.warning(f"Worker {worker_id} lost the lease of {unit}")
+
+    def drain():
+        while True:
+            unit = queue.lease(worker_id)
+            if unit is None:
+                if queue.drained():
+                    return
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+
+            with held_lock:
+                held[threading.current_thread().name] = unit
+            if unit in tasks:
+                result = scheduler.run_task(unit)
+            else:
+                result = {"status": "failed", "seconds": 0.0, "error": "unknown work unit"}
+            with held_lock:
+                held.pop(threading.current_thread().name, None)
+
+            results[unit] = result
+            if result["status"] == "done":
+                if not queue.ack(unit, worker_id, result["seconds"]):
+                    logging.warning(f"Worker {worker_id} finished {unit} after losing its lease; left to its new owner")
+            elif not queue.fail(unit, worker_id, result["seconds"], result["error"]):
+                logging.info(f"Worker {worker_id} queued {unit} again after: {result['error']}")
+
+    logging.info(f"Worker {worker_id} started with {threads} threads, "
+                 f"at 1/{workers} of the rate limit ({rate_governor.max_rps:g} requests/s)")
+    heartbeat = threading.Thread(target=renew_leases, name="lease-heartbeat", daemon=True)
+    heartbeat.start()
+    unit_threads = [threading.Thread(target=drain, name=f"unit-{index}") for index in range(threads)]
+    for thread in unit_threads:
+        thread.start()
+    for thread in unit_threads:
+        thread.join()
+    stop.set()
+
+    logging.info(f"Worker {worker_id} finished {len(results)} units")
+    for tenant_name, client in clients.items():
+        save_changes(tenant_name, client, worker_id)
+    if RUN_METRICS:
+        export_run_metrics(results, rate_governor.budget(), clients, worker_id=worker_id)
+
+
+def run_role(role: str = ETL_ROLE) -> None:
+    """Run this process as a "coordinator" or "worker" of a distributed run.
+
+    Raises:
+        ValueError: For an unknown role.
+    """
+    if role == "coordinator":
+        run_coordinator()
+    elif role == "worker":
+        run_worker()
+    else:
+        raise ValueError(f"Unknown ETL_ROLE '{role}', expected 'standalone', 'coordinator' or 'worker'")
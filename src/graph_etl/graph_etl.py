@@ -3,14 +3,47 @@ import json
 import os
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from auth.graph_api_auth import FacebookTokenManager
 from config.config import (
-    ADS_ACCOUNT, OUTPUT_PATH,
-    PAGE_ENDPOINT_BASE, PAGE_METRICS, PAGE_METRICS_ENDPOINT_BASE, POST_ENDPOINT_BASE, POST_METRICS
+    ADS_INSIGHTS_MODE, ADS_INSIGHTS_WORKERS, BATCH_SIZE, CHANGE_TRACKING, INLINE_POST_INSIGHTS, MAX_WORKERS,
+    METRICS_DIR, METRICS_TEXTFILE, NORMALIZE_OUTPUT, OUTPUT_BACKEND, PAGE_SIZE_TUNING, REPORT_MAX_IN_FLIGHT,
+    RESPONSE_CACHE, RUN_CHECKPOINTS, RUN_METRICS, SYNC_INCREMENTAL, TENANT_MANIFEST, TENANT_MAX_TASKS,
+    INSTA_INSIGHTS_WORKERS, INSTA_PAGE_METRICS, INSTA_POST_METRICS, INSTA_REEL_METRICS, PAGE_METRICS,
+    PAGE_METRICS_MAX_DAYS, POST_METRICS
 )
+from config.tenants import Tenant, load_tenants
 from extract.api_client import GraphAPIClient
-from utils.utils import get_last_months_intervals
+from extract.http_session import get_session
+from extract.page_sizer import PageSizer
+from extract.rate_limiter import get_rate_governor
+from extract.report_jobs import InsightsReportRunner
+from extract.response_cache import ResponseCache
+from extract.segment_store import SegmentStore
+from extract.stream_writer import read_ndjson, streamed_file_name
+from graph_etl.scheduler import TaskScheduler
+from state.change_index import ChangeIndex
+from state.checkpoints import CheckpointJournal
+from state.sync_state import SyncStateStore, interval_key
+from transform.normalize import normalize_tenant, require_format
+from utils.run_metrics import get_run_metrics
+from utils.utils import get_last_months_intervals, split_date_range
+from utils.window_planner import fetch_window, plan_windows, slice_insights_values
+
+POST_FIELDS = "id,message,created_time,attachments{media_type,media,url}"
+
+INSTA_MEDIA_FIELDS = "id,caption,media_type,media_product_type,media_url,timestamp,permalink"
+
+# Instagram account metrics only available as daily time series (the rest are requested as total_value)
+INSTA_TIME_SERIES_METRICS = {"reach", "follower_count"}
+
+# Longest since/until range Instagram account insights accept
+INSTA_MAX_RANGE_DAYS = 30
+
+ADS_INSIGHTS_FIELDS = "spend,clicks,impressions,reach,ctr,cpc"
+
+# Output category -> value of the `level` parameter of account-level insights
+ADS_INSIGHTS_LEVELS = {"campaigns": "campaign", "adsets": "adset", "ads": "ad"}
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -59,6 +92,17 @@ def fetch_and_save(client: GraphAPIClient,
     )
 
 
+def log_batch_failures(failed: List[Dict], label: str) -> None:
+    """Log the sub-requests a batch fetch could not complete.
+
+    Args:
+        failed (List[Dict]): Failed sub-requests returned by `GraphAPIClient.fetch_batch`.
+        label (str): Human-readable description of the batch.
+    """
+    for item in failed:
+        logging.error(f"Error fetching {label} for {item['endpoint']}: {item['error']}")
+
+
 def load_json_file(file_path: str) -> Optional[Dict]:
     """Load a JSON file and return its contents.
 
@@ -76,95 +120,418 @@ def load_json_file(file_path: str) -> Optional[Dict]:
         return None
 
 
-def fetch_page_metrics(client: GraphAPIClient, intervals: List[Dict[str, str]]) -> None:
+def load_output_file(output_dir: str, file_name: str) -> Optional[Dict]:
+    """Load a file written by `GraphAPIClient.fetch_data`, whichever OUTPUT_FORMAT wrote it.
+
+    When both a JSON and an NDJSON version exist, the most recently written one is used.
+
+    Args:
+        output_dir (str): Directory of the file.
+        file_name (str): File name as passed to `fetch_data`.
+
+    Returns:
+        Optional[Dict]: `{"data": [...]}` style contents or None if no readable file exists.
+    """
+    candidates = [
+        os.path.join(output_dir, name)
+        for name in (file_name, streamed_file_name(file_name), streamed_file_name(file_name, "gzip"))
+    ]
+    existing = [path for path in candidates if os.path.exists(path)]
+    if not existing:
+        logging.error(f"Error loading output file {os.path.join(output_dir, file_name)}: not found")
+        return None
+
+    latest = max(existing, key=os.path.getmtime)
+    if latest == candidates[0]:
+        return load_json_file(latest)
+    try:
+        return {"data": read_ndjson(latest)}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Error loading NDJSON file {latest}: {e}")
+        return None
+
+
+def pending_intervals(client: GraphAPIClient,
+                      sync_state: Optional[SyncStateStore],
+                      endpoint: str,
+                      intervals: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Drop the intervals whose data for `endpoint` is already final on disk or was
+    completed earlier in an interrupted run.
+
+    Args:
+        client (GraphAPIClient): The API client instance (holds the checkpoint journal).
+        sync_state (Optional[SyncStateStore]): Sync state, or None to ignore watermarks.
+        endpoint (str): Logical endpoint name used in the sync state.
+        intervals (List[Dict[str, str]]): List of date intervals.
+
+    Returns:
+        List[Dict[str, str]]: Intervals that still need to be fetched.
+    """
+    pending = [
+        interval for interval in intervals
+        if (sync_state is None or sync_state.needs_interval(endpoint, interval))
+        and (client.checkpoints is None or not client.checkpoints.is_done(f"{endpoint}:{interval_key(interval)}"))
+    ]
+    if len(pending) < len(intervals):
+        logging.info(f"Skipping {len(intervals) - len(pending)} up-to-date intervals for {endpoint}")
+    return pending
+
+
+def complete_interval(client: GraphAPIClient,
+                      sync_state: Optional[SyncStateStore],
+                      endpoint: str,
+                      interval: Dict[str, str],
+                      complete: bool = True) -> None:
+    """Record that an interval of `endpoint` was fetched.
+
+    Args:
+        client (GraphAPIClient): The API client instance (holds the checkpoint journal).
+        sync_state (Optional[SyncStateStore]): Sync state to update, if any.
+        endpoint (str): Logical endpoint name used in the sync state.
+        interval (Dict[str, str]): The date interval.
+        complete (bool): Whether every unit of the interval was fetched successfully.
+    """
+    if sync_state:
+        sync_state.mark_interval(endpoint, interval, complete=complete)
+        sync_state.save()
+    if client.checkpoints is not None and complete:
+        client.checkpoints.mark_done(f"{endpoint}:{interval_key(interval)}")
+
+
+def fetch_page_metrics(client: GraphAPIClient,
+                       intervals: List[Dict[str, str]],
+                       sync_state: Optional[SyncStateStore] = None) -> None:
     """Fetch page-level metrics from the Facebook Graph API.
 
+    Pending months are merged into windows of up to PAGE_METRICS_MAX_DAYS days, one request
+    each, and the daily values are saved back into one file per month.
+
     Args:
         client (GraphAPIClient): The API client instance.
         intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
     """
-    for interval in intervals:
-        fetch_and_save(
-            client,
-            params={
-                'metric': PAGE_METRICS,
-                  'since': interval["since"],
-                    'until': interval["until"],
-                     'period': 'day'},
-            endpoint=PAGE_METRICS_ENDPOINT_BASE,
-            output_dir=f"{OUTPUT_PATH}/facebook_page_metrics",
-            file_name=f"{interval['start_date']}_{interval['until']}.json"
-        )
+    def fetch(window):
+        entries = []
+        for page in client.iter_pages(
+                client.tenant.page_metrics_endpoint,
+                {'metric': PAGE_METRICS, 'since': window["since"], 'until': window["until"], 'period': 'day'}):
+            entries.extend(page.get("data", []))
+        return entries
+
+    output_dir = str(ensure_directory(f"{client.tenant.output_path}/facebook_page_metrics"))
+    for window in plan_windows(pending_intervals(client, sync_state, "page_metrics", intervals), PAGE_METRICS_MAX_DAYS):
+        entries = fetch_window(fetch, window, exclusive_since=True)
+        for interval in window["intervals"]:
+            client.save_data(
+                output_dir,
+                f"{interval['start_date']}_{interval['until']}.json",
+                {"data": slice_insights_values(entries, interval)}
+            )
+            complete_interval(client, sync_state, "page_metrics", interval)
 
 
-def fetch_posts(client: GraphAPIClient, intervals: List[Dict[str, str]]) -> None:
+def fetch_posts(client: GraphAPIClient,
+                intervals: List[Dict[str, str]],
+                sync_state: Optional[SyncStateStore] = None) -> None:
     """Fetch posts from the Facebook page.
 
     Args:
         client (GraphAPIClient): The API client instance.
         intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
     """
-    for interval in intervals:
+    for interval in pending_intervals(client, sync_state, "posts", intervals):
         fetch_and_save(
             client,
-            params={"fields": "id,message,created_time,attachments{media_type,media,url}",
-                    'since': interval["since"], 'until': interval["until"]},
-            endpoint=POST_ENDPOINT_BASE,
-            output_dir=f"{OUTPUT_PATH}/facebook_posts",
+            params={"fields": POST_FIELDS,
+                    'since': interval["since"], 'until': interval["until"], 'limit': 25},
+            endpoint=client.tenant.post_endpoint,
+            output_dir=f"{client.tenant.output_path}/facebook_posts",
             file_name=f"{interval['start_date']}_{interval['until']}.json"
         )
+        complete_interval(client, sync_state, "posts", interval)
 
 
-def fetch_post_metrics(client: GraphAPIClient, intervals: List[Dict[str, str]]) -> None:
-    """Fetch post-level metrics.
+def fetch_post_insights(client: GraphAPIClient,
+                        posts: List[Dict],
+                        label: str,
+                        sync_state: Optional[SyncStateStore] = None) -> List[Dict]:
+    """Fetch the insights of the given posts with batched per-post requests.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        posts (List[Dict]): Posts with at least an `id`.
+        label (str): Human-readable description used when logging failures.
+        sync_state (Optional[SyncStateStore]): When set, record the posts fetched successfully.
+
+    Returns:
+        List[Dict]: Sub-requests that failed.
+    """
+    output_dir = ensure_directory(f"{client.tenant.output_path}/facebook_post_metrics")
+    failed = client.fetch_batch([
+        {
+            "endpoint": f"{post['id']}/insights",
+            "params": {"metric": POST_METRICS},
+            "output_dir": str(output_dir),
+            "file_name": f"{post['id']}.json"
+        }
+        for post in posts
+    ])
+    log_batch_failures(failed, label)
+
+    if sync_state:
+        failed_endpoints = {item["endpoint"] for item in failed}
+        sync_state.mark_entities(
+            "post_metrics",
+            [post["id"] for post in posts if f"{post['id']}/insights" not in failed_endpoints]
+        )
+        sync_state.save()
+    return failed
+
+
+def fetch_post_metrics(client: GraphAPIClient,
+                       intervals: List[Dict[str, str]],
+                       sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch post-level metrics, batching the per-post insights requests.
 
     Args:
         client (GraphAPIClient): The API client instance.
         intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, only fetch new posts and posts
+            whose metrics may still change.
     """
     for interval in intervals:
-        posts_data = load_json_file(
-            f"{OUTPUT_PATH}/facebook_posts/{interval['start_date']}_{interval['until']}.json")
-        if posts_data:
-            for post in posts_data.get("data", []):
-                fetch_and_save(
-                    client,
-                    params={"metric": POST_METRICS},
-                    endpoint=f"{post['id']}/insights",
-                    output_dir=f"{OUTPUT_PATH}/facebook_post_metrics",
-                    file_name=f"{post['id']}.json"
-                )
+        if client.checkpoints is not None and client.checkpoints.is_done(f"post_metrics:{interval_key(interval)}"):
+            continue
+
+        posts_data = load_output_file(
+            f"{client.tenant.output_path}/facebook_posts", f"{interval['start_date']}_{interval['until']}.json")
+        if not posts_data:
+            continue
+
+        posts = [
+            post for post in posts_data.get("data", [])
+            if sync_state is None or sync_state.needs_entity("post_metrics", post["id"], post["created_time"])
+        ]
+        failed = fetch_post_insights(
+            client, posts, f"post metrics {interval['start_date']} to {interval['until']}", sync_state)
 
+        if client.checkpoints is not None and not failed:
+            client.checkpoints.mark_done(f"post_metrics:{interval_key(interval)}")
 
-def fetch_instagram_data(client: GraphAPIClient) -> None:
-    """Fetch Instagram business account, media, and metrics.
+
+def fetch_posts_with_insights(client: GraphAPIClient,
+                              intervals: List[Dict[str, str]],
+                              sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch posts with their insights requested inline as a nested `insights` field.
+
+    Writes the same `facebook_posts/` and `facebook_post_metrics/` files as `fetch_posts`
+    followed by `fetch_post_metrics`. Only posts whose inline insights are missing or were
+    truncated (cursor-paginated) are fetched again with batched per-post requests.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    posts_dir = ensure_directory(f"{client.tenant.output_path}/facebook_posts")
+    metrics_dir = ensure_directory(f"{client.tenant.output_path}/facebook_post_metrics")
+
+    for interval in pending_intervals(client, sync_state, "posts", intervals):
+        posts, inline_ids, fallback = [], [], []
+
+        for page in client.iter_pages(
+            client.tenant.post_endpoint,
+            {"fields": f"{POST_FIELDS},insights.metric({POST_METRICS})",
+             "since": interval["since"], "until": interval["until"], "limit": 25}
+        ):
+            for post in page.get("data", []):
+                insights = post.pop("insights", None)
+                posts.append(post)
+
+                paging = (insights or {}).get("paging", {})
+                if not insights or (paging.get("next") and paging.get("cursors")):
+                    fallback.append(post)
+                    continue
+
+                client.save_data(str(metrics_dir), f"{post['id']}.json", {"data": insights.get("data", [])})
+                inline_ids.append(post["id"])
+
+        client.save_data(str(posts_dir), f"{interval['start_date']}_{interval['until']}.json", {"data": posts})
+        if sync_state:
+            sync_state.mark_entities("post_metrics", inline_ids)
+
+        if fallback:
+            logging.info(f"Fetching insights separately for {len(fallback)} of {len(posts)} posts")
+            fetch_post_insights(
+                client, fallback, f"post metrics {interval['start_date']} to {interval['until']}", sync_state)
+        complete_interval(client, sync_state, "posts", interval)
+
+
+def load_instagram_account_id(client: GraphAPIClient) -> Optional[str]:
+    """Read the Instagram business account id saved by `fetch_instagram_data`.
 
     Args:
         client (GraphAPIClient): The API client instance.
+
+    Returns:
+        Optional[str]: The account id, or None when the page has no linked Instagram account.
+    """
+    ig_account_data = load_json_file(
+        f"{client.tenant.output_path}/instagram_business_account/instagram_business_account.json")
+    if not ig_account_data:
+        return None
+    return ig_account_data.get("data", {}).get("instagram_business_account", {}).get("id")
+
+
+def fetch_instagram_data(client: GraphAPIClient, sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch the Instagram business account and its media list.
+
+    The media list is newest first. With a sync state and an earlier media file, listing
+    stops after the first page whose media all have final insights already; new pages are
+    merged into the saved list, so it still holds every media item.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        sync_state (Optional[SyncStateStore]): When set, list only media that are new or still changing.
     """
     fetch_and_save(
         client,
         params={"fields": "instagram_business_account"},
-        endpoint=PAGE_ENDPOINT_BASE,
-        output_dir=f"{OUTPUT_PATH}/instagram_business_account",
+        endpoint=client.tenant.page_endpoint,
+        output_dir=f"{client.tenant.output_path}/instagram_business_account",
         file_name="instagram_business_account.json",
         extend_data=False
     )
 
-    ig_account_data = load_json_file(
-        f"{OUTPUT_PATH}/instagram_business_account/instagram_business_account.json")
-    if not ig_account_data:
+    ig_account_id = load_instagram_account_id(client)
+    if not ig_account_id:
+        logging.info(f"No Instagram business account linked to page {client.tenant.page_id}")
         return
 
-    ig_account_id = ig_account_data.get("data", {}).get("instagram_business_account", {}).get("id")
+    media_dir = f"{client.tenant.output_path}/instagram_media"
+    known = load_output_file(media_dir, "instagram_media.json") if sync_state else None
+    media_by_id = {media["id"]: media for media in (known or {}).get("data", [])}
 
-    fetch_and_save(
-        client,
-        params={"fields": "id,caption,media_type,media_url,timestamp,permalink"},
-        endpoint=f"{ig_account_id}/media",
-        output_dir=f"{OUTPUT_PATH}/instagram_media",
-        file_name="instagram_media.json"
-    )
+    listed = 0
+    for page in client.iter_pages(f"{ig_account_id}/media", {"fields": INSTA_MEDIA_FIELDS, "limit": 100}):
+        items = page.get("data", [])
+        listed += len(items)
+        media_by_id.update((media["id"], media) for media in items)
+        if known and items and not any(
+            sync_state.needs_entity("instagram_media_insights", media["id"], media["timestamp"]) for media in items
+        ):
+            break  # Older media are final too
+
+    logging.info(f"Listed {listed} Instagram media, {len(media_by_id)} known in total")
+    media = sorted(media_by_id.values(), key=lambda item: item.get("timestamp", ""), reverse=True)
+    client.save_data(str(ensure_directory(media_dir)), "instagram_media.json", {"data": media})
+
+
+def instagram_metrics_for(media: Dict) -> Optional[str]:
+    """Pick the insights metrics of a media item from its product and media type.
+
+    Args:
+        media (Dict): Media item with `media_type` and `media_product_type`.
+
+    Returns:
+        Optional[str]: INSTA_REEL_METRICS for reels, INSTA_POST_METRICS for feed posts and
+        albums, or None for stories (their insights expire after 24 hours and are not listed here).
+    """
+    product_type = media.get("media_product_type", "")
+    if product_type == "STORY":
+        return None
+    if product_type == "REELS" or media.get("media_type") == "REELS":
+        return INSTA_REEL_METRICS
+    return INSTA_POST_METRICS
+
+
+def fetch_instagram_media_insights(client: GraphAPIClient,
+                                   sync_state: Optional[SyncStateStore] = None,
+                                   max_workers: int = INSTA_INSIGHTS_WORKERS) -> None:
+    """Fetch per-media Instagram insights with batched requests drained by a thread pool.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        sync_state (Optional[SyncStateStore]): When set, only fetch media that are new or
+            whose metrics may still change.
+        max_workers (int): Threads draining the batches.
+
+    Raises:
+        RuntimeError: If any media insights request failed.
+    """
+    media_data = load_output_file(f"{client.tenant.output_path}/instagram_media", "instagram_media.json")
+    if not media_data:
+        return
+
+    output_dir = str(ensure_directory(f"{client.tenant.output_path}/instagram_media_insights"))
+    units = []
+    for media in media_data.get("data", []):
+        metrics = instagram_metrics_for(media)
+        if not metrics:
+            continue
+        if sync_state and not sync_state.needs_entity("instagram_media_insights", media["id"], media["timestamp"]):
+            continue
+        units.append({
+            "endpoint": f"{media['id']}/insights",
+            "params": {"metric": metrics},
+            "output_dir": output_dir,
+            "file_name": f"{media['id']}.json"
+        })
+
+    failed = drain_batch_queue(client, units, max_workers, "Instagram media insights")
+
+    if sync_state:
+        failed_endpoints = {item["endpoint"] for item in failed}
+        sync_state.mark_entities(
+            "instagram_media_insights",
+            [unit["endpoint"].split("/")[0] for unit in units if unit["endpoint"] not in failed_endpoints]
+        )
+        sync_state.save()
+    if failed:
+        raise RuntimeError(f"{len(failed)} Instagram media insights requests failed")
+
+
+def fetch_instagram_account_insights(client: GraphAPIClient,
+                                     intervals: List[Dict[str, str]],
+                                     sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch account-level Instagram metrics (INSTA_PAGE_METRICS) per interval.
+
+    Instagram accepts at most 30 days per request, so every interval is fetched in 30-day
+    windows. Metrics only available as daily time series are requested separately from the
+    `total_value` ones.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+    """
+    ig_account_id = load_instagram_account_id(client)
+    if not ig_account_id:
+        return
+
+    metrics = INSTA_PAGE_METRICS.split(",")
+    metric_queries = [
+        {"metric": ",".join(m for m in metrics if m in INSTA_TIME_SERIES_METRICS), "period": "day"},
+        {"metric": ",".join(m for m in metrics if m not in INSTA_TIME_SERIES_METRICS), "period": "day",
+         "metric_type": "total_value"}
+    ]
+
+    for interval in pending_intervals(client, sync_state, "instagram_account_insights", intervals):
+        data = []
+        for window in split_date_range(interval["since"], interval["until"], INSTA_MAX_RANGE_DAYS):
+            for params in metric_queries:
+                if params["metric"]:
+                    for page in client.iter_pages(f"{ig_account_id}/insights", {**params, **window}, paginate=False):
+                        data.extend(page.get("data", []))
+
+        client.save_data(
+            str(ensure_directory(f"{client.tenant.output_path}/instagram_account_insights")),
+            f"{interval['start_date']}_{interval['until']}.json",
+            {"data": data}
+        )
+        complete_interval(client, sync_state, "instagram_account_insights", interval)
 
 
 def fetch_facebook_ads(client: GraphAPIClient) -> None:
@@ -183,52 +550,311 @@ def fetch_facebook_ads(client: GraphAPIClient) -> None:
         fetch_and_save(
             client,
             params={"fields": fields, "limit": 100},
-            endpoint=f"act_{ADS_ACCOUNT}/{category}",
-            output_dir=f"{OUTPUT_PATH}/{category}",
+            endpoint=f"act_{client.tenant.ads_account}/{category}",
+            output_dir=f"{client.tenant.output_path}/{category}",
             file_name=f"{category}_list.json",
             page=False
         )
 
 
-def fetch_ads_insights_for_interval(client: GraphAPIClient, interval: Dict[str, str]) -> None:
+def load_ads_entities(output_path: Path) -> Dict[str, List[Dict]]:
+    """Load the campaign, ad set and ad lists written by `fetch_facebook_ads`.
+
+    Args:
+        output_path (Path): Output root of the tenant.
+
+    Returns:
+        Dict[str, List[Dict]]: Entities per category; missing lists are empty.
+    """
+    entities = {}
+    for category in ADS_INSIGHTS_LEVELS:
+        data = load_output_file(f"{output_path}/{category}", f"{category}_list.json")
+        entities[category] = data.get("data", []) if data else []
+    return entities
+
+
+def ads_insights_units(entities: Dict[str, List[Dict]],
+                       intervals: List[Dict[str, str]],
+                       output_path: Path) -> List[Dict]:
+    """Build one per-entity insights request for every (entity x interval) pair.
+
+    Args:
+        entities (Dict[str, List[Dict]]): Entities per category, see `load_ads_entities`.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        output_path (Path): Output root of the tenant.
+
+    Returns:
+        List[Dict]: Sub-requests for `GraphAPIClient.fetch_batch`, tagged with their `interval`.
+    """
+    units = []
+    for interval in intervals:
+        time_range = json.dumps({"since": interval["since"], "until": interval["until"]})
+        for category, items in entities.items():
+            output_dir = str(ensure_directory(f"{output_path}/{category}_insights"))
+            units.extend(
+                {
+                    "endpoint": f"{item['id']}/insights",
+                    "params": {"fields": ADS_INSIGHTS_FIELDS, "time_range": time_range, "time_increment": "monthly"},
+                    "output_dir": output_dir,
+                    "file_name": f"{item['id']}_{interval['since']}_to_{interval['until']}.json",
+                    "interval": interval
+                }
+                for item in items
+            )
+    return units
+
+
+def fetch_ads_insights_for_interval(client: GraphAPIClient,
+                                    interval: Dict[str, str],
+                                    entities: Optional[Dict[str, List[Dict]]] = None) -> List[Dict]:
     """Fetch insights for campaigns, ad sets, and ads for a specific interval.
 
     Args:
         client (GraphAPIClient): The API client instance.
         interval (Dict[str, str]): The date interval.
+        entities (Optional[Dict[str, List[Dict]]]): Preloaded entity lists (entity mode only);
+            loaded from disk when omitted.
+
+    Returns:
+        List[Dict]: Per-entity requests that failed (always empty in account mode).
     """
-    insights_fields = "spend,clicks,impressions,reach,ctr,cpc"
+    if ADS_INSIGHTS_MODE == "account":
+        fetch_account_insights_for_interval(client, interval)
+        return []
 
-    for category in ["campaigns", "adsets", "ads"]:
-        data = load_json_file(f"{OUTPUT_PATH}/{category}/{category}_list.json")
-        if not data:
-            continue
+    failed = client.fetch_batch(ads_insights_units(
+        entities or load_ads_entities(client.tenant.output_path), [interval], client.tenant.output_path))
+    log_batch_failures(failed, f"ads insights {interval['since']} to {interval['until']}")
+    return failed
+
+
+def drain_batch_queue(client: GraphAPIClient, units: List[Dict], max_workers: int, label: str) -> List[Dict]:
+    """Send many single-object requests as batch requests drained by a thread pool.
+
+    The pool only bounds the batches being worked on: whatever pools are draining at once, the
+    client's request slots keep the requests in flight across the process to the session pool size.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        units (List[Dict]): Sub-requests for `GraphAPIClient.fetch_batch`.
+        max_workers (int): Threads draining the batches.
+        label (str): Human-readable description used in logs.
+
+    Returns:
+        List[Dict]: Every unit that failed, with its `error`.
+    """
+    chunks = [units[start:start + BATCH_SIZE] for start in range(0, len(units), BATCH_SIZE)]
+    logging.info(f"Fetching {len(units)} {label} units in {len(chunks)} batches with {max_workers} workers")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_chunk = {executor.submit(client.fetch_batch, chunk): chunk for chunk in chunks}
+        for future in as_completed(future_to_chunk):
+            try:
+                failed.extend(future.result())
+            except Exception as e:
+                failed.extend({**unit, "error": str(e)} for unit in future_to_chunk[future])
+
+    log_batch_failures(failed, label)
+    logging.info(f"{label} finished: {len(units) - len(failed)} done, {len(failed)} failed")
+    return failed
 
-        for item in data.get("data", []):
-            item_id = item["id"]
-            fetch_and_save(
-                client,
-                params={
-                    "fields": insights_fields,
-                    "time_range": json.dumps(
-                        {"since": interval["since"], "until": interval["until"]}),
-                    "time_increment": "monthly"
-                },
-                endpoint=f"{item_id}/insights",
-                output_dir=f"{OUTPUT_PATH}/{category}_insights",
-                file_name=f"{item_id}_{interval['since']}_to_{interval['until']}.json",
-                page=False
-            )
 
+def fetch_ads_insights_work_queue(client: GraphAPIClient,
+                                  intervals: List[Dict[str, str]],
+                                  sync_state: Optional[SyncStateStore] = None,
+                                  max_workers: int = ADS_INSIGHTS_WORKERS) -> List[Dict]:
+    """Fetch per-entity Ads insights by draining one (entity x interval) work queue.
 
-def fetch_ads_insights_multithreaded(client: GraphAPIClient, intervals: List[Dict[str, str]]) -> None:
+    The entity lists are read once; every (entity x interval) request becomes a unit of
+    work, and units are grouped into batch requests that `max_workers` threads drain. Wall
+    time therefore scales with the number of workers, not with the number of months.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
+        max_workers (int): Threads draining the queue.
+
+    Returns:
+        List[Dict]: Every unit that failed, with its `error`.
+    """
+    intervals = pending_intervals(client, sync_state, "ads_insights", intervals)
+    units = ads_insights_units(load_ads_entities(client.tenant.output_path), intervals, client.tenant.output_path)
+    failed = drain_batch_queue(client, units, max_workers, "ads insights")
+
+    failed_intervals = {interval_key(unit["interval"]) for unit in failed}
+    for interval in intervals:
+        complete_interval(client, sync_state, "ads_insights", interval,
+                          complete=interval_key(interval) not in failed_intervals)
+    return failed
+
+
+def fetch_ads_insights_queue_task(client: GraphAPIClient,
+                                  intervals: List[Dict[str, str]],
+                                  sync_state: Optional[SyncStateStore] = None) -> None:
+    """Scheduler task wrapper of `fetch_ads_insights_work_queue` that fails when any unit failed."""
+    failed = fetch_ads_insights_work_queue(client, intervals, sync_state)
+    if failed:
+        raise RuntimeError(f"{len(failed)} ads insights units failed")
+
+
+def account_insights_params(level: str, interval: Dict[str, str]) -> Dict[str, str]:
+    """Build the parameters of an account-level insights query.
+
+    Args:
+        level (str): Insights level ("campaign", "adset" or "ad").
+        interval (Dict[str, str]): The date interval.
+
+    Returns:
+        Dict[str, str]: Query parameters for `act_{ad_account}/insights`.
+    """
+    return {
+        "level": level,
+        "fields": f"{level}_id,{ADS_INSIGHTS_FIELDS}",
+        "time_range": json.dumps({"since": interval["since"], "until": interval["until"]}),
+        "time_increment": "monthly",
+        "limit": 500
+    }
+
+
+def group_rows_by_id(rows_by_id: Dict[str, List[Dict]], id_field: str, rows: List[Dict]) -> None:
+    """Append insights rows to `rows_by_id`, keyed by the entity id in `id_field`."""
+    for row in rows:
+        rows_by_id.setdefault(row[id_field], []).append(row)
+
+
+def save_insights_rows(client: GraphAPIClient,
+                       category: str,
+                       interval: Dict[str, str],
+                       rows_by_id: Dict[str, List[Dict]]) -> None:
+    """Save account-level insights rows with the same file names as the per-entity calls.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        category (str): Output category ("campaigns", "adsets" or "ads").
+        interval (Dict[str, str]): The date interval.
+        rows_by_id (Dict[str, List[Dict]]): Insights rows grouped by entity id.
+    """
+    output_dir = ensure_directory(f"{client.tenant.output_path}/{category}_insights")
+    for item_id, rows in rows_by_id.items():
+        client.save_data(
+            output_dir=str(output_dir),
+            file_name=f"{item_id}_{interval['since']}_to_{interval['until']}.json",
+            data={"data": rows}
+        )
+
+
+def fetch_account_insights_for_interval(client: GraphAPIClient, interval: Dict[str, str]) -> None:
+    """Fetch campaign, ad set and ad insights with one account-level query per level.
+
+    When the API rejects a month as too much data, the query is bisected and the rows of
+    every part (each covering part of the month) are saved into the month's files.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        interval (Dict[str, str]): The date interval.
+    """
+    for category, level in ADS_INSIGHTS_LEVELS.items():
+        def fetch(window, level=level):
+            rows = []
+            for page in client.iter_pages(f"act_{client.tenant.ads_account}/insights",
+                                          account_insights_params(level, window)):
+                rows.extend(page.get("data", []))
+            return rows
+
+        rows_by_id: Dict[str, List[Dict]] = {}
+        group_rows_by_id(rows_by_id, f"{level}_id", fetch_window(fetch, interval))
+        save_insights_rows(client, category, interval, rows_by_id)
+
+
+def fetch_report_insights(client: GraphAPIClient,
+                          runner: InsightsReportRunner,
+                          category: str,
+                          interval: Dict[str, str]) -> None:
+    """Fetch one level of account insights for an interval through an async report run.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        runner (InsightsReportRunner): Report run helper.
+        category (str): Output category ("campaigns", "adsets" or "ads").
+        interval (Dict[str, str]): The date interval.
+    """
+    level = ADS_INSIGHTS_LEVELS[category]
+    rows_by_id: Dict[str, List[Dict]] = {}
+    runner.run(
+        client.tenant.ads_account,
+        account_insights_params(level, interval),
+        lambda rows: group_rows_by_id(rows_by_id, f"{level}_id", rows)
+    )
+    save_insights_rows(client, category, interval, rows_by_id)
+
+
+def fetch_ads_insights_async_reports(client: GraphAPIClient,
+                                     intervals: List[Dict[str, str]],
+                                     sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch Ads insights as async report runs, keeping up to REPORT_MAX_IN_FLIGHT jobs running.
+
+    The jobs' threads mostly sleep between polls; their requests take the client's request slots like
+    every other request of the process, so the pool adds no requests in flight beyond the session pool size.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, record each fully fetched interval.
+    """
+    runner = InsightsReportRunner(client)
+    failed_intervals = set()
+
+    with ThreadPoolExecutor(max_workers=REPORT_MAX_IN_FLIGHT) as executor:
+        future_to_job = {
+            executor.submit(fetch_report_insights, client, runner, category, interval): (category, interval)
+            for interval in intervals
+            for category in ADS_INSIGHTS_LEVELS
+        }
+
+        for future in as_completed(future_to_job):
+            category, interval = future_to_job[future]
+            try:
+                future.result()
+                logging.info(
+                    f"Successfully fetched {category} insights report for interval: "
+                    f"{interval['since']} to {interval['until']}")
+            except Exception as e:
+                failed_intervals.add((interval["since"], interval["until"]))
+                logging.error(
+                    f"Error fetching {category} insights report for interval "
+                    f"{interval['since']} to {interval['until']}: {e}")
+
+    for interval in intervals:
+        complete_interval(
+            client, sync_state, "ads_insights", interval,
+            complete=(interval["since"], interval["until"]) not in failed_intervals)
+
+
+def fetch_ads_insights_multithreaded(client: GraphAPIClient,
+                                     intervals: List[Dict[str, str]],
+                                     sync_state: Optional[SyncStateStore] = None) -> None:
     """Fetch Ads insights in parallel for each interval.
 
+    Called from a scheduler task (or `asyncio.to_thread`), so its pool nests inside another; the
+    process-wide request slots keep the requests in flight within the session pool size.
+
     Args:
         client (GraphAPIClient): The API client instance.
         intervals (List[Dict[str, str]]): List of date intervals.
+        sync_state (Optional[SyncStateStore]): When set, skip intervals that are already final.
     """
-    with ThreadPoolExecutor(max_workers=10) as executor:  # Adjust max_workers as needed
+    intervals = pending_intervals(client, sync_state, "ads_insights", intervals)
+
+    if ADS_INSIGHTS_MODE == "async":
+        fetch_ads_insights_async_reports(client, intervals, sync_state)
+        return
+    if ADS_INSIGHTS_MODE == "entity":
+        fetch_ads_insights_work_queue(client, intervals, sync_state)
+        return
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:  # Pool size set by MAX_WORKERS
         future_to_interval = {
             executor.submit(fetch_ads_insights_for_interval, client, interval): interval
             for interval in intervals
@@ -237,42 +863,375 @@ def fetch_ads_insights_multithreaded(client: GraphAPIClient, intervals: List[Dic
         for future in as_completed(future_to_interval):
             interval = future_to_interval[future]
             try:
-                future.result()  # Get the result to catch exceptions
+                failed = future.result()  # Get the result to catch exceptions
                 logging.info(
                     f"Successfully fetched ads insights for interval: {interval['since']} to {interval['until']}")
             except Exception as e:
+                failed = [interval]
                 logging.error(
                     f"Error fetching ads insights for interval {interval['since']} to {interval['until']}: {e}")
 
+            complete_interval(client, sync_state, "ads_insights", interval, complete=not failed)
+
+
+def fetch_ads_insights_interval(client: GraphAPIClient,
+                                interval: Dict[str, str],
+                                sync_state: Optional[SyncStateStore] = None) -> None:
+    """Fetch and record the Ads insights of one interval as a single scheduler task.
+
+    Args:
+        client (GraphAPIClient): The API client instance.
+        interval (Dict[str, str]): The date interval.
+        sync_state (Optional[SyncStateStore]): When set, skip the interval if it is already final.
+
+    Raises:
+        RuntimeError: If any insights request of the interval failed.
+    """
+    if not pending_intervals(client, sync_state, "ads_insights", [interval]):
+        return
+
+    failed = fetch_ads_insights_for_interval(client, interval)
+    complete_interval(client, sync_state, "ads_insights", interval, complete=not failed)
+    if failed:
+        raise RuntimeError(f"{len(failed)} ads insights requests failed")
+
+
+def parse_etl_modes(etl_mode: str) -> List[str]:
+    """Parse ETL_MODE ("social", "ads", "social,ads" or "all") into a list of modes.
+
+    Args:
+        etl_mode (str): Raw ETL_MODE value.
+
+    Returns:
+        List[str]: Selected modes.
+
+    Raises:
+        ValueError: If no valid mode was selected.
+    """
+    modes = ["social", "ads"] if etl_mode.strip() == "all" else [m.strip() for m in etl_mode.split(",") if m.strip()]
+    if not modes or any(mode not in ("social", "ads") for mode in modes):
+        logging.error('Invalid ETL_MODE. Set ETL_MODE to "social", "ads", "social,ads" or "all".')
+        raise ValueError('Invalid ETL_MODE. Please set ETL_MODE to "social", "ads", "social,ads" or "all".')
+    return modes
+
+
+def add_etl_tasks(scheduler: TaskScheduler,
+                  client: GraphAPIClient,
+                  intervals: List[Dict[str, str]],
+                  modes: List[str],
+                  sync_state: Optional[SyncStateStore] = None,
+                  prefix: str = "") -> None:
+    """Register the ETL steps of the selected modes as scheduler tasks.
+
+    Every interval gets its own tasks so months are fetched concurrently; post metrics of
+    an interval depend only on that interval's posts. With NORMALIZE_OUTPUT, a final
+    "normalize" task rebuilds the tenant's columnar tables once all of its other tasks are done. Tasks are grouped by the client's
+    tenant so the scheduler can share workers fairly between tenants.
+
+    Args:
+        scheduler (TaskScheduler): Scheduler to add tasks to.
+        client (GraphAPIClient): The API client instance.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        modes (List[str]): Selected ETL modes.
+        sync_state (Optional[SyncStateStore]): Sync state passed to every step.
+        prefix (str, optional): Prefix of the task names, e.g. "page_a/" in multi-tenant runs.
+    """
+    tenant = client.tenant
+    names = []
+
+    def add(name, fn, *args, deps=()):
+        names.append(name)
+        scheduler.add(f"{prefix}{name}", fn, *args, deps=[f"{prefix}{dep}" for dep in deps], group=tenant.name)
+
+    if "social" in modes:
+        if not tenant.page_id:
+            logging.warning(f"Tenant {tenant.name} has no page id, skipping Social Media ETL")
+        else:
+            logging.info(f"Scheduling Social Media ETL for {tenant.name}...")
+            for window in plan_windows(intervals, PAGE_METRICS_MAX_DAYS):
+                add(f"page_metrics:{interval_key(window)}", fetch_page_metrics, client, window["intervals"], sync_state)
+            for interval in intervals:
+                key = interval_key(interval)
+                if INLINE_POST_INSIGHTS:
+                    add(f"posts:{key}", fetch_posts_with_insights, client, [interval], sync_state)
+                else:
+                    add(f"posts:{key}", fetch_posts, client, [interval], sync_state)
+                    add(f"post_metrics:{key}", fetch_post_metrics, client, [interval], sync_state,
+                        deps=[f"posts:{key}"])
+            add("instagram", fetch_instagram_data, client, sync_state)
+            add("instagram_media_insights", fetch_instagram_media_insights, client, sync_state, deps=["instagram"])
+            for interval in intervals:
+                add(f"instagram_account_insights:{interval_key(interval)}", fetch_instagram_account_insights,
+                    client, [interval], sync_state, deps=["instagram"])
+
+    if "ads" in modes and not tenant.ads_account:
+        logging.warning(f"Tenant {tenant.name} has no ad account, skipping Ads ETL")
+    elif "ads" in modes:
+        logging.info(f"Scheduling Ads ETL for {tenant.name}...")
+        add("ads_lists", fetch_facebook_ads, client)
+        if ADS_INSIGHTS_MODE == "async":
+            # Report runs are mostly waiting on the API, so they keep their own pool; its requests take request slots
+            add("ads_insights", fetch_ads_insights_multithreaded, client, intervals, sync_state,
+                deps=["ads_lists"])
+        elif ADS_INSIGHTS_MODE == "entity":
+            # Per-entity requests are drained by their own ADS_INSIGHTS_WORKERS pool, within the request slots
+            add("ads_insights", fetch_ads_insights_queue_task, client, intervals, sync_state,
+                deps=["ads_lists"])
+        else:
+            for interval in intervals:
+                add(f"ads_insights:{interval_key(interval)}", fetch_ads_insights_interval,
+                    client, interval, sync_state, deps=["ads_lists"])
+
+    if NORMALIZE_OUTPUT and names:
+        require_format()  # Before anything is fetched rather than at the end of the run
+        add("normalize", normalize_tenant, tenant, deps=list(names))
+
+
+def load_etl_tenants() -> List[Tenant]:
+    """Return the tenants of this run: those of TENANT_MANIFEST, or the single tenant of the environment.
+
+    Returns:
+        List[Tenant]: Tenants to run.
+    """
+    if TENANT_MANIFEST:
+        tenants = load_tenants(TENANT_MANIFEST)
+        logging.info(f"Loaded {len(tenants)} tenants from {TENANT_MANIFEST}")
+        return tenants
+    return [Tenant.from_env()]
+
+
+def create_tenant_client(tenant: Tenant, session, rate_governor, use_checkpoints: bool = RUN_CHECKPOINTS,
+                         retry_policy=None) -> GraphAPIClient:
+    """Create the API client of a tenant on the shared session, rate governor and retry policy.
+
+    The tenant's checkpoints, response cache, learned page sizes and content hashes live under its state
+    directory; its token and change manifests under its output path.
+
+    Args:
+        tenant (Tenant): The tenant.
+        session (requests.Session): Shared HTTP connection pool.
+        rate_governor (RateGovernor): Shared rate governor.
+        use_checkpoints (bool, optional): Whether to journal progress to resume an interrupted run.
+        retry_policy (RetryPolicy, optional): Shared retry policy; the process-wide one by default.
+
+    Returns:
+        GraphAPIClient: Client authenticated with the tenant's long-lived token.
+    """
+    checkpoints = None
+    if use_checkpoints:  # Resume an interrupted run
+        checkpoints = CheckpointJournal(tenant.state_dir / "checkpoints.jsonl")
+        if checkpoints.resuming:
+            logging.info(f"Resuming previous unfinished run of {tenant.name} from checkpoints...")
+
+    cache = ResponseCache(tenant.cache_dir) if RESPONSE_CACHE else None  # Serve final historical data from disk
+    segments = SegmentStore() if OUTPUT_BACKEND == "segments" else None  # Append per-entity files to segments
+    page_sizer = PageSizer(tenant.state_dir / "page_sizes.json") if PAGE_SIZE_TUNING else None
+    changes = ChangeIndex(  # Skip unchanged writes, list changes
+        tenant.output_path, index_path=tenant.state_dir / "content_hashes.json") if CHANGE_TRACKING else None
+
+    token_manager = FacebookTokenManager(
+        tenant.access_token,
+        session=session,
+        token_file=tenant.token_file,
+        encryption_key_file=tenant.encryption_key_file
+    )
+    return GraphAPIClient(
+        session=session,
+        rate_governor=rate_governor,
+        retry_policy=retry_policy,
+        checkpoints=checkpoints,
+        cache=cache,
+        tenant=tenant,
+        access_token=token_manager.get_token(),
+        segments=segments,
+        page_sizer=page_sizer,
+        changes=changes
+    )
+
+
+def export_run_metrics(results: Dict[str, Dict],
+                       rate_budget: Dict,
+                       clients: Dict[str, GraphAPIClient],
+                       worker_id: Optional[str] = None) -> None:
+    """Write the run report (JSON) and the Prometheus textfile, and log the headline numbers.
+
+    Args:
+        results (Dict[str, Dict]): Task results returned by `TaskScheduler.run`.
+        rate_budget (Dict): Final rate governor budget.
+        clients (Dict[str, GraphAPIClient]): Clients per tenant, for their cache statistics, page sizes and changes.
+        worker_id (Optional[str]): Worker of a distributed run; its report goes to
+            METRICS_DIR/workers/{worker_id}.json and no textfile is written.
+    """
+    metrics = get_run_metrics()
+    report_path = METRICS_DIR / "workers" / f"{worker_id}.json" if worker_id else METRICS_DIR / "run_report.json"
+    try:
+        metrics.write_json(
+            report_path,
+            tasks=results,
+            rate_budget=rate_budget,
+            caches={name: client.cache.summary() for name, client in clients.items() if client.cache is not None},
+            page_sizes={name: client.page_sizer.summary() for name, client in clients.items()
+                        if client.page_sizer is not None},
+            changes={name: client.changes.summary() for name, client in clients.items() if client.changes is not None}
+        )
+        if not worker_id:
+            metrics.write_prometheus(METRICS_TEXTFILE)
+    except OSError as e:
+        logging.error(f"Error writing run metrics: {e}")
+        return
+
+    report = metrics.report()
+    requests_sent = sum(sum(stats["status"].values()) for stats in report["requests"].values())
+    logging.info(
+        f"Run metrics: {requests_sent} requests, "
+        f"{sum(report['throttle_wait_seconds'].values()):.1f}s throttled, "
+        f"pool utilization {report['pool']['utilization']:.0%} (peak {report['pool']['peak_in_flight']}); "
+        f"report in {report_path}")
+
+
+def register_tenants(scheduler: TaskScheduler,
+                     tenants: List[Tenant],
+                     session,
+                     rate_governor,
+                     intervals: List[Dict[str, str]],
+                     modes: List[str],
+                     use_checkpoints: bool = RUN_CHECKPOINTS,
+                     add_tasks: Callable = add_etl_tasks,
+                     retry_policy=None) -> Tuple[Dict[str, GraphAPIClient], List[str]]:
+    """Create every tenant's client and register its ETL tasks.
+
+    With several tenants, task names are prefixed with "{tenant}/". A tenant whose client
+    cannot be created is skipped, unless it is the only one.
+
+    Args:
+        scheduler (TaskScheduler): Scheduler to add tasks to.
+        tenants (List[Tenant]): Tenants of the run.
+        session (requests.Session): Shared HTTP connection pool.
+        rate_governor (RateGovernor): Shared rate governor.
+        intervals (List[Dict[str, str]]): List of date intervals.
+        modes (List[str]): Selected ETL modes.
+        use_checkpoints (bool, optional): Whether clients journal progress for resuming.
+        add_tasks (Callable, optional): Registers a tenant's tasks, with the signature of `add_etl_tasks`.
+        retry_policy (RetryPolicy, optional): Shared retry policy; the process-wide one by default.
+
+    Returns:
+        Tuple[Dict[str, GraphAPIClient], List[str]]: Clients per tenant, and the tenants that could not be set up.
+    """
+    multi_tenant = len(tenants) > 1
+    clients: Dict[str, GraphAPIClient] = {}
+    setup_failed = []
+
+    for tenant in tenants:
+        try:
+            client = create_tenant_client(tenant, session, rate_governor, use_checkpoints, retry_policy)
+        except Exception as e:
+            if not multi_tenant:
+                raise
+            logging.error(f"Skipping tenant {tenant.name}: {e}")
+            setup_failed.append(tenant.name)
+            continue
+
+        clients[tenant.name] = client
+        sync_state = SyncStateStore(tenant.state_dir / "sync_state.json") if SYNC_INCREMENTAL else None
+        add_tasks(scheduler, client, intervals, modes, sync_state, prefix=f"{tenant.name}/" if multi_tenant else "")
+
+    return clients, setup_failed
+
+
+def log_task_results(results: Dict[str, Dict]) -> None:
+    """Log every task's outcome, slowest first."""
+    for name, result in sorted(results.items(), key=lambda item: -item[1]["seconds"]):
+        logging.info(f"Task {name}: {result['status']} in {result['seconds']:.1f}s")
+
+
+def raise_for_failures(results: Dict[str, Dict], setup_failed: List[str]) -> None:
+    """Raise when any task did not finish or any tenant could not be set up.
+
+    Raises:
+        RuntimeError: Listing the failed or skipped tasks and the tenants not started.
+    """
+    failed = [name for name, result in results.items() if result["status"] != "done"]
+    if failed or setup_failed:
+        raise RuntimeError(
+            f"ETL finished with {len(failed)} failed or skipped tasks: {', '.join(sorted(failed))}"
+            + (f"; tenants not started: {', '.join(setup_failed)}" if setup_failed else ""))
+
 
 def etl() -> None:
-    """Run the complete ETL process."""
+    """Run the complete ETL process for every tenant over one shared worker pool."""
     logging.info("Starting ETL process...")
 
-    client = GraphAPIClient()
+    session = get_session(MAX_WORKERS)
+    rate_governor = get_rate_governor()  # One governor paces every tenant
     num_months = int(os.getenv("NUM_MONTHS_DATA", "1"))
     intervals = get_last_months_intervals(num_months=num_months)
 
-    etl_mode = os.getenv("ETL_MODE", "").lower()  # Get ETL mode
+    modes = parse_etl_modes(os.getenv("ETL_MODE", "").lower())  # Get ETL mode(s)
+
+    tenants = load_etl_tenants()
+    multi_tenant = len(tenants) > 1
+    scheduler = TaskScheduler(max_workers=MAX_WORKERS, max_per_group=TENANT_MAX_TASKS if multi_tenant else None)
+    clients, setup_failed = register_tenants(scheduler, tenants, session, rate_governor, intervals, modes)
+
+    results = scheduler.run()
+    finish_run(results, rate_governor, clients, setup_failed, multi_tenant)
+
+
+def save_changes(tenant_name: str, client: GraphAPIClient, worker_id: Optional[str] = None) -> None:
+    """Save the content hashes of a tenant's outputs and write the manifest of what this run changed.
+
+    Args:
+        tenant_name (str): Name of the tenant.
+        client (GraphAPIClient): The tenant's client.
+        worker_id (Optional[str]): Worker of a distributed run, which writes a manifest of its own.
+    """
+    if client.changes is None:
+        return
+    try:
+        manifest_path = client.changes.save(worker_id)
+    except OSError as e:
+        logging.error(f"Error writing the change manifest of {tenant_name}: {e}")
+        return
+    if manifest_path:
+        logging.info(f"Changes of {tenant_name}: {client.changes.summary()}, manifest {manifest_path}")
+
+
+def finish_run(results: Dict[str, Dict],
+               rate_governor,
+               clients: Dict[str, GraphAPIClient],
+               setup_failed: List[str],
+               multi_tenant: bool) -> None:
+    """Log and export the outcome of a standalone run, write the change manifests and clear the checkpoints
+    of finished tenants.
+
+    Args:
+        results (Dict[str, Dict]): Task results, as returned by `TaskScheduler.run`.
+        rate_governor (RateGovernor): Shared rate governor.
+        clients (Dict[str, GraphAPIClient]): Clients per tenant.
+        setup_failed (List[str]): Tenants that could not be set up.
+        multi_tenant (bool): Whether task names are prefixed with "{tenant}/".
+
+    Raises:
+        RuntimeError: If any task did not finish or any tenant could not be set up.
+    """
+    log_task_results(results)
+    logging.info(f"Graph API rate budget: {rate_governor.budget()}")
 
-    token_manager = FacebookTokenManager(os.getenv("ACCESS_TOKEN", ""))
-    os.environ["ACCESS_TOKEN"] = token_manager.get_token()
+    failed = [name for name, result in results.items() if result["status"] != "done"]
+    for tenant_name, client in clients.items():
+        if client.cache is not None:
+            logging.info(f"Response cache of {tenant_name}: {client.cache.summary()}")
+        save_changes(tenant_name, client)
 
-    if etl_mode == "social":
-        logging.info("Running Social Media ETL...")
-        fetch_page_metrics(client, intervals)
-        fetch_posts(client, intervals)
-        fetch_post_metrics(client, intervals)
-        fetch_instagram_data(client)
+        prefix = f"{tenant_name}/" if multi_tenant else ""
+        if client.checkpoints is not None and not any(name.startswith(prefix) for name in failed):
+            # Checkpoints of tenants with failures are kept so their next run resumes with the failed tasks only
+            client.checkpoints.clear()
 
-    elif etl_mode == "ads":
-        logging.info("Running Ads ETL...")
-        fetch_facebook_ads(client)
-        fetch_ads_insights_multithreaded(client, intervals)  # Run Ads insights in parallel
+    if RUN_METRICS:
+        export_run_metrics(results, rate_governor.budget(), clients)
 
-    else:
-        logging.error('Invalid ETL_MODE. Set ETL_MODE to either "social" or "ads".')
-        raise ValueError('Invalid ETL_MODE. Please set ETL_MODE to "social" or "ads".')
+    raise_for_failures(results, setup_failed)
 
     logging.info("ETL process completed successfully.")
 
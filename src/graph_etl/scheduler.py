@@ -0,0 +1,149 @@
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config.config import MAX_WORKERS
+from utils.run_metrics import get_run_metrics
+
+
+class TaskScheduler:
+    """Runs a DAG of ETL tasks over one bounded thread pool.
+
+    A task starts as soon as all of its dependencies have finished, so independent work
+    (e.g. page metrics of one month and posts of another) runs concurrently while
+    dependent work (e.g. post metrics of a month) starts right after its inputs exist.
+    Tasks whose dependencies failed are skipped. Every task is timed, and its wall time is
+    recorded in the run metrics as a "stage" section (named without the interval suffix).
+
+    Tasks can belong to a `group` (e.g. a tenant). Ready tasks are started round-robin
+    across groups, preferring the group with the fewest running tasks, and no group runs
+    more than `max_per_group` tasks at once, so one large group cannot starve the others.
+
+    Usage:
+        scheduler = TaskScheduler(max_workers=10, max_per_group=5)
+        scheduler.add("posts:2025-01", fetch_posts, client, [interval], group="page_a")
+        scheduler.add("post_metrics:2025-01", fetch_post_metrics, client, [interval], deps=["posts:2025-01"])
+        results = scheduler.run()
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_per_group: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_per_group = max_per_group or max_workers
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, fn: Callable, *args, deps: Iterable[str] = (), group: str = "", **kwargs) -> str:
+        """Register a task.
+
+        Args:
+            name (str): Unique task name.
+            fn (Callable): Function to run.
+            *args: Positional arguments for `fn`.
+            deps (Iterable[str], optional): Names of tasks that must finish first.
+            group (str, optional): Fairness group of the task, e.g. its tenant.
+            **kwargs: Keyword arguments for `fn`.
+
+        Returns:
+            str: The task name, to be used in other tasks' `deps`.
+        """
+        if name in self._tasks:
+            raise ValueError(f"Task '{name}' is already registered.")
+        self._tasks[name] = {"fn": fn, "args": args, "kwargs": kwargs, "deps": list(deps), "group": group}
+        return name
+
+    def graph(self) -> Dict[str, List[str]]:
+        """Return every registered task with its dependencies, in registration order.
+
+        Returns:
+            Dict[str, List[str]]: Task name -> names of the tasks it depends on.
+        """
+        return {name: list(task["deps"]) for name, task in self._tasks.items()}
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """Run every registered task, respecting dependencies.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per task, its `status` ("done", "failed" or "skipped"),
+            wall time in `seconds` and `error` message, if any.
+        """
+        for name, task in self._tasks.items():
+            missing = [dep for dep in task["deps"] if dep not in self._tasks]
+            if missing:
+                raise ValueError(f"Task '{name}' depends on unknown tasks: {missing}")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[str] = list(self._tasks)
+        running = {}
+        running_per_group: Dict[str, int] = defaultdict(int)
+        last_started: Dict[str, int] = {}  # Group -> dispatch counter when it last started a task
+        dispatched = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = []
+                for name in list(pending):
+                    deps = self._tasks[name]["deps"]
+                    if any(results.get(dep, {}).get("status") in ("failed", "skipped") for dep in deps):
+                        pending.remove(name)
+                        results[name] = {"status": "skipped", "seconds": 0.0, "error": "dependency failed"}
+                        logging.warning(f"Skipping task {name}: a dependency failed")
+                    elif all(results.get(dep, {}).get("status") == "done" for dep in deps):
+                        ready.append(name)
+
+                # Only fill free workers, so tasks queued later can still be started first
+                while ready and len(running) < self.max_workers:
+                    name = self._next_fair(ready, running_per_group, last_started)
+                    if name is None:
+                        break
+                    group = self._tasks[name]["group"]
+                    ready.remove(name)
+                    pending.remove(name)
+                    running_per_group[group] += 1
+                    last_started[group] = dispatched
+                    dispatched += 1
+                    running[executor.submit(self.run_task, name)] = name
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Dependency cycle between tasks: {pending}")
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    running_per_group[self._tasks[name]["group"]] -= 1
+                    results[name] = future.result()
+
+        return results
+
+    def _next_fair(self, ready: List[str], running_per_group: Dict[str, int],
+                   last_started: Dict[str, int]) -> Optional[str]:
+        """Pick the next ready task: from the group with the fewest running tasks, then the
+        one that started a task longest ago; None when every ready group is at its cap."""
+        candidates = {}
+        for name in ready:
+            group = self._tasks[name]["group"]
+            if group not in candidates and running_per_group[group] < self.max_per_group:
+                candidates[group] = name  # First ready task of the group keeps registration order
+        if not candidates:
+            return None
+        group = min(candidates, key=lambda g: (running_per_group[g], last_started.get(g, -1)))
+        return candidates[group]
+
+    def run_task(self, name: str) -> Dict[str, Any]:
+        """Run one registered task on its own (dependencies are not checked) and time it,
+        turning exceptions into a "failed" result. Workers of a distributed run use this."""
+        task = self._tasks[name]
+        start = time.perf_counter()
+        try:
+            with get_run_metrics().timer("stage", name.split(":")[0]):
+                task["fn"](*task["args"], **task["kwargs"])
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            logging.error(f"Task {name} failed after {seconds:.1f}s: {e}")
+            return {"status": "failed", "seconds": seconds, "error": str(e)}
+
+        seconds = time.perf_counter() - start
+        logging.info(f"Task {name} finished in {seconds:.1f}s")
+        return {"status": "done", "seconds": seconds, "error": None}
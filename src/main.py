@@ -1,4 +1,12 @@
+from config.config import ETL_ENGINE, ETL_ROLE
 from graph_etl.graph_etl import etl
 
 if __name__ == '__main__':
-    etl()
+    if ETL_ROLE != "standalone":
+        from graph_etl.distributed import run_role
+        run_role(ETL_ROLE)
+    elif ETL_ENGINE == "async":
+        from graph_etl.async_etl import etl_async
+        etl_async()
+    else:
+        etl()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl  # POSIX only; concurrent processes may overwrite each other's updates where it is unavailable
+except ImportError:
+    fcntl = None
+
+from config.config import CHANGE_MANIFESTS_KEEP
+
+NEW, CHANGED, UNCHANGED = "new", "changed", "unchanged"
+
+
+def content_hash(data):
+    """
+    Return the SHA-256 of a payload's canonical JSON form (sorted keys, no whitespace),
+    so the same data hashes the same whatever order the API returned its keys in.
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def record_count(data):
+    """Return the number of records of a payload: the length of its `data` list, else 1."""
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        return len(data["data"])
+    return 1
+
+
+class ChangeIndex:
+    """
+    Content hashes of a tenant's output files, and the outputs written by the current run.
+
+    Writers ask `status` before writing: an output whose hash and location are unchanged is
+    not rewritten, so its file and modification time stay as they were. Every output of the
+    run is then `record`ed as new, changed or unchanged with its record count.
+
+    `save` merges the run's hashes into the index file under a file lock (the workers of a
+    distributed run share it) and writes the run's manifest to `manifest_dir`, so downstream
+    jobs can load only the new and changed outputs. Paths are relative to `root`.
+    """
+
+    def __init__(self, root, index_path=None, manifest_dir=None, keep_manifests=CHANGE_MANIFESTS_KEEP):
+        self.root = str(root)
+        self.index_path = str(index_path or os.path.join(self.root, "state", "content_hashes.json"))
+        self.manifest_dir = str(manifest_dir or os.path.join(self.root, "manifests"))
+        self.keep_manifests = keep_manifests
+        self.started_at = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self._hashes = self._load()
+        self._entries = {}  # Relative path -> manifest entry of the outputs written this run
+
+    def status(self, file_path, digest, exists=True):
+        """
+        Classify an output about to be written.
+
+        Args:
+            file_path (str): Path of the output.
+            digest (str): Content hash of the new data.
+            exists (bool): Whether the output is still where it was last written.
+
+        Returns:
+            str: "unchanged" when the stored output has this hash, "changed" when it has another
+                one, "new" when there is no stored output.
+        """
+        with self._lock:
+            known = self._hashes.get(self._relative(file_path))
+        if not known or not exists:
+            return NEW
+        return UNCHANGED if known["hash"] == digest else CHANGED
+
+    def record(self, file_path, digest, records, status, segment=False):
+        """
+        Record an output of the run once it was written (or skipped as unchanged).
+
+        Args:
+            file_path (str): Path of the output.
+            digest (str): Its content hash.
+            records (int): Number of records it holds.
+            status (str): Result of `status`.
+            segment (bool): Whether it was appended to the segment store instead of written as a file.
+        """
+        path = self._relative(file_path)
+        entry = {"path": path, "status": status, "records": records, "hash": digest}
+        if segment:
+            entry["segment"] = True
+        with self._lock:
+            previous = self._entries.get(path)
+            if previous and previous["status"] != UNCHANGED and status == UNCHANGED:
+                entry["status"] = previous["status"]  # Written twice in one run: the first write is what changed
+            self._entries[path] = entry
+            self._hashes[path] = {"hash": digest, "records": records}
+
+    def summary(self):
+        """Return how many outputs (and records) of the run were new, changed and unchanged."""
+        counts = {status: {"files": 0, "records": 0} for status in (NEW, CHANGED, UNCHANGED)}
+        with self._lock:
+            for entry in self._entries.values():
+                counts[entry["status"]]["files"] += 1
+                counts[entry["status"]]["records"] += entry["records"]
+        return counts
+
+    def save(self, worker_id=None):
+        """
+        Merge the run's hashes into the index and write the run's manifest.
+
+        Args:
+            worker_id (str, optional): Worker of a distributed run, appended to the manifest name.
+
+        Returns:
+            str | None: Path of the manifest; None when the run wrote no output.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(f"{self.index_path}.lock", "w") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    hashes = self._load()
+                    hashes.update({path: self._hashes[path] for path in self._entries})
+                    _write_json(self.index_path, hashes)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self._hashes = hashes
+            entries = sorted(self._entries.values(), key=lambda entry: entry["path"])
+
+        # Microseconds keep back-to-back runs from overwriting each other's manifest
+        name = self.started_at.strftime("%Y%m%dT%H%M%S.%fZ") + (f"-{worker_id}" if worker_id else "")
+        manifest_path = os.path.join(self.manifest_dir, f"{name}.json")
+        _write_json(manifest_path, {
+            "run_started_at": self.started_at.isoformat(),
+            "run_finished_at": datetime.now(timezone.utc).isoformat(),
+            "worker_id": worker_id,
+            "summary": self.summary(),
+            "files": entries
+        })
+        self._prune_manifests()
+        return manifest_path
+
+    def _prune_manifests(self):
+        """Delete all but the newest `keep_manifests` manifests."""
+        if self.keep_manifests <= 0:
+            return
+        names = sorted(name for name in os.listdir(self.manifest_dir) if name.endswith(".json"))
+        for name in names[:-self.keep_manifests]:
+            os.remove(os.path.join(self.manifest_dir, name))
+
+    def _relative(self, file_path):
+        return os.path.relpath(str(file_path), self.root)
+
+    def _load(self):
+        """Load the index, starting empty when it does not exist or is unreadable."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+def _write_json(file_path, data):
+    """Atomically write a JSON document."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, sort_keys=True)
+    os.replace(tmp_path, file_path)
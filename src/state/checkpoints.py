@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config.config import RUN_CHECKPOINT_MAX_AGE_HOURS, STATE_DIR
+
+CHECKPOINT_FILE = STATE_DIR / "checkpoints.jsonl"
+
+# The journal is rewritten with only its live entries once it holds this many times more lines
+COMPACT_RATIO = 4
+
+
+def strip_access_token(url):
+    """Remove the access token from a `paging.next` URL before it is written to disk."""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != "access_token"]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class CheckpointJournal:
+    """
+    Records the progress of the current run so a restarted ETL can pick up where it stopped.
+
+    - cursors: for each output file being paginated, the next page URL (without the access
+      token) and how many records are already spooled to disk.
+    - units: the work units (e.g. "page_metrics:2025-01-31_2025-02-28") already completed.
+
+    The journal is an append-only JSON-lines file, so saving the cursor of a page costs one
+    short line however long the run is; it is compacted to its live entries once it grew
+    `COMPACT_RATIO` times larger. Every entry carries the time it was written, and entries
+    older than `max_age_hours` are ignored when the journal is loaded: a run restarted the next
+    day refetches what may have changed since, instead of trusting a stale unit or cursor.
+
+    The journal is cleared when a run completes, so it only ever describes an unfinished run.
+    """
+
+    def __init__(self, file_path=CHECKPOINT_FILE, max_age_hours=RUN_CHECKPOINT_MAX_AGE_HOURS):
+        self.file_path = str(file_path)
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._cursors = {}  # Output file -> {"next", "records", "t"}
+        self._units = {}  # Unit -> time it was completed
+        self._lines = 0  # Lines in the journal file
+        self._load()
+
+    @property
+    def resuming(self):
+        """Whether the journal holds progress from an earlier, unfinished run."""
+        with self._lock:
+            return bool(self._cursors or self._units)
+
+    def cursor(self, key):
+        """
+        Return the saved pagination cursor of an output file.
+
+        Args:
+            key (str): Output file path.
+
+        Returns:
+            dict | None: `{"next": url, "records": int}` or None when there is nothing to resume.
+        """
+        with self._lock:
+            cursor = self._cursors.get(key)
+        return {"next": cursor["next"], "records": cursor["records"]} if cursor else None
+
+    def save_cursor(self, key, next_url, records):
+        """
+        Save the pagination position of an output file after a page has been spooled.
+
+        Args:
+            key (str): Output file path.
+            next_url (str): The `paging.next` URL of the page just written.
+            records (int): Records spooled so far.
+        """
+        entry = {"cursor": key, "next": strip_access_token(next_url), "records": records, "t": time.time()}
+        with self._lock:
+            self._cursors[key] = entry
+            self._append(entry)
+
+    def clear_cursor(self, key):
+        """Forget the cursor of an output file once it has been written completely."""
+        with self._lock:
+            if self._cursors.pop(key, None) is not None:
+                self._append({"clear": key, "t": time.time()})
+
+    def is_done(self, unit):
+        """Check whether a work unit was completed earlier in this (possibly restarted) run."""
+        with self._lock:
+            return unit in self._units
+
+    def mark_done(self, unit):
+        """Record a completed work unit."""
+        with self._lock:
+            if unit not in self._units:
+                self._units[unit] = time.time()
+                self._append({"unit": unit, "t": self._units[unit]})
+
+    def clear(self):
+        """Forget all progress once the run has completed."""
+        with self._lock:
+            self._cursors, self._units, self._lines = {}, {}, 0
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+
+    def _append(self, entry):
+        """Append one entry to the journal, compacting it when it grew too long. Must be called with the lock held."""
+        if self._lines >= COMPACT_RATIO * max(len(self._cursors) + len(self._units), 64):
+            self._compact()
+            return
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with open(self.file_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+        self._lines += 1
+
+    def _compact(self):
+        """Atomically rewrite the journal with only its live entries. Must be called with the lock held."""
+        entries = list(self._cursors.values()) + [{"unit": unit, "t": t} for unit, t in self._units.items()]
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(tmp_path, self.file_path)
+        self._lines = len(entries)
+
+    def _load(self):
+        """Replay the journal, skipping expired entries and a line cut off by a crash."""
+        oldest = time.time() - self.max_age_seconds
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    self._lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "clear" in entry:
+                        self._cursors.pop(entry["clear"], None)
+                    elif entry.get("t", 0) < oldest:
+                        continue
+                    elif "cursor" in entry:
+                        self._cursors[entry["cursor"]] = entry
+                    elif "unit" in entry:
+                        self._units[entry["unit"]] = entry["t"]
+        except (FileNotFoundError, UnicodeDecodeError):
+            pass
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+try:
+    import fcntl  # POSIX only; concurrent processes may overwrite each other's updates where it is unavailable
+except ImportError:
+    fcntl = None
+
+from config.config import STATE_DIR, SYNC_REFRESH_DAYS
+
+SYNC_STATE_FILE = STATE_DIR / "sync_state.json"
+
+
+def interval_key(interval):
+    """Return the key an interval is stored under, e.g. "2025-01-31_2025-02-28"."""
+    return f"{interval['since']}_{interval['until']}"
+
+
+class SyncStateStore:
+    """
+    Persists what has already been fetched so reruns only touch open or stale data.
+
+    Two kinds of watermarks are kept, both with the date they were fetched on:
+    - intervals: per endpoint and date interval, plus a completeness flag.
+    - entities: per endpoint and entity id (e.g. one post's insights).
+
+    Data is considered final once it was fetched more than `refresh_days` after the end of
+    its interval (or after the entity was created). Anything younger is refetched, which
+    covers late attribution and still-growing lifetime metrics.
+
+    Several processes (e.g. the workers of a distributed run) may share one state file:
+    `save` merges this process's updates into the file under a file lock.
+    """
+
+    def __init__(self, file_path=SYNC_STATE_FILE, refresh_days=SYNC_REFRESH_DAYS):
+        self.file_path = str(file_path)
+        self.refresh_days = refresh_days
+        self._lock = threading.Lock()
+        self._state = self._load()
+        self._changed = set()  # (kind, endpoint, key) updated since the last save
+
+    def needs_interval(self, endpoint, interval):
+        """
+        Check whether an interval of an endpoint must be (re)fetched.
+
+        Args:
+            endpoint (str): Logical endpoint name, e.g. "page_metrics".
+            interval (dict): Interval with `since` and `until` dates.
+
+        Returns:
+            bool: False only when a complete fetch was made after the interval became final.
+        """
+        with self._lock:
+            entry = self._state["intervals"].get(endpoint, {}).get(interval_key(interval))
+        if not entry or not entry.get("complete"):
+            return True
+        return not self._is_final(interval["until"], entry["fetched_at"])
+
+    def mark_interval(self, endpoint, interval, complete=True):
+        """
+        Record that an interval of an endpoint was fetched today.
+
+        Args:
+            endpoint (str): Logical endpoint name.
+            interval (dict): Interval with `since` and `until` dates.
+            complete (bool): Whether every unit of the interval was fetched successfully.
+        """
+        with self._lock:
+            self._state["intervals"].setdefault(endpoint, {})[interval_key(interval)] = {
+                "complete": complete,
+                "fetched_at": date.today().isoformat()
+            }
+            self._changed.add(("intervals", endpoint, interval_key(interval)))
+
+    def needs_entity(self, endpoint, entity_id, created_time):
+        """
+        Check whether an entity (e.g. a post's insights) must be (re)fetched.
+
+        Args:
+            endpoint (str): Logical endpoint name, e.g. "post_metrics".
+            entity_id (str): Graph API id of the entity.
+            created_time (str): ISO creation timestamp of the entity.
+
+        Returns:
+            bool: False only when it was fetched after its metrics became final.
+        """
+        with self._lock:
+            fetched_at = self._state["entities"].get(endpoint, {}).get(entity_id)
+        if not fetched_at:
+            return True
+        return not self._is_final(created_time[:10], fetched_at)
+
+    def mark_entities(self, endpoint, entity_ids):
+        """
+        Record that entities of an endpoint were fetched today.
+
+        Args:
+            endpoint (str): Logical endpoint name.
+            entity_ids (Iterable[str]): Ids fetched successfully.
+        """
+        today = date.today().isoformat()
+        with self._lock:
+            entities = self._state["entities"].setdefault(endpoint, {})
+            for entity_id in entity_ids:
+                entities[entity_id] = today
+                self._changed.add(("entities", endpoint, entity_id))
+
+    def save(self):
+        """Atomically write the state to disk, merged with updates other processes saved meanwhile."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(f"{self.file_path}.lock", "w") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    state = self._load()
+                    for kind, endpoint, key in self._changed:
+                        state[kind].setdefault(endpoint, {})[key] = self._state[kind][endpoint][key]
+                    tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as file:
+                        json.dump(state, file, indent=4, sort_keys=True)
+                    os.replace(tmp_path, self.file_path)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self._state = state
+            self._changed.clear()
+
+    def _is_final(self, end_date, fetched_at):
+        """Check whether data ending on `end_date` was final by the time it was fetched."""
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        fetched = datetime.strptime(fetched_at, "%Y-%m-%d").date()
+        return fetched > end + timedelta(days=self.refresh_days)
+
+    def _load(self):
+        """Load the state file, starting empty when it does not exist or is unreadable."""
+        state = {"intervals": {}, "entities": {}}
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                state.update(json.load(file))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return state
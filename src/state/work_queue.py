@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from config.config import QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS, WORK_QUEUE_FILE
+
+
+class WorkQueue:
+    """
+    Durable queue of ETL work units shared by the processes of a distributed run.
+
+    Units are scheduler tasks (e.g. "page_metrics:2025-01-31_2025-02-28") with their
+    dependencies. Workers lease a unit whose dependencies are done, renew the lease while
+    they work on it and acknowledge or fail it afterwards. A lease that is not renewed
+    expires, and the unit goes back to the queue, so a crashed worker loses no work.
+    Units whose dependencies failed are skipped, like in `TaskScheduler`.
+
+    The queue is a SQLite file, so processes on one host or containers sharing a volume
+    coordinate through its locks; every state change runs in an IMMEDIATE transaction.
+    """
+
+    def __init__(self, file_path=WORK_QUEUE_FILE, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.file_path = str(file_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with self._transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS units (
+                    name TEXT PRIMARY KEY,
+                    deps TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    error TEXT
+                )""")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def enqueue(self, graph):
+        """
+        Add work units; units already in the queue keep their state.
+
+        Args:
+            graph (dict): Unit name -> names of the units it depends on, in dispatch order.
+        """
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO units (name, deps) VALUES (?, ?)",
+                [(name, json.dumps(list(deps))) for name, deps in graph.items()]
+            )
+
+    def set_meta(self, key, value):
+        """Store a JSON-serializable run parameter (e.g. the intervals) for the workers."""
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_meta(self, key):
+        """Return a run parameter stored with `set_meta`, or None."""
+        with self._transaction() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lease(self, owner):
+        """
+        Lease the next unit that is ready to run.
+
+        Args:
+            owner (str): Worker id.
+
+        Returns:
+            str | None: Unit name, or None when no unit is ready right now.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._expire_leases(db, now)
+            self._skip_blocked(db)
+
+            done = {name for (name,) in db.execute("SELECT name FROM units WHERE status = 'done'")}
+            pending = db.execute("SELECT name, deps FROM units WHERE status = 'pending' ORDER BY rowid").fetchall()
+            for name, deps in pending:
+                if all(dep in done for dep in json.loads(deps)):
+                    db.execute(
+                        "UPDATE units SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                        "WHERE name = ?",
+                        (owner, now + self.lease_seconds, name)
+                    )
+                    return name
+        return None
+
+    def renew(self, name, owner):
+        """
+        Extend the lease of a unit that is still being worked on.
+
+        Returns:
+            bool: False when the lease was lost (it expired and the unit was handed to another worker).
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE units SET lease_expires = ? WHERE name = ? AND owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, name, owner)
+            )
+        return cursor.rowcount == 1
+
+    def ack(self, name, owner, seconds):
+        """
+        Mark a unit leased by `owner` as done.
+
+        Returns:
+            bool: False when the lease was lost meanwhile; the unit is left to the worker that holds it now.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE units SET status = 'done', lease_expires = NULL, seconds = ?, error = NULL "
+                "WHERE name = ? AND owner = ? AND status = 'leased'",
+                (seconds, name, owner)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, name, owner, seconds, error):
+        """
+        Record a failed attempt of a leased unit.
+
+        The unit is queued again until it has been attempted `max_attempts` times, then it is failed.
+
+        Returns:
+            bool: Whether the unit failed for good.
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts FROM units WHERE name = ? AND owner = ?", (name, owner)).fetchone()
+            final = row is None or row[0] >= self.max_attempts
+            db.execute(
+                "UPDATE units SET status = ?, owner = NULL, lease_expires = NULL, seconds = seconds + ?, error = ? "
+                "WHERE name = ? AND owner = ? AND status = 'leased'",
+                ("failed" if final else "pending", seconds, error, name, owner)
+            )
+        return final
+
+    def counts(self):
+        """Return the number of units per status."""
+        with self._transaction() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall())
+
+    def drained(self):
+        """Whether every unit has finished (done, failed or skipped), expiring abandoned leases first."""
+        with self._transaction() as db:
+            self._expire_leases(db, time.time())
+            self._skip_blocked(db)
+            row = db.execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'leased')").fetchone()
+        return row[0] == 0
+
+    def results(self):
+        """
+        Return the outcome of every unit.
+
+        Returns:
+            dict: Per unit, its `status`, `seconds` and `error`, like `TaskScheduler.run`.
+        """
+        with self._transaction() as db:
+            rows = db.execute("SELECT name, status, seconds, error FROM units ORDER BY rowid").fetchall()
+        return {name: {"status": status, "seconds": seconds, "error": error} for name, status, seconds, error in rows}
+
+    def reset(self):
+        """Remove every unit and run parameter, once a run has been fully processed."""
+        with self._transaction() as db:
+            db.execute("DELETE FROM units")
+            db.execute("DELETE FROM meta")
+
+    def _expire_leases(self, db, now):
+        """Return units of workers that stopped renewing their lease to the queue (or fail them)."""
+        db.execute(
+            "UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, lease_expires = NULL, error = 'lease expired' "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now)
+        )
+
+    def _skip_blocked(self, db):
+        """Skip pending units with a failed or skipped dependency, until no more can be skipped."""
+        while True:
+            finished = {name for (name,) in db.execute("SELECT name FROM units WHERE status IN ('failed', 'skipped')")}
+            blocked = [
+                name for name, deps in db.execute("SELECT name, deps FROM units WHERE status = 'pending'")
+                if any(dep in finished for dep in json.loads(deps))
+            ]
+            if not blocked:
+                return
+            db.executemany(
+                "UPDATE units SET status = 'skipped', error = 'dependency failed' WHERE name = ?",
+                [(name,) for name in blocked]
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """Open a connection and hold the database write lock until the block ends."""
+        db = sqlite3.connect(self.file_path, timeout=60, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
@@ -0,0 +1,411 @@
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from config.config import NORMALIZE_BATCH_ROWS, NORMALIZE_FORMAT, TENANT_MANIFEST
+from config.tenants import Tenant, load_tenants
+from extract.segment_store import SegmentStore, segment_key
+from extract.stream_writer import NDJSONWriter, read_ndjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only the "parquet" and "arrow" formats need it
+    pa = pc = pq = None
+
+# Normalized table -> raw directory of Graph API insights entries (`name`, `period`, `values`), and
+# whether the object id is the file name (one file per post) rather than the prefix of the entry id
+INSIGHTS_SOURCES = {"page_metrics": ("facebook_page_metrics", False), "post_metrics": ("facebook_post_metrics", True)}
+
+# Raw ads insights directory prefix -> insights level
+ADS_INSIGHTS_SOURCES = {"campaigns": "campaign", "adsets": "adset", "ads": "ad"}
+
+# Fields of ads insights rows that describe the row rather than measure something
+ADS_DIMENSIONS = {
+    "date_start", "date_stop", "account_id", "account_name", "account_currency", "objective",
+    "campaign_id", "campaign_name", "adset_id", "adset_name", "ad_id", "ad_name"
+}
+
+INSIGHTS_COLUMNS = ("object_id", "metric", "period", "end_time", "breakdown", "value", "month")
+ADS_COLUMNS = ("level", "object_id", "date_start", "date_stop", "metric", "breakdown", "value", "month")
+
+# Partition of rows without a date (e.g. lifetime metrics without an `end_time`)
+UNDATED_PARTITION = "undated"
+
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "ndjson": "ndjson"}
+
+
+def require_format(fmt=NORMALIZE_FORMAT):
+    """
+    Fail fast on a normalization format that is unknown or needs pyarrow when it is not installed.
+
+    Raises:
+        ValueError: If the format is unknown.
+        RuntimeError: If the format needs pyarrow and it is not installed.
+    """
+    if fmt not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown NORMALIZE_FORMAT '{fmt}', expected one of: {', '.join(FILE_EXTENSIONS)}")
+    if fmt != "ndjson" and pa is None:
+        raise RuntimeError(f"NORMALIZE_FORMAT={fmt} requires pyarrow (pip install pyarrow); use ndjson without it")
+
+
+def explode_value(value):
+    """
+    Turn a metric value into `(breakdown, number)` pairs.
+
+    Scalars give one pair without breakdown; dict values (e.g. `post_clicks_by_type`) give
+    one pair per key; lists of `{"action_type": ..., "value": ...}` (ads actions) give one
+    pair per action type. Values that are not numbers are dropped.
+
+    Args:
+        value: Raw metric value.
+
+    Returns:
+        list[tuple[str | None, float]]: The pairs.
+    """
+    if isinstance(value, dict):
+        return [(str(key), number) for key, item in value.items() if (number := _number(item)) is not None]
+    if isinstance(value, list):
+        return [
+            (str(item.get("action_type", index)), number)
+            for index, item in enumerate(value)
+            if isinstance(item, dict) and (number := _number(item.get("value"))) is not None
+        ]
+    number = _number(value)
+    return [] if number is None else [(None, number)]
+
+
+def _number(value):
+    """Return a value as float, or None when it is not numeric (ads insights send numbers as strings)."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColumnBuffer:
+    """
+    Collects rows column by column (one list per column, no per-row dicts) and hands
+    them out in batches of about `batch_rows` rows.
+    """
+
+    def __init__(self, columns, batch_rows=NORMALIZE_BATCH_ROWS):
+        self.names = columns
+        self.batch_rows = batch_rows
+        self.columns = {name: [] for name in columns}
+        self.rows = 0
+
+    def extend(self, count, **values):
+        """
+        Append `count` rows. Each value is a list of `count` items or a scalar shared by all rows.
+
+        Args:
+            count (int): Number of rows.
+            **values: One entry per column.
+        """
+        if not count:
+            return
+        for name, column in self.columns.items():
+            value = values[name]
+            column.extend(value if isinstance(value, list) else [value] * count)
+        self.rows += count
+
+    @property
+    def full(self):
+        return self.rows >= self.batch_rows
+
+    def take(self):
+        """Return the buffered columns and start a new batch."""
+        columns = self.columns
+        self.columns = {name: [] for name in self.names}
+        self.rows = 0
+        return columns
+
+
+class PartitionedTableWriter:
+    """
+    Writes column batches into one file per month partition, Hive style:
+    `{directory}/month=YYYY-MM/part-0.{parquet|arrow|ndjson}`.
+
+    In the Arrow formats every batch is converted to typed columns at once and appended
+    to the partition's file as a row group (Parquet) or record batch (Arrow IPC).
+    """
+
+    def __init__(self, directory, columns, fmt=NORMALIZE_FORMAT):
+        require_format(fmt)
+        self.directory = Path(directory)
+        self.columns = [name for name in columns if name != "month"]
+        self.fmt = fmt
+        self.schema = self._schema() if fmt != "ndjson" else None
+        self.rows = 0
+        self._writers = {}
+
+    def write(self, columns):
+        """
+        Write one batch.
+
+        Args:
+            columns (dict): Column name -> list of values, including the `month` partition column.
+        """
+        months = columns["month"]
+        self.rows += len(months)
+
+        if self.fmt == "ndjson":
+            rows_by_month = {}
+            for row in zip(months, *(columns[name] for name in self.columns)):
+                rows_by_month.setdefault(row[0], []).append(dict(zip(self.columns, row[1:])))
+            for month, rows in rows_by_month.items():
+                self._writer(month).write_records(rows)
+            return
+
+        table = pa.table({name: self._array(name, columns[name]) for name in self.columns}, schema=self.schema)
+        month_array = pa.array(months, pa.string())
+        for month in pc.unique(month_array).to_pylist():
+            self._writer(month).write_table(table.filter(pc.equal(month_array, month)))
+
+    def close(self):
+        """Close every partition file."""
+        for writer in self._writers.values():
+            if self.fmt == "ndjson":
+                writer.__exit__(None, None, None)
+            else:
+                writer.close()
+        self._writers = {}
+
+    def _writer(self, month):
+        """Open the file of a partition on first use."""
+        if month not in self._writers:
+            path = self.directory / f"month={month}" / f"part-0.{FILE_EXTENSIONS[self.fmt]}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if self.fmt == "parquet":
+                self._writers[month] = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+            elif self.fmt == "arrow":
+                self._writers[month] = pa.ipc.new_file(str(path), self.schema)
+            else:
+                self._writers[month] = NDJSONWriter(path).__enter__()
+        return self._writers[month]
+
+    def _schema(self):
+        types = {
+            "level": pa.string(), "object_id": pa.string(), "metric": pa.string(), "period": pa.string(),
+            "end_time": pa.timestamp("s", tz="UTC"), "date_start": pa.date32(), "date_stop": pa.date32(),
+            "breakdown": pa.string(), "value": pa.float64()
+        }
+        return pa.schema([(name, types[name]) for name in self.columns])
+
+    def _array(self, name, values):
+        """Convert one column of a batch to its Arrow type in a single vectorized call."""
+        if name == "end_time":
+            return pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%dT%H:%M:%S%z", unit="s")
+        if name in ("date_start", "date_stop"):
+            return pa.array(values, pa.string()).cast(pa.date32())
+        return pa.array(values, self.schema.field(name).type)
+
+
+def raw_files(directory):
+    """
+    List the raw output files of a directory, whichever OUTPUT_FORMAT wrote them.
+
+    When a file exists both as JSON and NDJSON, only the most recently written one is kept.
+
+    Args:
+        directory (Path): Raw output directory.
+
+    Returns:
+        list[str]: File paths, sorted by name.
+    """
+    if not os.path.isdir(directory):
+        return []
+    latest = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            for extension in (".json", ".ndjson", ".ndjson.gz"):
+                if entry.is_file() and entry.name.endswith(extension):
+                    base = entry.name[:-len(extension)]
+                    if base not in latest or entry.stat().st_mtime > latest[base].stat().st_mtime:
+                        latest[base] = entry
+                    break
+    return sorted(entry.path for entry in latest.values())
+
+
+def load_records(file_path):
+    """Return the `data` records of a raw JSON or NDJSON file."""
+    if file_path.endswith(".json"):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file).get("data", [])
+    return read_ndjson(file_path)
+
+
+def raw_records(directory):
+    """
+    Yield the records of every raw file of a directory and of every entity in its segments.
+
+    An entity stored both as a file and in segments is read from whichever was written last.
+
+    Args:
+        directory (Path): Raw output directory.
+
+    Yields:
+        tuple: `(file_path, records)`, where segment records get the path their file would have had.
+    """
+    files = {segment_key(os.path.basename(path)): path for path in raw_files(directory)}
+    for key, written_at, document in SegmentStore().records(directory):
+        if key in files and os.path.getmtime(files[key]) > written_at:
+            continue
+        files.pop(key, None)
+        yield os.path.join(str(directory), f"{key}.json"), document.get("data", [])
+
+    for file_path in sorted(files.values()):
+        try:
+            records = load_records(file_path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Skipping unreadable raw file {file_path}: {e}")
+            continue
+        yield file_path, records
+
+
+def add_insights_entries(buffer, file_path, entries, id_from_file=False):
+    """Append the values of Graph API insights entries (page or post metrics) as long-format rows."""
+    file_id = os.path.basename(file_path).split(".")[0]
+    for entry in entries:
+        object_id = file_id if id_from_file or not entry.get("id") else entry["id"].split("/")[0]
+        end_times, breakdowns, numbers = [], [], []
+        for item in entry.get("values", []):
+            for breakdown, number in explode_value(item.get("value")):
+                end_times.append(item.get("end_time") or None)
+                breakdowns.append(breakdown)
+                numbers.append(number)
+        buffer.extend(
+            len(numbers),
+            object_id=object_id,
+            metric=entry.get("name"),
+            period=entry.get("period"),
+            end_time=end_times,
+            breakdown=breakdowns,
+            value=numbers,
+            month=[end_time[:7] if end_time else UNDATED_PARTITION for end_time in end_times]
+        )
+
+
+def add_ads_rows(buffer, file_path, rows, level):
+    """Append every metric of ads insights rows as long-format rows."""
+    default_id = os.path.basename(file_path).split("_")[0]
+    for row in rows:
+        metrics, breakdowns, numbers = [], [], []
+        for key, value in row.items():
+            if key in ADS_DIMENSIONS:
+                continue
+            for breakdown, number in explode_value(value):
+                metrics.append(key)
+                breakdowns.append(breakdown)
+                numbers.append(number)
+        date_start = row.get("date_start")
+        buffer.extend(
+            len(numbers),
+            level=level,
+            object_id=str(row.get(f"{level}_id") or default_id),
+            date_start=date_start,
+            date_stop=row.get("date_stop"),
+            metric=metrics,
+            breakdown=breakdowns,
+            value=numbers,
+            month=date_start[:7] if date_start else UNDATED_PARTITION
+        )
+
+
+def build_table(directory, columns, sources, fmt=NORMALIZE_FORMAT, batch_rows=NORMALIZE_BATCH_ROWS):
+    """
+    Rebuild one normalized table from raw files and segments.
+
+    The table is written next to the old one and swapped in at the end, so readers never
+    see a half-built table.
+
+    Args:
+        directory (Path): Directory of the table.
+        columns (tuple): Columns of the table, including `month`.
+        sources (list): `(raw_directory, add_rows)` pairs, where `add_rows(buffer, file_path, records)`
+            appends the rows of one file.
+        fmt (str): "parquet", "arrow" or "ndjson".
+        batch_rows (int): Rows per written batch.
+
+    Returns:
+        int: Rows written.
+    """
+    directory = Path(directory)
+    tmp_directory = directory.parent / f".{directory.name}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+
+    writer = PartitionedTableWriter(tmp_directory, columns, fmt)
+    buffer = ColumnBuffer(columns, batch_rows)
+    try:
+        for raw_directory, add_rows in sources:
+            for file_path, records in raw_records(raw_directory):
+                add_rows(buffer, file_path, records)
+                if buffer.full:
+                    writer.write(buffer.take())
+        if buffer.rows:
+            writer.write(buffer.take())
+    finally:
+        writer.close()
+
+    shutil.rmtree(directory, ignore_errors=True)
+    if os.path.isdir(tmp_directory):
+        os.replace(tmp_directory, directory)
+    return writer.rows
+
+
+def normalize_tenant(tenant, fmt=NORMALIZE_FORMAT, batch_rows=NORMALIZE_BATCH_ROWS):
+    """
+    Rebuild every normalized table of a tenant from its raw outputs.
+
+    Tables (under `{output_path}/normalized/`):
+    - page_metrics, post_metrics: object_id, metric, period, end_time, breakdown, value
+    - ads_insights: level, object_id, date_start, date_stop, metric, breakdown, value
+
+    Args:
+        tenant (Tenant): The tenant.
+        fmt (str): "parquet", "arrow" or "ndjson".
+        batch_rows (int): Rows per written batch.
+
+    Returns:
+        dict: Rows written per table.
+    """
+    root = tenant.output_path / "normalized"
+    rows = {}
+
+    for table, (raw_directory, id_from_file) in INSIGHTS_SOURCES.items():
+        rows[table] = build_table(
+            root / table,
+            INSIGHTS_COLUMNS,
+            [(tenant.output_path / raw_directory,
+              lambda buffer, file_path, records, id_from_file=id_from_file: add_insights_entries(
+                  buffer, file_path, records, id_from_file))],
+            fmt,
+            batch_rows
+        )
+
+    rows["ads_insights"] = build_table(
+        root / "ads_insights",
+        ADS_COLUMNS,
+        [
+            (tenant.output_path / f"{category}_insights",
+             lambda buffer, file_path, records, level=level: add_ads_rows(buffer, file_path, records, level))
+            for category, level in ADS_INSIGHTS_SOURCES.items()
+        ],
+        fmt,
+        batch_rows
+    )
+
+    logging.info(f"Normalized tables of {tenant.name}: {rows}")
+    return rows
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    for tenant in load_tenants(TENANT_MANIFEST) if TENANT_MANIFEST else [Tenant.from_env()]:
+        normalize_tenant(tenant)
@@ -0,0 +1,398 @@
+import cProfile
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from config.config import HTTP_POOL_SIZE, METRICS_DIR, RUN_PROFILE, RUN_PROFILE_SECTIONS
+
+# Upper bounds (seconds) of the latency histogram buckets, as in a Prometheus histogram
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Path segments that are object ids: page/post/media ids ("123", "123_456") and ad accounts ("act_123")
+ID_SEGMENT = re.compile(r"^\d+(_\d+)?$")
+ACCOUNT_SEGMENT = re.compile(r"^act_\d+$")
+VERSION_SEGMENT = re.compile(r"^v\d+\.\d+$")
+
+
+def endpoint_label(url_or_endpoint):
+    """
+    Turn a request URL or endpoint into a low-cardinality label, e.g.
+    "https://graph.facebook.com/v22.0/act_123/insights?level=ad" -> "act_{id}/insights".
+
+    Args:
+        url_or_endpoint (str): Absolute URL or endpoint relative to the API base.
+
+    Returns:
+        str: The label; batch POSTs to the API root are labelled "batch".
+    """
+    segments = [segment for segment in urlsplit(url_or_endpoint).path.split("/") if segment]
+    if segments and VERSION_SEGMENT.match(segments[0]):
+        segments = segments[1:]
+    if not segments:
+        return "batch"
+    return "/".join(
+        "act_{id}" if ACCOUNT_SEGMENT.match(segment) else "{id}" if ID_SEGMENT.match(segment) else segment
+        for segment in segments
+    )
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds plus count, sum and max."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Record one observation."""
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def as_dict(self):
+        """Return the histogram as plain data for the JSON report."""
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 4),
+            "max_seconds": round(self.max, 4),
+            "mean_seconds": round(self.sum / self.count, 4) if self.count else 0.0,
+            "buckets": {str(bound): count for bound, count in zip(self.bounds, self.counts)}
+        }
+
+
+class RunMetrics:
+    """
+    Process-wide counters and timings of one ETL run, shared by every client and thread.
+
+    - requests: per endpoint label and method, the count by status, a latency histogram,
+      bytes received/sent, pages, retries and hedged duplicates.
+    - throttle waits: seconds spent blocked by the rate governor, per business use case.
+    - sections: wall time of ETL stages and hot paths (`fetch_data`, JSON parsing, disk
+      writes), recorded with `timer`.
+    - pool: HTTP requests in flight, as peak and time-weighted average against the pool size.
+
+    `timer` sections are also the profiling hook points: hooks registered with `add_hook`
+    wrap every section, and RUN_PROFILE=cprofile registers one that dumps a cProfile file
+    per section of the categories in RUN_PROFILE_SECTIONS.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self.pool_size = pool_size
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._requests = {}
+        self._throttle_wait = {}
+        self._sections = {}
+        self._hooks = []
+        self._in_flight = 0
+        self._in_flight_peak = 0
+        self._in_flight_area = 0.0  # Integral of requests in flight over time
+        self._in_flight_changed = self._started
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self, url, method):
+        """
+        Measure one HTTP request.
+
+        Usage:
+            with metrics.request(url, "GET") as sample:
+                response = session.get(url)
+                sample.update(status=response.status_code, bytes_in=len(response.content))
+
+        Args:
+            url (str): Request URL.
+            method (str): HTTP method.
+
+        Yields:
+            dict: Sample to fill with `status`, `bytes_in` and `bytes_out`.
+        """
+        sample = {"status": "error", "bytes_in": 0, "bytes_out": 0}
+        self._change_in_flight(1)
+        start = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            seconds = time.perf_counter() - start
+            self._change_in_flight(-1)
+            with self._lock:
+                stats = self._request_stats(endpoint_label(url), method)
+                stats["status"][str(sample["status"])] = stats["status"].get(str(sample["status"]), 0) + 1
+                stats["latency"].observe(seconds)
+                stats["bytes_in"] += sample["bytes_in"]
+                stats["bytes_out"] += sample["bytes_out"]
+
+    def record_page(self, url, method="GET"):
+        """Count one page read from a paginated endpoint."""
+        with self._lock:
+            self._request_stats(endpoint_label(url), method)["pages"] += 1
+
+    def record_retry(self, url, method="GET", count=1):
+        """Count requests sent again after a rate limit or transient error."""
+        with self._lock:
+            self._request_stats(endpoint_label(url), method)["retries"] += count
+
+    def record_hedge(self, url, method="GET"):
+        """Count a hedged duplicate of a slow request."""
+        with self._lock:
+            self._request_stats(endpoint_label(url), method)["hedges"] += 1
+
+    def record_throttle_wait(self, use_case, seconds):
+        """Add time spent waiting for the rate governor."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._throttle_wait[use_case] = self._throttle_wait.get(use_case, 0.0) + seconds
+
+    def add_hook(self, hook):
+        """
+        Register a profiling hook.
+
+        Args:
+            hook (Callable[[str, str], ContextManager | None]): Called with the category and
+                name of every timed section; the returned context manager wraps the section.
+        """
+        self._hooks.append(hook)
+
+    @contextmanager
+    def timer(self, category, name):
+        """
+        Time a section of work and run the profiling hooks around it.
+
+        Args:
+            category (str): Kind of section, e.g. "stage", "fetch_data", "parse" or "write".
+            name (str): Section name, e.g. a task or endpoint label.
+        """
+        hooks = [manager for manager in (hook(category, name) for hook in self._hooks) if manager is not None]
+        for manager in hooks:
+            manager.__enter__()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            for manager in reversed(hooks):
+                manager.__exit__(None, None, None)
+            with self._lock:
+                self._sections.setdefault((category, name), Histogram()).observe(seconds)
+
+    def report(self, **extra):
+        """
+        Return everything recorded so far.
+
+        Args:
+            **extra: Additional top-level entries (e.g. task results, rate budget).
+
+        Returns:
+            dict: The run report.
+        """
+        with self._lock:
+            self._change_in_flight(0, locked=True)
+            elapsed = time.perf_counter() - self._started
+            average_in_flight = self._in_flight_area / elapsed if elapsed else 0.0
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": round(elapsed, 3),
+                "requests": {
+                    f"{method} {label}": {
+                        "status": dict(stats["status"]),
+                        "latency": stats["latency"].as_dict(),
+                        "bytes_in": stats["bytes_in"],
+                        "bytes_out": stats["bytes_out"],
+                        "pages": stats["pages"],
+                        "retries": stats["retries"],
+                        "hedges": stats["hedges"]
+                    }
+                    for (label, method), stats in sorted(self._requests.items())
+                },
+                "throttle_wait_seconds": {key: round(value, 3) for key, value in self._throttle_wait.items()},
+                "sections": {
+                    category: {
+                        name: histogram.as_dict()
+                        for (section_category, name), histogram in sorted(self._sections.items())
+                        if section_category == category
+                    }
+                    for category in sorted({category for category, _ in self._sections})
+                },
+                "pool": {
+                    "size": self.pool_size,
+                    "peak_in_flight": self._in_flight_peak,
+                    "average_in_flight": round(average_in_flight, 3),
+                    "utilization": round(average_in_flight / self.pool_size, 3) if self.pool_size else 0.0
+                },
+                **extra
+            }
+
+    def write_json(self, file_path, **extra):
+        """Atomically write the run report as JSON."""
+        _atomic_write(file_path, json.dumps(self.report(**extra), indent=4, default=str))
+
+    def write_prometheus(self, file_path):
+        """Atomically write the metrics in the Prometheus text format, for node_exporter's textfile collector."""
+        report = self.report()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP graph_etl_{name} {help_text}")
+            lines.append(f"# TYPE graph_etl_{name} {kind}")
+            for labels, value in samples:
+                label_text = _labels(labels)
+                lines.append(f"graph_etl_{name}{{{label_text}}} {value}" if label_text else f"graph_etl_{name} {value}")
+
+        requests = [(key.split(" ", 1), stats) for key, stats in report["requests"].items()]
+        metric("requests_total", "counter", "Graph API requests by endpoint, method and status.", [
+            ({"endpoint": label, "method": method, "status": status}, count)
+            for (method, label), stats in requests for status, count in stats["status"].items()
+        ])
+
+        metric("request_duration_seconds", "histogram", "Graph API request latency.", [])
+        for (method, label), stats in requests:
+            labels = {"endpoint": label, "method": method}
+            buckets = list(stats["latency"]["buckets"].items()) + [("+Inf", stats["latency"]["count"])]
+            lines.extend(
+                f'graph_etl_request_duration_seconds_bucket{{{_labels({**labels, "le": bound})}}} {count}'
+                for bound, count in buckets
+            )
+            lines.append(f"graph_etl_request_duration_seconds_sum{{{_labels(labels)}}} {stats['latency']['sum_seconds']}")
+            lines.append(f"graph_etl_request_duration_seconds_count{{{_labels(labels)}}} {stats['latency']['count']}")
+
+        for name, key, help_text in (
+            ("bytes_received_total", "bytes_in", "Response bytes received."),
+            ("bytes_sent_total", "bytes_out", "Request bytes sent (URL and body)."),
+            ("pages_total", "pages", "Pages read from paginated endpoints."),
+            ("retries_total", "retries", "Requests retried after rate limits or transient errors."),
+            ("hedges_total", "hedges", "Duplicate requests sent because the first one was slow.")
+        ):
+            metric(name, "counter", help_text, [
+                ({"endpoint": label, "method": method}, stats[key]) for (method, label), stats in requests
+            ])
+
+        metric("throttle_wait_seconds_total", "counter", "Seconds spent waiting for the rate governor.", [
+            ({"use_case": use_case}, seconds) for use_case, seconds in report["throttle_wait_seconds"].items()
+        ])
+
+        sections = [
+            ({"category": category, "name": name}, histogram)
+            for category, names in report["sections"].items() for name, histogram in names.items()
+        ]
+        metric("section_duration_seconds_sum", "counter", "Wall time of ETL stages and hot paths.", [
+            (labels, histogram["sum_seconds"]) for labels, histogram in sections
+        ])
+        metric("section_duration_seconds_count", "counter", "Executions of ETL stages and hot paths.", [
+            (labels, histogram["count"]) for labels, histogram in sections
+        ])
+
+        metric("http_pool_size", "gauge", "Connections in the HTTP pool.", [({}, report["pool"]["size"])])
+        metric("http_pool_peak_in_flight", "gauge", "Most requests in flight at once.",
+               [({}, report["pool"]["peak_in_flight"])])
+        metric("http_pool_utilization_ratio", "gauge", "Average requests in flight divided by the pool size.",
+               [({}, report["pool"]["utilization"])])
+        metric("run_duration_seconds", "gauge", "Wall time of the run.", [({}, report["wall_seconds"])])
+        metric("run_start_timestamp_seconds", "gauge", "Start of the run.", [({}, report["started_at"])])
+
+        _atomic_write(file_path, "\n".join(lines) + "\n")
+
+    def _request_stats(self, label, method):
+        """Return the counters of an endpoint, creating them. Must be called with the lock held."""
+        key = (label, method)
+        if key not in self._requests:
+            self._requests[key] = {
+                "status": {}, "latency": Histogram(), "bytes_in": 0, "bytes_out": 0, "pages": 0, "retries": 0,
+                "hedges": 0
+            }
+        return self._requests[key]
+
+    def _change_in_flight(self, delta, locked=False):
+        """Update the number of requests in flight and its time integral."""
+        if not locked:
+            with self._lock:
+                self._change_in_flight(delta, locked=True)
+            return
+        now = time.perf_counter()
+        self._in_flight_area += self._in_flight * (now - self._in_flight_changed)
+        self._in_flight_changed = now
+        self._in_flight += delta
+        self._in_flight_peak = max(self._in_flight_peak, self._in_flight)
+
+
+def cprofile_hook(directory, categories):
+    """
+    Build a hook that profiles sections of the given categories with cProfile.
+
+    Each section is dumped to `{directory}/{category}_{name}.pstats` (later runs of the same
+    section overwrite it); open it with `python -m pstats` or snakeviz.
+
+    Args:
+        directory (str): Directory for the profile files.
+        categories (Iterable[str]): Section categories to profile, e.g. {"stage"}.
+
+    Returns:
+        Callable[[str, str], ContextManager | None]: The hook.
+    """
+    categories = set(categories)
+
+    @contextmanager
+    def profile(category, name):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. a nested section)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(directory, exist_ok=True)
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{category}_{name}")
+            profiler.dump_stats(os.path.join(directory, f"{safe_name}.pstats"))
+
+    return lambda category, name: profile(category, name) if category in categories else None
+
+
+def _labels(labels):
+    """Format Prometheus labels, escaping their values."""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _atomic_write(file_path, text):
+    """Write a file under a temporary name and rename it into place."""
+    file_path = str(file_path)
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, file_path)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_run_metrics():
+    """Return the process-wide run metrics shared by every GraphAPIClient and the scheduler."""
+    global _metrics
+
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RunMetrics()
+            if RUN_PROFILE == "cprofile":
+                _metrics.add_hook(cprofile_hook(os.path.join(METRICS_DIR, "profiles"), RUN_PROFILE_SECTIONS))
+            elif RUN_PROFILE:
+                logging.warning(f"Unknown RUN_PROFILE '{RUN_PROFILE}', profiling disabled")
+        return _metrics
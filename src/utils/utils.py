@@ -27,3 +27,27 @@ def get_last_months_intervals(num_months: int):
         })
 
     return intervals
+
+
+def split_date_range(since: str, until: str, max_days: int):
+    """
+    Split a date range into consecutive windows of at most `max_days` days.
+
+    Args:
+        since (str): First day, "YYYY-MM-DD".
+        until (str): Last day, "YYYY-MM-DD".
+        max_days (int): Longest window allowed.
+
+    Returns:
+        list: Windows as `{"since": ..., "until": ...}` dictionaries, in order.
+    """
+    start = datetime.strptime(since, "%Y-%m-%d")
+    end = datetime.strptime(until, "%Y-%m-%d")
+    windows = []
+
+    while start <= end:
+        window_end = min(start + timedelta(days=max_days - 1), end)
+        windows.append({"since": start.strftime("%Y-%m-%d"), "until": window_end.strftime("%Y-%m-%d")})
+        start = window_end + timedelta(days=1)
+
+    return windows
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from config.config import WINDOW_MIN_DAYS
+from extract.api_client import GraphAPIError
+
+
+def _parse(day):
+    return datetime.strptime(day, "%Y-%m-%d")
+
+
+def _format(day):
+    return day.strftime("%Y-%m-%d")
+
+
+def window_days(window):
+    """
+    Return the number of days between a window's `since` and `until`, the span the API limits.
+
+    Args:
+        window (dict): Window or interval with "since" and "until".
+
+    Returns:
+        int: Days between since and until.
+    """
+    return (_parse(window["until"]) - _parse(window["since"])).days
+
+
+def plan_windows(intervals, max_days):
+    """
+    Merge consecutive intervals into the fewest request windows of at most `max_days` days.
+
+    Intervals that touch or overlap are merged while the merged span stays within `max_days`.
+    An interval longer than `max_days` stays a window of its own; `fetch_window` bisects it
+    when the API rejects it.
+
+    Args:
+        intervals (list): Date intervals as built by `get_last_months_intervals`.
+        max_days (int): Longest since/until span one request may cover.
+
+    Returns:
+        list: Windows as `{"since", "until", "intervals"}` dictionaries, oldest first, where
+        `intervals` lists the intervals whose data the window returns.
+    """
+    windows = []
+    for interval in sorted(intervals, key=lambda item: item["since"]):
+        current = windows[-1] if windows else None
+        if (current and _parse(interval["since"]) <= _parse(current["until"]) + timedelta(days=1)
+                and (_parse(interval["until"]) - _parse(current["since"])).days <= max_days):
+            current["until"] = max(current["until"], interval["until"])
+            current["intervals"].append(interval)
+            continue
+
+        windows.append({"since": interval["since"], "until": interval["until"], "intervals": [interval]})
+
+    return windows
+
+
+def bisect_window(window, min_days=WINDOW_MIN_DAYS, exclusive_since=False):
+    """
+    Split a window into two halves.
+
+    Args:
+        window (dict): Window to split.
+        min_days (int): Smallest number of days a half may cover.
+        exclusive_since (bool): Whether the endpoint returns data after `since` only (page
+            insights), so the later half must start on the day the earlier half ends.
+
+    Returns:
+        tuple: The earlier and the later half, or None when the window is too small to split.
+    """
+    days = window_days(window) + (0 if exclusive_since else 1)
+    if days < 2 * max(min_days, 1):
+        return None
+
+    middle = _parse(window["since"]) + timedelta(days=days // 2 - (0 if exclusive_since else 1))
+    return (
+        {**window, "until": _format(middle)},
+        {**window, "since": _format(middle if exclusive_since else middle + timedelta(days=1))}
+    )
+
+
+def fetch_window(fetch, window, min_days=WINDOW_MIN_DAYS, exclusive_since=False):
+    """
+    Fetch the rows of a window, bisecting it while the API rejects it as too large.
+
+    Args:
+        fetch (Callable[[dict], list]): Fetches every row of one window.
+        window (dict): Window to fetch.
+        min_days (int): Smallest window bisection goes down to.
+        exclusive_since (bool): See `bisect_window`.
+
+    Returns:
+        list: Rows of the whole window, from all of its parts.
+
+    Raises:
+        GraphAPIError: If the window is rejected and cannot be split further, or fails otherwise.
+    """
+    try:
+        return fetch(window)
+    except GraphAPIError as e:
+        halves = bisect_window(window, min_days, exclusive_since) if e.window_too_large else None
+        if not halves:
+            raise
+        logging.warning(
+            f"Window {window['since']} to {window['until']} too large, retrying as "
+            f"{halves[0]['since']} to {halves[0]['until']} and {halves[1]['since']} to {halves[1]['until']}")
+        return (fetch_window(fetch, halves[0], min_days, exclusive_since)
+                + fetch_window(fetch, halves[1], min_days, exclusive_since))
+
+
+async def fetch_window_async(fetch, window, min_days=WINDOW_MIN_DAYS, exclusive_since=False):
+    """
+    asyncio counterpart of `fetch_window`; `fetch` is a coroutine function. The two halves
+    of a rejected window are fetched concurrently.
+    """
+    try:
+        return await fetch(window)
+    except GraphAPIError as e:
+        halves = bisect_window(window, min_days, exclusive_since) if e.window_too_large else None
+        if not halves:
+            raise
+        logging.warning(
+            f"Window {window['since']} to {window['until']} too large, retrying as "
+            f"{halves[0]['since']} to {halves[0]['until']} and {halves[1]['since']} to {halves[1]['until']}")
+        earlier, later = await asyncio.gather(
+            fetch_window_async(fetch, halves[0], min_days, exclusive_since),
+            fetch_window_async(fetch, halves[1], min_days, exclusive_since))
+        return earlier + later
+
+
+def slice_insights_values(entries, interval):
+    """
+    Keep the daily values of insights entries that belong to one interval.
+
+    A value belongs to the interval when its `end_time` falls after the interval's `since`
+    and on or before its `until`, which is the range a request for the interval returns.
+    Entries of the same metric and period (e.g. from several pages or window halves) are joined,
+    keeping one value per `end_time`.
+
+    Args:
+        entries (list): Insights entries with `name`, `period` and `values`.
+        interval (dict): Target interval.
+
+    Returns:
+        list: One entry per metric and period with the interval's values, in first-seen order.
+    """
+    sliced, seen = {}, set()
+    for entry in entries:
+        key = (entry.get("name"), entry.get("period"))
+        values = []
+        for value in entry.get("values", []):
+            end_time = value.get("end_time", "")
+            if interval["since"] < end_time[:10] <= interval["until"] and (key, end_time) not in seen:
+                seen.add((key, end_time))
+                values.append(value)
+        if key in sliced:
+            sliced[key]["values"].extend(values)
+        else:
+            sliced[key] = {**entry, "values": values}
+    return list(sliced.values())
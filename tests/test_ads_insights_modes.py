@@ -0,0 +1,64 @@
+import json
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from config.tenants import Tenant
+from extract.api_client import GraphAPIClient
+from extract.http_session import RequestSlots
+from extract.rate_limiter import RateGovernor
+from extract.retry_policy import RetryPolicy
+from graph_etl.graph_etl import ADS_INSIGHTS_LEVELS, ads_insights_units, fetch_account_insights_for_interval
+
+INTERVAL = {"since": "2025-01-01", "until": "2025-01-31", "start_date": "2025-01-01"}
+ENTITIES = {"campaigns": [{"id": "11"}, {"id": "12"}], "adsets": [{"id": "21"}, {"id": "22"}, {"id": "23"}],
+            "ads": [{"id": "31"}]}
+SPEND = {"11": ["10.00"], "12": ["4.50"], "21": ["3.00", "1.00"], "22": ["2.25"], "31": ["0.75"]}  # 23 has no rows
+
+
+def rows(entity_id):
+    return [{"spend": spend, "impressions": str(index), "date_start": INTERVAL["since"], "date_stop": INTERVAL["until"]}
+            for index, spend in enumerate(SPEND.get(entity_id, []))]
+
+
+class InsightsSession:
+    """Answers account-level insights queries and batched per-entity insights requests from the same rows."""
+
+    def request(self, method, url, timeout=None, params=None, data=None, **kwargs):
+        if method == "POST":
+            batch = json.loads(data["batch"])
+            body = [{"code": 200, "body": json.dumps({"data": rows(urlparse(sub["relative_url"]).path.split("/")[0])})}
+                    for sub in batch]
+        else:
+            level = params["level"]
+            category = next(category for category, name in ADS_INSIGHTS_LEVELS.items() if name == level)
+            body = {"data": [{f"{level}_id": entity["id"], **row}
+                             for entity in ENTITIES[category] for row in rows(entity["id"])]}
+        content = json.dumps(body).encode()
+        return SimpleNamespace(status_code=200, content=content, text=content.decode(), headers={},
+                               json=lambda: json.loads(content), request=SimpleNamespace(url=url, body=None))
+
+
+def make_client(output_path):
+    return GraphAPIClient(session=InsightsSession(), rate_governor=RateGovernor(max_rps=10000),
+                          retry_policy=RetryPolicy(), request_slots=RequestSlots(10), access_token="token",
+                          tenant=Tenant(name="test", ads_account="9", output_path=output_path, state_dir=output_path))
+
+
+def saved_rows(output_path, category):
+    insights_dir = output_path / f"{category}_insights"
+    return {path.name.split("_")[0]: json.loads(path.read_text())["data"] for path in insights_dir.glob("*.json")}
+
+
+def test_account_mode_saves_each_entitys_rows_like_entity_mode(tmp_path):
+    entity_client, account_client = make_client(tmp_path / "entity"), make_client(tmp_path / "account")
+
+    assert entity_client.fetch_batch(ads_insights_units(ENTITIES, [INTERVAL], tmp_path / "entity")) == []
+    fetch_account_insights_for_interval(account_client, INTERVAL)
+
+    for category, level in ADS_INSIGHTS_LEVELS.items():
+        entity_rows, account_rows = saved_rows(tmp_path / "entity", category), saved_rows(tmp_path / "account", category)
+        # Neither mode writes a file for an entity without rows
+        assert set(account_rows) == set(entity_rows) == {entity["id"] for entity in ENTITIES[category]} & set(SPEND)
+        for entity_id, found in account_rows.items():  # Account rows also name their entity
+            assert [row.pop(f"{level}_id") for row in found] == [entity_id] * len(found)
+            assert found == entity_rows[entity_id]
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+from config.tenants import Tenant
+from extract import response_cache
+from extract.api_client import GraphAPIClient
+from extract.async_client import AsyncGraphAPIClient
+from extract.http_session import RequestSlots
+from extract.page_sizer import PageSizer
+from extract.rate_limiter import RateGovernor
+from extract.response_cache import ResponseCache
+from extract.retry_policy import RetryPolicy
+
+FINAL = {"since": "2024-01-01", "until": "2024-01-31"}  # Data long final, cached with CACHE_TTL_FINAL
+
+
+class FakeReply:
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = json.dumps(body).encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return self._body
+
+
+class FakeSession:
+    """Stands in for an aiohttp session; `reply(method, url, params, data, headers)` returns a FakeReply."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.sent = []
+
+    def request(self, method, url, params=None, data=None, headers=None):
+        self.sent.append({"method": method, "url": url, "params": params, "data": data, "headers": headers})
+        return self.reply(method, url, params, data, headers)
+
+
+def make_client(tmp_path, session, cache=None, page_sizer=None):
+    client = GraphAPIClient(session=object(), rate_governor=RateGovernor(max_rps=10000),
+                            retry_policy=RetryPolicy(base_seconds=0.001, max_seconds=0.001),
+                            request_slots=RequestSlots(10), access_token="token", cache=cache, page_sizer=page_sizer,
+                            tenant=Tenant(name="test", page_id="1000", output_path=tmp_path, state_dir=tmp_path))
+    return AsyncGraphAPIClient(client, session)
+
+
+def test_transient_errors_are_retried(tmp_path):
+    replies = iter([FakeReply(500, {"error": {"message": "unavailable"}}), FakeReply(503, {}),
+                    FakeReply(200, {"data": [{"id": "1"}]})])
+    session = FakeSession(lambda *request: next(replies))
+    client = make_client(tmp_path, session)
+
+    asyncio.run(client.fetch_data("1000/feed", {}, str(tmp_path), "posts.json"))
+
+    assert len(session.sent) == 3
+    assert json.loads((tmp_path / "posts.json").read_text()) == {"data": [{"id": "1"}]}
+
+
+def test_expired_cache_entries_are_revalidated_with_their_etag(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "cache")
+    cache.store("http://graph.test/v22.0/1000/insights", FINAL, {"data": [{"value": 1}]}, etag='"v1"')
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + response_cache.CACHE_TTL_FINAL + 1)
+    session = FakeSession(lambda *request: FakeReply(304, {}))
+    client = make_client(tmp_path, session, cache)
+
+    data = asyncio.run(client._request_json("http://graph.test/v22.0/1000/insights", FINAL, "pages"))
+
+    assert data == {"data": [{"value": 1}]}
+    assert session.sent[0]["headers"] == {"If-None-Match": '"v1"'}
+    assert cache.summary()["revalidated"] == 1
+    assert cache.lookup("http://graph.test/v22.0/1000/insights", FINAL)[0] == data  # Fresh again
+
+
+def test_sub_requests_missing_from_a_batch_response_are_retried(tmp_path):
+    batches = []
+
+    def reply(method, url, params, data, headers):
+        batch = json.loads(data["batch"])
+        batches.append(batch)
+        results = [{"code": 200, "body": json.dumps({"id": sub["relative_url"]})} for sub in batch]
+        return FakeReply(200, results[:-1] if len(batches) == 1 else results)  # The first response is cut short
+
+    client = make_client(tmp_path, FakeSession(reply))
+    items = [{"endpoint": f"{number}", "params": {}, "output_dir": str(tmp_path), "file_name": f"{number}.json"}
+             for number in range(3)]
+
+    assert asyncio.run(client.fetch_batch(items, extend_data=False)) == []
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["0.json", "1.json", "2.json"]
+
+
+def test_cache_and_page_size_files_are_touched_off_the_event_loop(tmp_path):
+    on_loop = []
+
+    def record(method):
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(method.__name__)
+            except RuntimeError:
+                pass
+            return method(*args, **kwargs)
+        return wrapper
+
+    cache = ResponseCache(tmp_path / "cache")
+    cache.lookup, cache.store = record(cache.lookup), record(cache.store)
+    page_sizer = PageSizer(tmp_path / "page_sizes.json", minimum=1)
+    page_sizer.observe = record(page_sizer.observe)
+    session = FakeSession(lambda *request: FakeReply(200, {"data": [{"id": "1"}]}))
+    client = make_client(tmp_path, session, cache, page_sizer)
+
+    asyncio.run(client.fetch_data("1000/insights", {**FINAL, "limit": 1}, str(tmp_path), "insights.json"))
+
+    assert cache.summary()["misses"] == cache.summary()["stores"] == 1
+    assert (tmp_path / "page_sizes.json").exists()  # The full, fast page grew the limit
+    assert on_loop == []
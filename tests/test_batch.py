@@ -0,0 +1,39 @@
+import json
+from types import SimpleNamespace
+
+from config.tenants import Tenant
+from extract.api_client import GraphAPIClient
+from extract.http_session import RequestSlots
+from extract.rate_limiter import RateGovernor
+from extract.retry_policy import RetryPolicy
+
+
+class BatchSession:
+    """Answers batch POSTs with one result per sub-request, dropping the last one of the first batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def request(self, method, url, timeout=None, data=None, **kwargs):
+        batch = json.loads(data["batch"])
+        self.batches.append([sub["relative_url"] for sub in batch])
+        results = [{"code": 200, "body": json.dumps({"id": sub["relative_url"]})} for sub in batch]
+        if len(self.batches) == 1:
+            results = results[:-1]  # A response cut short
+        body = json.dumps(results).encode()
+        return SimpleNamespace(status_code=200, content=body, text=body.decode(), headers={},
+                               json=lambda: json.loads(body), request=SimpleNamespace(url=url, body=None))
+
+
+def test_sub_requests_missing_from_the_batch_response_are_retried(tmp_path):
+    session = BatchSession()
+    client = GraphAPIClient(session=session, rate_governor=RateGovernor(max_rps=10000), retry_policy=RetryPolicy(),
+                            request_slots=RequestSlots(10), access_token="token",
+                            tenant=Tenant(name="test", page_id="1000", output_path=tmp_path, state_dir=tmp_path))
+    items = [{"endpoint": f"{number}", "params": {}, "output_dir": str(tmp_path), "file_name": f"{number}.json"}
+             for number in range(3)]
+
+    assert client.fetch_batch(items, extend_data=False) == []
+    assert len(session.batches) == 2
+    assert len(session.batches[1]) == 1 and session.batches[1][0].startswith("2")
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["0.json", "1.json", "2.json"]
@@ -0,0 +1,64 @@
+import json
+
+from state.change_index import CHANGED, NEW, UNCHANGED, ChangeIndex, content_hash
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_outputs_are_new_then_unchanged_or_changed_in_later_runs(tmp_path):
+    first = ChangeIndex(tmp_path, index_path=tmp_path / "state" / "hashes.json")
+    output = tmp_path / "posts" / "2025-01.json"
+    assert first.status(output, "h1") == NEW
+    first.record(output, "h1", 10, NEW)
+    first.save()
+
+    second = ChangeIndex(tmp_path, index_path=tmp_path / "state" / "hashes.json")
+    assert second.status(output, "h1") == UNCHANGED
+    assert second.status(output, "h2") == CHANGED
+    assert second.status(output, "h1", exists=False) == NEW
+
+
+def test_save_writes_a_manifest_and_merges_hashes_of_other_writers(tmp_path):
+    index_path = tmp_path / "state" / "hashes.json"
+    worker_a = ChangeIndex(tmp_path, index_path=index_path)
+    worker_b = ChangeIndex(tmp_path, index_path=index_path)
+    worker_a.record(tmp_path / "a.json", "ha", 3, NEW)
+    worker_a.record(tmp_path / "a.json", "ha", 3, UNCHANGED)  # Written twice: the first write is what changed
+    worker_b.record(tmp_path / "b.json", "hb", 4, CHANGED)
+
+    manifest_path = worker_a.save(worker_id="a")
+    worker_b.save(worker_id="b")
+
+    assert set(json.loads(index_path.read_text())) == {"a.json", "b.json"}
+    manifest = json.loads(open(manifest_path).read())
+    assert manifest["worker_id"] == "a"
+    assert manifest["files"] == [{"path": "a.json", "status": NEW, "records": 3, "hash": "ha"}]
+    assert manifest["summary"][NEW] == {"files": 1, "records": 3}
+
+
+def test_a_run_without_output_writes_no_manifest_and_old_manifests_are_pruned(tmp_path):
+    assert ChangeIndex(tmp_path).save() is None
+
+    manifest_dir = tmp_path / "manifests"
+    manifest_dir.mkdir()
+    for day in range(1, 5):
+        (manifest_dir / f"2020010{day}T000000Z.json").write_text("{}")
+    index = ChangeIndex(tmp_path, keep_manifests=2)
+    index.record(tmp_path / "a.json", "ha", 1, NEW)
+    manifest_path = index.save()
+
+    assert sorted(path.name for path in manifest_dir.iterdir()) == ["20200104T000000Z.json",
+                                                                    manifest_path.rsplit("/", 1)[1]]
+
+
+def test_back_to_back_runs_keep_their_own_manifest(tmp_path):
+    paths = set()
+    for run in range(3):
+        index = ChangeIndex(tmp_path)
+        index.record(tmp_path / "a.json", f"h{run}", 1, CHANGED)
+        paths.add(index.save())
+
+    assert len(paths) == len(list((tmp_path / "manifests").iterdir())) == 3
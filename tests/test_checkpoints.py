@@ -0,0 +1,65 @@
+import json
+
+from state import checkpoints
+from state.checkpoints import CheckpointJournal
+
+
+def test_progress_survives_a_restart_without_the_access_token(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    journal.save_cursor("out/posts.json", "https://graph/v22.0/1/feed?after=abc&access_token=secret", 25)
+    journal.mark_done("page_metrics:2025-01")
+
+    restarted = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    assert restarted.resuming
+    assert restarted.cursor("out/posts.json") == {"next": "https://graph/v22.0/1/feed?after=abc", "records": 25}
+    assert restarted.is_done("page_metrics:2025-01")
+    assert "secret" not in (tmp_path / "checkpoints.jsonl").read_text()
+
+
+def test_each_page_appends_one_line_and_the_journal_is_compacted(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    for page in range(1000):
+        journal.save_cursor("out/posts.json", f"https://graph/next?after={page}", page * 25)
+
+    lines = (tmp_path / "checkpoints.jsonl").read_text().splitlines()
+    assert len(lines) <= checkpoints.COMPACT_RATIO * 64
+    assert CheckpointJournal(tmp_path / "checkpoints.jsonl").cursor("out/posts.json")["records"] == 999 * 25
+
+
+def test_cleared_cursors_stay_cleared(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    journal.save_cursor("out/posts.json", "https://graph/next?after=1", 25)
+    journal.clear_cursor("out/posts.json")
+
+    assert CheckpointJournal(tmp_path / "checkpoints.jsonl").cursor("out/posts.json") is None
+
+
+def test_old_progress_expires(tmp_path, monkeypatch):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl", max_age_hours=24)
+    journal.mark_done("page_metrics:2025-01")
+    journal.save_cursor("out/posts.json", "https://graph/next?after=1", 25)
+
+    now = checkpoints.time.time()
+    monkeypatch.setattr(checkpoints.time, "time", lambda: now + 25 * 3600)
+    restarted = CheckpointJournal(tmp_path / "checkpoints.jsonl", max_age_hours=24)
+    assert not restarted.resuming
+
+
+def test_a_line_cut_off_by_a_crash_is_skipped(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    journal.mark_done("posts:2025-01")
+    with open(tmp_path / "checkpoints.jsonl", "a") as file:
+        file.write('{"unit": "posts:2025-02", "t"')
+
+    restarted = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    assert restarted.is_done("posts:2025-01")
+    assert not restarted.is_done("posts:2025-02")
+
+
+def test_clear_removes_the_journal(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints.jsonl")
+    journal.mark_done("posts:2025-01")
+    journal.clear()
+
+    assert not (tmp_path / "checkpoints.jsonl").exists()
+    assert not CheckpointJournal(tmp_path / "checkpoints.jsonl").resuming
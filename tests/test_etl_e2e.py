@@ -0,0 +1,136 @@
+"""End-to-end runs of `etl()` against the mock Graph API, one per engine and ads insights mode.
+
+Each run is a subprocess: the configuration is read from the environment when it is imported.
+"""
+import argparse
+import filecmp
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mock_graph_api import AD_ACCOUNT_ID, PAGE_ID, add_mock_arguments, settings_from_args, start_server
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+MONTHS = 2
+
+CATEGORIES = [
+    "facebook_page_metrics", "facebook_posts", "facebook_post_metrics", "instagram_business_account",
+    "instagram_account_insights", "instagram_media", "instagram_media_insights", "campaigns", "adsets", "ads",
+    "campaigns_insights", "adsets_insights", "ads_insights"
+]
+
+ENGINES = [
+    "threads",
+    pytest.param("async", marks=pytest.mark.skipif(importlib.util.find_spec("aiohttp") is None,
+                                                    reason="the async engine needs aiohttp"))
+]
+
+
+@pytest.fixture(scope="module")
+def mock_api():
+    parser = argparse.ArgumentParser()
+    add_mock_arguments(parser)
+    args = parser.parse_args(["--posts", "60", "--media", "10", "--ads", "100", "--latency-ms", "0", "--jitter-ms", "0"])
+    server = start_server(settings_from_args(args, MONTHS + 1))
+    yield f"http://127.0.0.1:{server.server_port}/v22.0/"
+    server.shutdown()
+
+
+def run_etl(mock_api, work_dir, **env):
+    """Run `etl()` for one tenant under `work_dir`; returns the tenant's output directory."""
+    work_dir.mkdir(exist_ok=True)
+    manifest = work_dir / "tenants.json"
+    manifest.write_text(json.dumps([{
+        "name": "e2e", "page_id": PAGE_ID, "ads_account": AD_ACCOUNT_ID, "access_token": "mock-short-lived-token",
+        "output_path": str(work_dir / "output"), "state_dir": str(work_dir / "state")
+    }]))
+    result = subprocess.run(
+        [sys.executable, "-c", "from graph_etl.graph_etl import etl; etl()"],
+        env={
+            **os.environ,
+            "PYTHONPATH": SRC_DIR,
+            "GRAPH_API_URL_BASE": mock_api,
+            "TENANT_MANIFEST": str(manifest),
+            "STATE_ROOT": str(work_dir / "state"),
+            "METRICS_DIR": str(work_dir / "metrics"),
+            "FB_APP_ID": "mock-app",
+            "FB_APP_SECRET": "mock-secret",
+            "NUM_MONTHS_DATA": str(MONTHS),
+            "ETL_MODE": "all",
+            "RATE_LIMIT_MAX_RPS": "1000",
+            "RATE_LIMIT_RETRY_WAIT": "1",
+            "REPORT_POLL_INITIAL_WAIT": "0.1",
+            **env
+        },
+        capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, (result.stdout + result.stderr)[-3000:]
+    return work_dir / "output"
+
+
+def output_files(output_dir):
+    """Relative paths of a run's data files (not its manifests or token)."""
+    return sorted(
+        os.path.relpath(os.path.join(root, name), output_dir)
+        for root, _, names in os.walk(output_dir) for name in names
+        if os.path.relpath(root, output_dir).split(os.sep)[0] not in ("manifests", "security")
+    )
+
+
+@pytest.mark.parametrize("ads_mode", ["account", "async", "entity"])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_etl_writes_every_category(mock_api, tmp_path, engine, ads_mode):
+    output_dir = run_etl(mock_api, tmp_path, ETL_ENGINE=engine, ADS_INSIGHTS_MODE=ads_mode)
+
+    for category in CATEGORIES:
+        assert os.listdir(output_dir / category), f"no {category} output"
+    campaign = json.loads((output_dir / "campaigns" / "campaigns_list.json").read_text())["data"][0]
+    assert list(campaign) == ["name", "status", "id"]  # The order the API returned the keys in
+    assert len(os.listdir(output_dir / "manifests")) == 1
+    report = json.loads((tmp_path / "metrics" / "run_report.json").read_text())
+    assert report["requests"]
+    assert (tmp_path / "state" / "sync_state.json").exists()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_a_second_run_finds_every_output_unchanged(mock_api, tmp_path, engine):
+    run_etl(mock_api, tmp_path, ETL_ENGINE=engine, SYNC_INCREMENTAL="false", RESPONSE_CACHE="false")
+    output_dir = run_etl(mock_api, tmp_path, ETL_ENGINE=engine, SYNC_INCREMENTAL="false", RESPONSE_CACHE="false")
+
+    manifests = sorted(os.listdir(output_dir / "manifests"))
+    summary = json.loads((output_dir / "manifests" / manifests[-1]).read_text())["summary"]
+    assert summary["new"]["files"] == summary["changed"]["files"] == 0
+    assert summary["unchanged"]["files"] > 0
+
+
+@pytest.mark.skipif(importlib.util.find_spec("aiohttp") is None, reason="the async engine needs aiohttp")
+def test_async_engine_writes_the_same_output_as_threads(mock_api, tmp_path):
+    threads_dir = run_etl(mock_api, tmp_path / "threads", ETL_ENGINE="threads")
+    async_dir = run_etl(mock_api, tmp_path / "async", ETL_ENGINE="async")
+
+    files = output_files(threads_dir)
+    assert files == output_files(async_dir)
+    _, mismatch, errors = filecmp.cmpfiles(threads_dir, async_dir, files, shallow=False)
+    assert mismatch == errors == []
+
+
+def test_normalized_tables_default_to_ndjson(mock_api, tmp_path):
+    output_dir = run_etl(mock_api, tmp_path, NORMALIZE_OUTPUT="true")
+
+    for table in ("page_metrics", "post_metrics", "ads_insights"):
+        assert list((output_dir / "normalized" / table).glob("month=*/part-0.ndjson")), f"no {table} table"
+
+
+def test_inline_post_insights_write_the_same_output_as_separate_requests(mock_api, tmp_path):
+    separate_dir = run_etl(mock_api, tmp_path / "separate", ETL_MODE="social")
+    inline_dir = run_etl(mock_api, tmp_path / "inline", ETL_MODE="social", INLINE_POST_INSIGHTS="true")
+
+    files = [path for path in output_files(separate_dir) if path.startswith(("facebook_posts", "facebook_post_metrics"))]
+    assert files and files == [path for path in output_files(inline_dir)
+                               if path.startswith(("facebook_posts", "facebook_post_metrics"))]
+    _, mismatch, errors = filecmp.cmpfiles(separate_dir, inline_dir, files, shallow=False)
+    assert mismatch == errors == []
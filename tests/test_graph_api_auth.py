@@ -0,0 +1,150 @@
+import fcntl
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from auth import graph_api_auth
+from auth.graph_api_auth import FacebookTokenManager
+from config.config import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+DAY = 24 * 3600
+
+
+class FakeSession:
+    """Answers token exchanges with `exchange` and `debug_token` with `debug`, recording every request."""
+
+    def __init__(self, exchange=None, debug=None, on_request=None):
+        self.exchange = exchange or {"access_token": "long-lived", "expires_in": 60 * DAY}
+        self.debug = debug or {"data": {"is_valid": True, "expires_at": 0}}
+        self.on_request = on_request
+        self.sent = []
+
+    def get(self, url, params=None, timeout=None):
+        self.sent.append({"url": url, "params": params, "timeout": timeout})
+        if self.on_request:
+            self.on_request()
+        body = self.debug if url.endswith("debug_token") else self.exchange
+        return SimpleNamespace(status_code=200, text=json.dumps(body), json=lambda: body)
+
+
+@pytest.fixture(autouse=True)
+def app_credentials(monkeypatch):
+    monkeypatch.setenv("FB_APP_ID", "app")
+    monkeypatch.setenv("FB_APP_SECRET", "secret")
+    monkeypatch.setattr(graph_api_auth, "_ciphers", {})
+
+
+def make_manager(tmp_path, session, short_lived_token="short-lived"):
+    return FacebookTokenManager(short_lived_token, session=session, refresh_window_days=7,
+                                token_file=tmp_path / "secure_token.json", encryption_key_file=tmp_path / "key.key")
+
+
+def store_token(tmp_path, token, expires_at):
+    """Saves `token` as an earlier run would have; `expires_at` is left out when it is `missing`."""
+    manager = make_manager(tmp_path, FakeSession())
+    manager._save_token(token, expires_at)
+    if expires_at == "missing":
+        data = json.loads((tmp_path / "secure_token.json").read_text())
+        del data["expires_at"]
+        (tmp_path / "secure_token.json").write_text(json.dumps(data))
+
+
+def saved_expiry(tmp_path):
+    return json.loads((tmp_path / "secure_token.json").read_text())["expires_at"]
+
+
+def test_first_run_exchanges_the_short_lived_token_and_saves_its_expiry(tmp_path):
+    session = FakeSession()
+
+    assert make_manager(tmp_path, session).get_token() == "long-lived"
+
+    assert [request["params"]["fb_exchange_token"] for request in session.sent] == ["short-lived"]
+    assert abs(saved_expiry(tmp_path) - (time.time() + 60 * DAY)) < 60
+    assert "long-lived" not in (tmp_path / "secure_token.json").read_text()  # Stored encrypted
+
+
+def test_a_token_is_reused_until_it_enters_the_refresh_window(tmp_path):
+    store_token(tmp_path, "stored", int(time.time()) + 8 * DAY)
+    session = FakeSession()
+    assert make_manager(tmp_path, session).get_token() == "stored"
+    assert session.sent == []
+
+    store_token(tmp_path, "stored", int(time.time()) + 6 * DAY)
+    session = FakeSession(exchange={"access_token": "refreshed", "expires_in": 60 * DAY})
+    assert make_manager(tmp_path, session).get_token() == "refreshed"
+    assert [request["params"]["fb_exchange_token"] for request in session.sent] == ["stored"]
+    assert saved_expiry(tmp_path) > time.time() + 59 * DAY
+
+
+def test_debug_token_supplies_a_missing_expiry(tmp_path):
+    store_token(tmp_path, "stored", "missing")
+    expires_at = int(time.time()) + 30 * DAY
+    session = FakeSession(debug={"data": {"is_valid": True, "expires_at": expires_at}})
+
+    assert make_manager(tmp_path, session).get_token() == "stored"
+
+    assert [request["url"].rsplit("/", 1)[-1] for request in session.sent] == ["debug_token"]
+    assert session.sent[0]["params"] == {"input_token": "stored", "access_token": "app|secret"}
+    assert saved_expiry(tmp_path) == expires_at
+
+
+def test_an_exchange_without_expires_in_asks_debug_token(tmp_path):
+    session = FakeSession(exchange={"access_token": "long-lived"}, debug={"data": {"is_valid": True, "expires_at": 0}})
+
+    assert make_manager(tmp_path, session).get_token() == "long-lived"
+
+    assert [request["url"].rsplit("/", 1)[-1] for request in session.sent] == ["access_token", "debug_token"]
+    assert saved_expiry(tmp_path) == 0  # Never expires, so it is never refreshed
+    session = FakeSession()
+    assert make_manager(tmp_path, session).get_token() == "long-lived"
+    assert session.sent == []
+
+
+def test_an_unknown_expiry_is_refreshed(tmp_path):
+    store_token(tmp_path, "stored", "missing")
+    session = FakeSession(exchange={"access_token": "refreshed", "expires_in": 60 * DAY},
+                          debug={"data": {"is_valid": False}})
+
+    assert make_manager(tmp_path, session).get_token() == "refreshed"
+
+
+def test_every_request_sets_a_timeout(tmp_path):
+    session = FakeSession(exchange={"access_token": "long-lived"})
+
+    make_manager(tmp_path, session).get_token()
+
+    assert [request["timeout"] for request in session.sent] == [(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)] * 2
+
+
+def test_the_cipher_is_built_once_per_key_file(tmp_path, monkeypatch):
+    loads = []
+    load_key = FacebookTokenManager._load_encryption_key
+    monkeypatch.setattr(FacebookTokenManager, "_load_encryption_key",
+                        lambda manager: loads.append(manager) or load_key(manager))
+    store_token(tmp_path, "stored", int(time.time()) + 30 * DAY)
+
+    for _ in range(3):
+        assert make_manager(tmp_path, FakeSession()).get_token() == "stored"
+
+    assert len(loads) == 1
+
+
+def test_the_token_store_is_locked_while_the_token_is_refreshed(tmp_path):
+    lock_path = tmp_path / "secure_token.json.lock"
+    held = []
+
+    def check_lock():
+        with open(lock_path) as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                held.append(False)
+            except BlockingIOError:
+                held.append(True)
+
+    make_manager(tmp_path, FakeSession(on_request=check_lock)).get_token()
+
+    assert held == [True]
+    with open(lock_path) as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Released afterwards
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+from extract.http_session import RequestSlots
+
+
+def test_threads_never_exceed_the_limit():
+    slots = RequestSlots(3)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def request():
+        with slots:
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 3
+    assert slots._in_flight == 0
+
+
+def test_threads_and_coroutines_share_the_limit():
+    slots = RequestSlots(2)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def count(delta):
+        with lock:
+            in_flight[0] += delta
+            peak[0] = max(peak[0], in_flight[0])
+
+    def thread_request():
+        with slots:
+            count(1)
+            time.sleep(0.02)
+            count(-1)
+
+    async def coroutine_request():
+        async with slots:
+            count(1)
+            await asyncio.sleep(0.02)
+            count(-1)
+
+    async def main():
+        await asyncio.gather(*(coroutine_request() for _ in range(5)),
+                             *(asyncio.to_thread(thread_request) for _ in range(5)))
+
+    asyncio.run(main())
+
+    assert peak[0] == 2
+    assert slots._in_flight == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    slots = RequestSlots(1)
+
+    async def main():
+        await slots.acquire_async()
+        waiter = asyncio.create_task(slots.acquire_async())
+        await asyncio.sleep(0)
+        slots.release()  # Admits the waiter, which is cancelled before it runs
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert slots._in_flight == 0
+        async with slots:
+            assert slots._in_flight == 1
+
+    asyncio.run(main())
+
+
+def test_raising_the_limit_admits_waiters():
+    slots = RequestSlots(1)
+    slots.acquire()
+    admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (slots.acquire(), admitted.set()))
+    thread.start()
+
+    assert not admitted.wait(0.05)
+    slots.resize(2)
+    assert admitted.wait(1)
+    thread.join()
@@ -0,0 +1,13 @@
+import pytest
+
+from transform import normalize
+from transform.normalize import require_format
+
+
+def test_ndjson_needs_no_pyarrow(monkeypatch):
+    monkeypatch.setattr(normalize, "pa", None)
+    require_format("ndjson")
+    with pytest.raises(RuntimeError, match="requires pyarrow"):
+        require_format("parquet")
+    with pytest.raises(ValueError, match="Unknown NORMALIZE_FORMAT"):
+        require_format("csv")
@@ -0,0 +1,87 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from extract.page_sizer import PageSizer, page_family, resizable, with_limit
+
+FAMILY = "{id}/feed"
+
+
+@pytest.fixture
+def sizer(tmp_path):
+    return PageSizer(tmp_path / "page_sizes.json", minimum=10, maximum=400, target_seconds=1.0,
+                     max_bytes=1024 * 1024, ceiling_days=7, ceiling_pages=3)
+
+
+def test_fast_full_pages_double_the_size(sizer):
+    sizer.observe(FAMILY, 25, rows=25, seconds=0.1, size=1000)
+    assert sizer.limit_for(FAMILY, 25) == 50
+
+
+def test_partial_pages_are_ignored(sizer):
+    sizer.observe(FAMILY, 25, rows=3, seconds=0.01, size=100)
+    assert sizer.limit_for(FAMILY, 25) == 25
+
+
+def test_one_slow_page_does_not_halve_the_size(sizer):
+    for _ in range(3):
+        sizer.observe(FAMILY, 100, rows=100, seconds=0.6, size=1000)
+    sizer.observe(FAMILY, 100, rows=100, seconds=1.5, size=1000)
+    assert sizer.limit_for(FAMILY, 100) == 100
+
+
+def test_rejection_caps_the_size_until_enough_clean_pages(sizer):
+    sizer.observe(FAMILY, 100, rows=100, seconds=0.1, size=1000)
+    assert sizer.limit_for(FAMILY, 100) == 200
+    assert sizer.shrink(FAMILY, 200) == 100
+
+    for _ in range(2):
+        sizer.observe(FAMILY, 100, rows=100, seconds=0.1, size=1000)
+        assert sizer.limit_for(FAMILY, 100) == 100  # Held at the ceiling
+
+    sizer.observe(FAMILY, 100, rows=100, seconds=0.1, size=1000)
+    assert sizer.limit_for(FAMILY, 100) == 200  # Third clean page lifts it
+    assert "ceiling" not in json.loads(open(sizer.file_path).read())[FAMILY]
+
+
+def test_ceiling_expires(tmp_path):
+    file_path = tmp_path / "page_sizes.json"
+    set_on = (date.today() - timedelta(days=8)).isoformat()
+    file_path.write_text(json.dumps({FAMILY: {"limit": 100, "ceiling": 100, "ceiling_at": set_on}}))
+    sizer = PageSizer(file_path, minimum=10, maximum=400, target_seconds=1.0, max_bytes=1024 * 1024,
+                      ceiling_days=7, ceiling_pages=50)
+
+    sizer.observe(FAMILY, 100, rows=100, seconds=0.1, size=1000)
+    assert sizer.limit_for(FAMILY, 100) == 200
+
+
+def test_sizes_persist_and_merge_across_instances(tmp_path):
+    file_path = tmp_path / "page_sizes.json"
+    first, second = PageSizer(file_path, maximum=400), PageSizer(file_path, maximum=400)
+    first.observe(FAMILY, 25, rows=25, seconds=0.01, size=100)
+    second.observe("{id}/media", 25, rows=25, seconds=0.01, size=100)
+
+    assert PageSizer(file_path).summary() == {FAMILY: 50, "{id}/media": 50}
+
+
+def test_shrink_stops_at_the_minimum(sizer):
+    assert sizer.shrink(FAMILY, 15) == 10
+    assert sizer.shrink(FAMILY, 10) is None
+
+
+def test_only_first_pages_and_cursor_links_are_resized():
+    assert resizable("https://graph/v22.0/1/feed", {"limit": 25})
+    assert resizable("https://graph/v22.0/1/feed?limit=25&after=abc", {})
+    assert not resizable("https://graph/v22.0/1/insights?limit=25&offset=50", {})
+    assert not resizable("https://graph/v22.0/1/insights?limit=25&since=1&until=2", {})
+
+
+def test_with_limit_rewrites_the_next_link():
+    url, params = with_limit("https://graph/v22.0/1/feed?limit=25&after=abc", {}, 100)
+    assert url == "https://graph/v22.0/1/feed?limit=100&after=abc"
+    assert params == {}
+
+
+def test_insights_levels_are_separate_families():
+    assert page_family("act_1/insights", {"level": "ad"}) != page_family("act_1/insights", {"level": "campaign"})
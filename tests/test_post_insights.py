@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from config.tenants import Tenant
+from extract.api_client import GraphAPIClient
+from extract.http_session import RequestSlots
+from extract.rate_limiter import RateGovernor
+from extract.retry_policy import RetryPolicy
+from graph_etl.graph_etl import fetch_posts_with_insights
+
+INTERVAL = {"since": "2024-12-31", "until": "2025-01-31", "start_date": "2025-01-01"}
+
+
+def insights(post_id, paging=None):
+    return {"data": [{"name": "post_impressions", "period": "lifetime", "values": [{"value": post_id}]}],
+            **({"paging": paging} if paging else {})}
+
+
+POSTS = [
+    {"id": "1_1", "created_time": "2025-01-02T10:00:00+0000", "insights": insights("1_1")},
+    {"id": "1_2", "created_time": "2025-01-03T10:00:00+0000",
+     "insights": insights("1_2", {"cursors": {"before": "a", "after": "b"}, "next": "https://graph.test/next"})},
+    {"id": "1_3", "created_time": "2025-01-04T10:00:00+0000"},
+]
+
+
+class FeedSession:
+    """Answers the feed with POSTS and batched `{post_id}/insights` requests with each post's full insights."""
+
+    def __init__(self):
+        self.batched = []
+
+    def request(self, method, url, timeout=None, params=None, data=None, **kwargs):
+        if method == "POST":
+            batch = json.loads(data["batch"])
+            self.batched += [urlparse(sub["relative_url"]).path for sub in batch]
+            body = [{"code": 200, "body": json.dumps(insights(urlparse(sub["relative_url"]).path.split("/")[0]))}
+                    for sub in batch]
+        else:
+            body = {"data": json.loads(json.dumps(POSTS))}
+        content = json.dumps(body).encode()
+        return SimpleNamespace(status_code=200, content=content, text=content.decode(), headers={},
+                               json=lambda: json.loads(content), request=SimpleNamespace(url=url, body=None))
+
+
+def test_posts_with_truncated_or_missing_inline_insights_are_fetched_separately(tmp_path):
+    session = FeedSession()
+    client = GraphAPIClient(session=session, rate_governor=RateGovernor(max_rps=10000), retry_policy=RetryPolicy(),
+                            request_slots=RequestSlots(10), access_token="token",
+                            tenant=Tenant(name="test", page_id="1000", output_path=tmp_path, state_dir=tmp_path))
+
+    fetch_posts_with_insights(client, [INTERVAL])
+
+    assert session.batched == ["1_2/insights", "1_3/insights"]
+    for post_id in ("1_1", "1_2", "1_3"):
+        saved = json.loads((tmp_path / "facebook_post_metrics" / f"{post_id}.json").read_text())
+        assert saved == {"data": insights(post_id)["data"]}
+    posts = json.loads((tmp_path / "facebook_posts" / "2025-01-01_2025-01-31.json").read_text())["data"]
+    assert [post["id"] for post in posts] == ["1_1", "1_2", "1_3"]
+    assert not any("insights" in post for post in posts)
@@ -0,0 +1,72 @@
+import pytest
+
+from extract import rate_limiter
+from extract.rate_limiter import APP_USE_CASE, RateGovernor
+
+
+class FakeClock:
+    """Stands in for `time.monotonic` so waits can be checked without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_waiters_are_paced_from_the_end_of_a_block(clock):
+    governor = RateGovernor(max_rps=2, min_rps=0.1, soft_pct=75)
+    governor.throttled("pages", fallback_wait=10)
+
+    waits = [governor.reserve("pages") for _ in range(6)]
+
+    # A burst of the bucket's capacity when the block lifts, then one request every 1 / max_rps
+    assert waits == pytest.approx([10, 10, 10.5, 11, 11.5, 12])
+
+
+def test_reservations_ahead_of_the_clock_do_not_refill_the_bucket(clock):
+    governor = RateGovernor(max_rps=2, min_rps=0.1, soft_pct=75)
+    governor.throttled("pages", fallback_wait=10)
+    first = [governor.reserve("pages") for _ in range(3)]
+
+    clock.now += 1
+    later = governor.reserve("pages")
+
+    assert first == pytest.approx([10, 10, 10.5])
+    assert later == pytest.approx(10)  # Slot at 11s after the block started, one second later
+
+
+def test_throttle_blocks_every_bucket_of_the_request(clock):
+    governor = RateGovernor(max_rps=100, min_rps=0.1, soft_pct=75)
+    governor.throttled("ads_insights", fallback_wait=30, scope="tenant")
+
+
+    assert governor.reserve("ads_management", scope="tenant") == pytest.approx(30)
+    assert governor.reserve("pages", scope="other") == pytest.approx(30)  # The app bucket is shared
+    assert governor._blocked_until[APP_USE_CASE] == pytest.approx(clock.now + 30)
+    assert governor._blocked_until["tenant:ads_insights"] == pytest.approx(clock.now + 30)
+    assert governor._blocked_until["tenant:ad_account"] == pytest.approx(clock.now + 30)
+
+
+def test_throttle_keeps_the_block_reported_by_the_headers(clock):
+    governor = RateGovernor(max_rps=100, min_rps=0.1, soft_pct=75)
+    governor.update({"X-Business-Use-Case-Usage":
+                     '{"1": [{"type": "pages", "call_count": 100, "estimated_time_to_regain_access": 2}]}'})
+
+    assert governor.throttled("pages", fallback_wait=5) == pytest.approx(120)
+    assert governor.reserve("pages") == pytest.approx(120)
+
+
+def test_usage_above_the_soft_limit_slows_the_bucket_down(clock):
+    governor = RateGovernor(max_rps=10, min_rps=1, soft_pct=50)
+    governor.reserve("pages")
+    governor.update({"X-Business-Use-Case-Usage": '{"1": [{"type": "pages", "call_count": 75}]}'})
+
+    assert governor.budget()["pages"]["rate_per_second"] == pytest.approx(5)
@@ -0,0 +1,51 @@
+import os
+
+from extract import response_cache
+from extract.response_cache import ResponseCache
+
+FINAL = {"since": "2024-01-01", "until": "2024-01-31"}  # Data long final, cached with CACHE_TTL_FINAL
+BODY = {"data": ["x" * 1000]}  # Large enough that the few bytes `stored_at` varies by do not matter
+
+
+def entry_size(directory):
+    cache = ResponseCache(directory)
+    cache.store("https://graph/v22.0/0/insights", FINAL, BODY)
+    return cache.summary()["bytes"]
+
+
+def test_final_data_is_served_from_disk_without_the_token(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.store("https://graph/v22.0/1/insights", {**FINAL, "access_token": "secret"}, {"data": [1]})
+
+    body, _ = ResponseCache(tmp_path).lookup("https://graph/v22.0/1/insights", {**FINAL, "access_token": "other"})
+    assert body == {"data": [1]}
+    assert not any("secret" in path.read_text() for path in tmp_path.iterdir())
+
+
+def test_eviction_drops_least_recently_used_entries_in_one_batch(tmp_path):
+    cache = ResponseCache(tmp_path / "cache", max_bytes=10 * entry_size(tmp_path / "probe") + 50)
+    for number in range(10):
+        cache.store(f"https://graph/v22.0/{number}/insights", FINAL, BODY)
+    cache.lookup("https://graph/v22.0/0/insights", FINAL)  # Entry 0 becomes the most recently used
+    assert cache.summary()["evictions"] == 0
+
+    cache.store("https://graph/v22.0/10/insights", FINAL, BODY)
+
+    summary = cache.summary()
+    assert summary["evictions"] == 2  # Down to EVICT_LOW_WATER of the limit, not just under it
+    assert summary["bytes"] <= cache.max_bytes * response_cache.EVICT_LOW_WATER
+    assert summary["bytes"] == sum(os.path.getsize(path) for path in (tmp_path / "cache").iterdir())
+    assert cache.lookup("https://graph/v22.0/0/insights", FINAL)[0] is not None
+    assert cache.lookup("https://graph/v22.0/1/insights", FINAL)[0] is None
+    assert cache.lookup("https://graph/v22.0/2/insights", FINAL)[0] is None
+
+
+def test_overwriting_an_entry_does_not_count_it_twice(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.store("https://graph/v22.0/1/insights", FINAL, BODY)
+    cache.store("https://graph/v22.0/1/insights", FINAL, BODY)
+
+    on_disk = sum(os.path.getsize(path) for path in tmp_path.iterdir())
+    assert cache.summary()["entries"] == 1
+    assert cache.summary()["bytes"] == on_disk
+    assert ResponseCache(tmp_path).summary()["bytes"] == on_disk
@@ -0,0 +1,147 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from config.tenants import Tenant
+from extract import retry_policy
+from extract.api_client import GraphAPIClient
+from extract.http_session import RequestSlots
+from extract.rate_limiter import RateGovernor
+from extract.retry_policy import CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy
+
+URL = "http://graph.test/v22.0/1000/feed"
+
+
+class FakeSession:
+    """Answers every request with `reply()`, which returns `(status, body)` or raises."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        with self._lock:
+            self.sent += 1
+        status, body = self.reply()
+        return SimpleNamespace(status_code=status, content=body, headers={},
+                               request=SimpleNamespace(url=url, body=None))
+
+
+def make_client(session, policy, slots=None):
+    return GraphAPIClient(session=session, rate_governor=RateGovernor(max_rps=10000), retry_policy=policy,
+                          request_slots=slots or RequestSlots(10), access_token="token",
+                          tenant=Tenant(name="test", page_id="1000", ads_account="2000", access_token="token",
+                                        output_path="/tmp", cache_dir="/tmp"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_circuit_opens_after_consecutive_failures_and_probes_once(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False)
+    assert not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.allow()  # The probe
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record(False)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+
+
+def test_probe_that_raises_releases_the_circuit(clock):
+    policy = RetryPolicy(max_attempts=1, circuit_failures=1, circuit_cooldown=30)
+    replies = iter([(503, b"{}"), ValueError("bad body"), (200, b"{}")])
+
+    def reply():
+        value = next(replies)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    client = make_client(FakeSession(reply), policy)
+    assert client._send("GET", URL, "pages").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client._send("GET", URL, "pages")
+
+    clock[0] += 30
+    with pytest.raises(ValueError):
+        client._send("GET", URL, "pages")  # The probe fails with an unexpected exception...
+
+    clock[0] += 30
+    assert client._send("GET", URL, "pages").status_code == 200  # ...and a later probe is still let through
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, minimum=1)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+
+
+def test_no_hedging_without_a_known_percentile():
+    policy = RetryPolicy(hedge=True, hedge_percentile=50, hedge_min_samples=0)
+    assert policy.hedge_delay("{id}/feed") is None
+
+    for seconds in (0.1, 0.2, 0.3):
+        policy.record("{id}/feed", True, seconds)
+    policy.record("{id}/feed", False, 9.0)  # Failures say nothing about latency
+    assert policy.hedge_delay("{id}/feed") == pytest.approx(0.2)
+
+
+def test_hedges_take_a_request_slot():
+    policy = RetryPolicy(hedge=True, hedge_percentile=50, hedge_min_samples=1, budget=RetryBudget(minimum=10))
+    policy.record("{id}/feed", True, 0.01)
+    slots = RequestSlots(1)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def reply():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.1)
+        with lock:
+            in_flight[0] -= 1
+        return 200, b"{}"
+
+    session = FakeSession(reply)
+    assert make_client(session, policy, slots)._send("GET", URL, "pages").status_code == 200
+    assert peak[0] == 1
+    assert session.sent == 1  # Every slot was taken by the slow primary, so no hedge was sent
+
+
+def test_slow_get_is_hedged():
+    policy = RetryPolicy(hedge=True, hedge_percentile=50, hedge_min_samples=1, budget=RetryBudget(minimum=10))
+    policy.record("{id}/feed", True, 0.01)
+    delays = iter([0.5, 0.0])
+
+    def reply():
+        time.sleep(next(delays))
+        return 200, b"{}"
+
+    session = FakeSession(reply)
+    start = time.perf_counter()
+    assert make_client(session, policy, RequestSlots(2))._send("GET", URL, "pages").status_code == 200
+    assert time.perf_counter() - start < 0.4
+    assert session.sent == 2
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from utils.run_metrics import LATENCY_BUCKETS, Histogram, RunMetrics, endpoint_label
+
+SAMPLE = re.compile(r'^graph_etl_[a-z_]+(\{([a-z_]+="([^"\\]|\\.)*",?)*\})? -?[0-9.e+-]+$')
+
+
+@pytest.mark.parametrize("url, label", [
+    ("https://graph.facebook.com/v22.0/act_123/insights?level=ad&limit=500", "act_{id}/insights"),
+    ("https://graph.facebook.com/v22.0/1000/feed?after=abc", "{id}/feed"),
+    ("https://graph.facebook.com/v22.0/1000_2000/insights", "{id}/insights"),
+    ("https://graph.facebook.com/v22.0/", "batch"),
+    ("https://graph.facebook.com/v22.0/oauth/access_token", "oauth/access_token"),
+    ("17841400000000000/media", "{id}/media"),
+    ("act_9/campaigns", "act_{id}/campaigns"),
+])
+def test_endpoint_labels_replace_ids_and_drop_the_version(url, label):
+    assert endpoint_label(url) == label
+
+
+def test_histogram_buckets_are_cumulative_upper_bounds():
+    histogram = Histogram(bounds=(0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 1, 20):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 4, 4]  # 20 only counts towards +Inf, i.e. `count`
+    assert histogram.as_dict() == {"count": 5, "sum_seconds": 21.65, "max_seconds": 20, "mean_seconds": 4.33,
+                                   "buckets": {"0.1": 2, "1": 4, "10": 4}}
+    assert Histogram().as_dict()["mean_seconds"] == 0.0
+    assert list(Histogram().as_dict()["buckets"]) == [str(bound) for bound in LATENCY_BUCKETS]
+
+
+def test_prometheus_output_has_one_family_per_metric_and_valid_samples(tmp_path):
+    metrics = RunMetrics(pool_size=4)
+    for status in (200, 200, 429):
+        with metrics.request("https://graph.facebook.com/v22.0/act_9/insights?level=ad", "GET") as sample:
+            sample.update(status=status, bytes_in=100, bytes_out=10)
+    metrics.record_retry("https://graph.facebook.com/v22.0/act_9/insights", count=2)
+    metrics.record_throttle_wait('ads_"insights"', 1.5)
+    with metrics.timer("stage", "posts"):
+        pass
+
+    metrics.write_prometheus(tmp_path / "graph_etl.prom")
+    lines = (tmp_path / "graph_etl.prom").read_text().splitlines()
+
+    families = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    assert len(families) == len(set(families))
+    assert all(SAMPLE.match(line) for line in lines if not line.startswith("#")), lines
+    labels = 'endpoint="act_{id}/insights",method="GET"'
+    assert f'graph_etl_requests_total{{{labels},status="200"}} 2' in lines
+    assert f'graph_etl_requests_total{{{labels},status="429"}} 1' in lines
+    assert f'graph_etl_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f'graph_etl_request_duration_seconds_count{{{labels}}} 3' in lines
+    assert f'graph_etl_bytes_received_total{{{labels}}} 300' in lines
+    assert f'graph_etl_retries_total{{{labels}}} 2' in lines
+    assert 'graph_etl_throttle_wait_seconds_total{use_case="ads_\\"insights\\""} 1.5' in lines
+    assert 'graph_etl_section_duration_seconds_count{category="stage",name="posts"} 1' in lines
+    assert "graph_etl_http_pool_size 4" in lines
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in lines
+               if line.startswith("graph_etl_request_duration_seconds_bucket")]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1 and buckets == sorted(buckets)
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from graph_etl.scheduler import TaskScheduler
+
+
+class Recorder:
+    """Task function factory that records when tasks start and finish, and how many run at once per group."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.running = {}
+        self.peak = {}
+
+    def task(self, name, group="", seconds=0.0, error=None):
+        def run():
+            with self.lock:
+                self.events.append(("start", name))
+                self.running[group] = self.running.get(group, 0) + 1
+                self.peak[group] = max(self.peak.get(group, 0), self.running[group])
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(("end", name))
+                self.running[group] -= 1
+            if error:
+                raise RuntimeError(error)
+        return run
+
+    def started(self):
+        return [name for event, name in self.events if event == "start"]
+
+
+def test_a_task_starts_only_after_its_dependencies_finished():
+    recorder = Recorder()
+    scheduler = TaskScheduler(max_workers=4)
+    scheduler.add("posts:2025-01", recorder.task("posts:2025-01", seconds=0.05))
+    scheduler.add("page_metrics:2025-01", recorder.task("page_metrics:2025-01", seconds=0.05))
+    scheduler.add("post_metrics:2025-01", recorder.task("post_metrics:2025-01"), deps=["posts:2025-01"])
+    scheduler.add("report", recorder.task("report"), deps=["post_metrics:2025-01", "page_metrics:2025-01"])
+
+    results = scheduler.run()
+
+    assert {name: result["status"] for name, result in results.items()} == dict.fromkeys(scheduler.graph(), "done")
+    events = recorder.events
+    assert events.index(("end", "posts:2025-01")) < events.index(("start", "post_metrics:2025-01"))
+    assert events.index(("end", "post_metrics:2025-01")) < events.index(("start", "report"))
+    assert events.index(("end", "page_metrics:2025-01")) < events.index(("start", "report"))
+    assert events.index(("start", "page_metrics:2025-01")) < events.index(("end", "posts:2025-01"))  # Independent
+
+
+def test_ready_tasks_are_started_round_robin_across_groups():
+    recorder = Recorder()
+    scheduler = TaskScheduler(max_workers=1)
+    for number in range(4):
+        scheduler.add(f"a/{number}", recorder.task(f"a/{number}", "a"), group="a")
+    for number in range(2):
+        scheduler.add(f"b/{number}", recorder.task(f"b/{number}", "b"), group="b")
+    scheduler.add("c/0", recorder.task("c/0", "c"), group="c")
+
+    scheduler.run()
+
+    assert recorder.started() == ["a/0", "b/0", "c/0", "a/1", "b/1", "a/2", "a/3"]
+
+
+def test_no_group_runs_more_than_its_share_of_workers():
+    recorder = Recorder()
+    scheduler = TaskScheduler(max_workers=4, max_per_group=2)
+    for number in range(6):
+        scheduler.add(f"a/{number}", recorder.task(f"a/{number}", "a", seconds=0.02), group="a")
+    for number in range(2):
+        scheduler.add(f"b/{number}", recorder.task(f"b/{number}", "b", seconds=0.02), group="b")
+
+    scheduler.run()
+
+    assert recorder.peak == {"a": 2, "b": 2}
+    assert set(recorder.started()[:4]) == {"a/0", "a/1", "b/0", "b/1"}
+
+
+def test_the_dependents_of_a_failed_task_are_skipped():
+    recorder = Recorder()
+    scheduler = TaskScheduler(max_workers=2)
+    scheduler.add("instagram", recorder.task("instagram", error="no account"))
+    scheduler.add("instagram_media_insights", recorder.task("instagram_media_insights"), deps=["instagram"])
+    scheduler.add("normalize", recorder.task("normalize"), deps=["instagram_media_insights"])
+    scheduler.add("posts", recorder.task("posts"))
+
+    results = scheduler.run()
+
+    assert {name: result["status"] for name, result in results.items()} == {
+        "instagram": "failed", "instagram_media_insights": "skipped", "normalize": "skipped", "posts": "done"}
+    assert results["instagram"]["error"] == "no account"
+    assert results["normalize"]["error"] == "dependency failed"
+    assert sorted(recorder.started()) == ["instagram", "posts"]
+
+
+def test_unknown_dependencies_and_cycles_are_rejected():
+    scheduler = TaskScheduler(max_workers=2)
+    scheduler.add("a", lambda: None, deps=["missing"])
+    with pytest.raises(ValueError, match="unknown tasks"):
+        scheduler.run()
+
+    scheduler = TaskScheduler(max_workers=2)
+    scheduler.add("a", lambda: None, deps=["b"])
+    scheduler.add("b", lambda: None, deps=["a"])
+    with pytest.raises(ValueError, match="Dependency cycle"):
+        scheduler.run()
+
+    with pytest.raises(ValueError, match="already registered"):
+        scheduler.add("a", lambda: None)
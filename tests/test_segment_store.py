@@ -0,0 +1,43 @@
+import json
+import os
+
+from extract.segment_store import INDEX_FILE, SEGMENTS_DIR, SegmentStore
+
+JANUARY = 1736000000.0  # 2025-01-04
+FEBRUARY = 1738700000.0  # 2025-02-04
+
+
+def partition_files(category_dir, month):
+    return sorted(os.listdir(category_dir / SEGMENTS_DIR / f"month={month}"))
+
+
+def test_compact_keeps_only_the_newest_record_of_each_key(tmp_path):
+    store = SegmentStore(categories=["facebook_post_metrics"], max_bytes=200)
+    category_dir = tmp_path / "facebook_post_metrics"
+    for version in range(3):
+        store.append(category_dir, "111.json", {"data": [version]}, written_at=JANUARY + version)
+    store.append(category_dir, "222.json", {"data": ["b"]}, written_at=JANUARY)
+
+    assert store.compact(category_dir) == {"files": 0, "dropped": 2}
+    assert store.lookup(category_dir, "111.json") == {"data": [2]}
+    assert store.lookup(category_dir, "222.json") == {"data": ["b"]}
+    index = (category_dir / SEGMENTS_DIR / "month=2025-01" / INDEX_FILE).read_text().splitlines()
+    assert sorted(line.split("\t")[0] for line in index) == ["111", "222"]
+    assert store.compact(category_dir)["dropped"] == 0
+
+
+def test_compact_rolls_entity_files_into_segments(tmp_path):
+    store = SegmentStore(categories=["ads_insights"])
+    category_dir = tmp_path / "ads_insights"
+    category_dir.mkdir()
+    (category_dir / "9_2025-01-01_to_2025-01-31.json").write_text(json.dumps({"data": [1]}))
+    (category_dir / "9_2025-02-01_to_2025-02-28.ndjson").write_text('{"spend": 2}\n')
+    os.utime(category_dir / "9_2025-02-01_to_2025-02-28.ndjson", (FEBRUARY, FEBRUARY))
+
+    assert store.compact(category_dir) == {"files": 2, "dropped": 0}
+    assert [entry.name for entry in category_dir.iterdir()] == [SEGMENTS_DIR]
+    assert store.lookup(category_dir, "9_2025-01-01_to_2025-01-31.json") == {"data": [1]}
+    assert store.lookup(category_dir, "9_2025-02-01_to_2025-02-28") == {"data": [{"spend": 2}]}
+    assert partition_files(category_dir, "2025-02") == [".lock", INDEX_FILE, "segment-00000.ndjson"]
+    assert {key for key, _, _ in store.records(category_dir)} == {
+        "9_2025-01-01_to_2025-01-31", "9_2025-02-01_to_2025-02-28"}
@@ -0,0 +1,68 @@
+import json
+
+from extract.stream_writer import NDJSONWriter, read_ndjson, write_json_from_ndjson
+from state.change_index import CHANGED, UNCHANGED, ChangeIndex, content_hash
+
+RECORDS = [  # Keys deliberately unsorted: output keeps the API's order
+    {"id": "1", "message": "line\nbreak", "nested": {"b": [1, 2.5, None], "a": {}}, "empty": []},
+    {"message": "café ☃", "id": "2", "count": 0},
+]
+
+
+def spool(path, records):
+    with NDJSONWriter(path) as writer:
+        writer.write_records(records)
+    return path
+
+
+def test_json_from_spool_matches_json_dump(tmp_path):
+    spool_path = spool(str(tmp_path / "posts.json.pages.ndjson"), RECORDS)
+    records, status = write_json_from_ndjson(spool_path, str(tmp_path / "posts.json"))
+
+    assert (tmp_path / "posts.json").read_text(encoding="utf-8") == json.dumps({"data": RECORDS}, indent=4)
+    assert (records, status) == (2, None)
+
+
+def test_json_from_spool_is_hashed_like_the_document(tmp_path):
+    changes = ChangeIndex(tmp_path)
+    spool_path = spool(str(tmp_path / "posts.pages.ndjson"), RECORDS)
+    write_json_from_ndjson(spool_path, str(tmp_path / "posts.json"), changes)
+
+    document = json.loads((tmp_path / "posts.json").read_text(encoding="utf-8"))
+    assert changes._hashes["posts.json"]["hash"] == content_hash(document)
+    assert write_json_from_ndjson(spool_path, str(tmp_path / "posts.json"), changes) == (2, UNCHANGED)
+
+    spool_path = spool(str(tmp_path / "posts.pages.ndjson"), RECORDS[:1])
+    assert write_json_from_ndjson(spool_path, str(tmp_path / "posts.json"), changes) == (1, CHANGED)
+
+
+def test_empty_spool_writes_nothing(tmp_path):
+    (tmp_path / "empty.ndjson").write_text("")
+    assert write_json_from_ndjson(str(tmp_path / "empty.ndjson"), str(tmp_path / "empty.json")) == (0, None)
+    assert not (tmp_path / "empty.json").exists()
+    assert not (tmp_path / "empty.json.part").exists()
+
+
+def test_ndjson_writer_keeps_the_previous_file_on_error(tmp_path):
+    path = str(tmp_path / "posts.ndjson")
+    spool(path, RECORDS)
+    try:
+        with NDJSONWriter(path) as writer:
+            writer.write_records(RECORDS[:1])
+            raise RuntimeError("fetch failed")
+    except RuntimeError:
+        pass
+
+    assert read_ndjson(path) == RECORDS
+
+
+def test_ndjson_keeps_key_order_but_hashes_canonically(tmp_path):
+    changes = ChangeIndex(tmp_path)
+    path = str(tmp_path / "posts.ndjson")
+    with NDJSONWriter(path, changes=changes) as writer:
+        writer.write_records(RECORDS)
+    assert [list(record) for record in read_ndjson(path)] == [list(record) for record in RECORDS]
+
+    with NDJSONWriter(path, changes=changes) as writer:
+        writer.write_records([dict(sorted(record.items())) for record in RECORDS])
+    assert writer.status == UNCHANGED
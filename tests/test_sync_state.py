@@ -0,0 +1,74 @@
+import json
+import threading
+from datetime import date, timedelta
+
+from state.sync_state import SyncStateStore, interval_key
+
+JANUARY = {"since": "2025-01-01", "until": "2025-01-31"}
+
+
+def store_with(tmp_path, intervals=None, entities=None, refresh_days=28):
+    path = tmp_path / "sync_state.json"
+    path.write_text(json.dumps({"intervals": intervals or {}, "entities": entities or {}}))
+    return SyncStateStore(path, refresh_days=refresh_days)
+
+
+def fetched(days_after_until, complete=True):
+    fetched_at = date(2025, 1, 31) + timedelta(days=days_after_until)
+    return {"page_metrics": {interval_key(JANUARY): {"complete": complete, "fetched_at": fetched_at.isoformat()}}}
+
+
+def test_an_interval_is_final_only_when_fetched_after_the_refresh_window(tmp_path):
+    assert store_with(tmp_path, fetched(29)).needs_interval("page_metrics", JANUARY) is False
+    assert store_with(tmp_path, fetched(28)).needs_interval("page_metrics", JANUARY) is True  # Last day of the window
+    assert store_with(tmp_path, fetched(0)).needs_interval("page_metrics", JANUARY) is True
+
+
+def test_refresh_days_sets_the_window(tmp_path):
+    assert store_with(tmp_path, fetched(8), refresh_days=7).needs_interval("page_metrics", JANUARY) is False
+    assert store_with(tmp_path, fetched(8), refresh_days=30).needs_interval("page_metrics", JANUARY) is True
+
+
+def test_incomplete_or_unknown_intervals_are_fetched(tmp_path):
+    assert store_with(tmp_path, fetched(100, complete=False)).needs_interval("page_metrics", JANUARY) is True
+    assert store_with(tmp_path, fetched(100)).needs_interval("post_metrics", JANUARY) is True
+    other_month = {"since": "2025-02-01", "until": "2025-02-28"}
+    assert store_with(tmp_path, fetched(100)).needs_interval("page_metrics", other_month) is True
+
+
+def test_an_entity_is_final_from_its_creation_date(tmp_path):
+    store = store_with(tmp_path, entities={"post_metrics": {"1": "2025-02-02", "2": "2025-03-01"}})
+    assert store.needs_entity("post_metrics", "1", "2025-01-01T12:00:00+0000") is False
+    assert store.needs_entity("post_metrics", "2", "2025-02-01T12:00:00+0000") is True
+    assert store.needs_entity("post_metrics", "3", "2024-01-01T12:00:00+0000") is True
+
+
+def test_marked_data_is_refetched_until_it_becomes_final(tmp_path):
+    store = SyncStateStore(tmp_path / "sync_state.json")
+    recent = {"since": (date.today() - timedelta(days=10)).isoformat(), "until": date.today().isoformat()}
+    store.mark_interval("page_metrics", JANUARY)
+    store.mark_interval("page_metrics", recent)
+    store.save()
+
+    reloaded = SyncStateStore(tmp_path / "sync_state.json")
+    assert reloaded.needs_interval("page_metrics", JANUARY) is False
+    assert reloaded.needs_interval("page_metrics", recent) is True
+
+
+def test_concurrent_saves_merge_instead_of_overwriting(tmp_path):
+    path = tmp_path / "sync_state.json"
+    stores = [SyncStateStore(path) for _ in range(8)]
+
+    def work(number, store):
+        for batch in range(10):
+            store.mark_entities("post_metrics", [f"{number}-{batch}-{item}" for item in range(5)])
+            store.save()
+
+    threads = [threading.Thread(target=work, args=(number, store)) for number, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    saved = json.loads(path.read_text())["entities"]["post_metrics"]
+    assert len(saved) == 8 * 10 * 5
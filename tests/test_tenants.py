@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from config.config import STATE_ROOT
+from config.tenants import load_tenants
+
+
+def write_manifest(tmp_path, entries):
+    manifest = tmp_path / "tenants.json"
+    manifest.write_text(json.dumps(entries))
+    return manifest
+
+
+def test_tenants_are_loaded_in_manifest_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("PAGE_B_TOKEN", "token-from-env")
+    manifest = write_manifest(tmp_path, [
+        {"name": "page_a", "page_id": 1000, "access_token": "literal-token", "output_path": str(tmp_path / "a"),
+         "state_dir": str(tmp_path / "state_a")},
+        {"name": "page_b", "ads_account": "9", "access_token_env": "PAGE_B_TOKEN"}
+    ])
+
+    page_a, page_b = load_tenants(manifest)
+
+    assert (page_a.name, page_a.page_id, page_a.ads_account, page_a.access_token) == ("page_a", "1000", "", "literal-token")
+    assert (page_a.output_path, page_a.state_dir) == (tmp_path / "a", tmp_path / "state_a")
+    assert page_a.cache_dir == tmp_path / "state_a" / "cache" / "http"
+    assert (page_b.name, page_b.page_id, page_b.ads_account, page_b.access_token) == ("page_b", "", "9", "token-from-env")
+    assert (page_b.output_path, page_b.state_dir) == (Path("/datalake/raw/graph/page_b"), STATE_ROOT / "page_b")
+
+
+@pytest.mark.parametrize("entries", [{"name": "page_a"}, "page_a", None])
+def test_a_manifest_must_be_a_list(tmp_path, entries):
+    with pytest.raises(ValueError, match="must be a JSON list"):
+        load_tenants(write_manifest(tmp_path, entries))
+
+
+@pytest.mark.parametrize("entry", [{"page_id": "1000"}, {"name": "", "page_id": "1000"}, {"name": None}])
+def test_every_tenant_needs_a_name(tmp_path, entry):
+    with pytest.raises(ValueError, match="without a name"):
+        load_tenants(write_manifest(tmp_path, [{"name": "page_a"}, entry]))
+
+
+def test_tenant_names_must_be_unique(tmp_path):
+    with pytest.raises(ValueError, match="must be unique"):
+        load_tenants(write_manifest(tmp_path, [{"name": "page_a"}, {"name": "page_b"}, {"name": "page_a"}]))
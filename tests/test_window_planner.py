@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from extract.api_client import GraphAPIError
+from utils.utils import split_date_range
+from utils.window_planner import bisect_window, fetch_window, plan_windows, slice_insights_values, window_days
+
+
+def month_interval(year, month):
+    """The interval `get_last_months_intervals` builds for a month: `since` is the day before it starts."""
+    first = date(year, month, 1)
+    return {"since": (first - timedelta(days=1)).isoformat(),
+            "until": (first + relativedelta(months=1) - timedelta(days=1)).isoformat(),
+            "start_date": first.isoformat()}
+
+
+def spans(windows):
+    return [(window["since"], window["until"], len(window["intervals"])) for window in windows]
+
+
+def too_large():
+    return GraphAPIError("too large", 400, {"message": "Please reduce the amount of data you're asking for"})
+
+
+def test_consecutive_months_merge_up_to_93_days():
+    months = [month_interval(2023, month) for month in range(6, 12)]
+
+    windows = plan_windows(list(reversed(months)), 93)
+
+    assert spans(windows) == [("2023-05-31", "2023-08-31", 3), ("2023-08-31", "2023-11-30", 3)]
+    assert all(window_days(window) <= 93 for window in windows)
+    assert [interval for window in windows for interval in window["intervals"]] == months
+
+
+def test_february_in_a_leap_year_makes_the_quarter_one_day_longer():
+    assert spans(plan_windows([month_interval(2023, month) for month in (1, 2, 3)], 90)) == [
+        ("2022-12-31", "2023-03-31", 3)]
+    assert spans(plan_windows([month_interval(2024, month) for month in (1, 2, 3)], 90)) == [
+        ("2023-12-31", "2024-02-29", 2), ("2024-02-29", "2024-03-31", 1)]
+
+
+def test_months_across_a_gap_or_a_year_end_are_planned_separately_or_merged():
+    assert spans(plan_windows([month_interval(2023, 12), month_interval(2024, 1)], 93)) == [
+        ("2023-11-30", "2024-01-31", 2)]
+    assert spans(plan_windows([month_interval(2024, 1), month_interval(2024, 3)], 93)) == [
+        ("2023-12-31", "2024-01-31", 1), ("2024-02-29", "2024-03-31", 1)]
+    assert spans(plan_windows([month_interval(2024, 1)], 20)) == [("2023-12-31", "2024-01-31", 1)]
+
+
+def test_bisection_with_exclusive_since_shares_the_middle_day():
+    earlier, later = bisect_window({"since": "2024-02-25", "until": "2024-03-02"}, exclusive_since=True)
+
+    assert (earlier["since"], earlier["until"], later["since"], later["until"]) == (
+        "2024-02-25", "2024-02-28", "2024-02-28", "2024-03-02")
+    assert bisect_window({"since": "2024-02-28", "until": "2024-02-29"}, exclusive_since=True) is None
+
+
+def test_bisection_without_exclusive_since_splits_the_days():
+    earlier, later = bisect_window({"since": "2024-02-26", "until": "2024-03-02"})
+
+    assert (earlier["since"], earlier["until"], later["since"], later["until"]) == (
+        "2024-02-26", "2024-02-28", "2024-02-29", "2024-03-02")
+    assert bisect_window({"since": "2024-02-29", "until": "2024-02-29"}) is None
+    assert bisect_window({"since": "2024-02-26", "until": "2024-03-02"}, min_days=4) is None
+
+
+def test_fetch_window_bisects_down_to_single_days():
+    fetched = []
+
+    def fetch(window):
+        if window_days(window) > 1:
+            raise too_large()
+        fetched.append(window["until"])
+        return [window["until"]]
+
+    rows = fetch_window(fetch, {"since": "2024-02-26", "until": "2024-03-02"}, exclusive_since=True)
+
+    assert rows == fetched == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01", "2024-03-02"]
+
+
+def test_fetch_window_gives_up_on_a_single_day_or_other_errors():
+    def rejected(window):
+        raise too_large()
+
+    with pytest.raises(GraphAPIError):
+        fetch_window(rejected, {"since": "2024-02-28", "until": "2024-02-29"}, exclusive_since=True)
+
+    calls = []
+
+    def failing(window):
+        calls.append(window)
+        raise GraphAPIError("invalid metric", 400, {"message": "Invalid metric"})
+
+    with pytest.raises(GraphAPIError):
+        fetch_window(failing, {"since": "2023-12-31", "until": "2024-03-31"}, exclusive_since=True)
+    assert len(calls) == 1
+
+
+def test_slicing_a_window_keeps_each_months_values_exactly_once():
+    months = [month_interval(2024, month) for month in (1, 2, 3)]
+    days = [date(2024, 1, 1) + timedelta(days=offset) for offset in range(91)]
+    values = [{"value": day.toordinal(), "end_time": f"{day.isoformat()}T08:00:00+0000"} for day in days]
+    # Two overlapping window halves return the shared day twice, split over two entries
+    entries = [{"name": "page_impressions", "period": "day", "values": values[:45]},
+               {"name": "page_impressions", "period": "day", "values": values[44:]},
+               {"name": "page_fans", "period": "lifetime", "values": values[:1]}]
+
+    sliced = [slice_insights_values(entries, interval) for interval in months]
+
+    assert [[entry["name"] for entry in month] for month in sliced] == [["page_impressions", "page_fans"]] * 3
+    impressions = [month[0]["values"] for month in sliced]
+    assert [len(month) for month in impressions] == [31, 29, 31]
+    assert [value for month in impressions for value in month] == values
+    assert [month[1]["values"] for month in sliced] == [values[:1], [], []]
+
+
+def test_split_date_range_covers_every_day_once():
+    windows = split_date_range("2024-01-01", "2024-03-31", 30)
+
+    assert [(window["since"], window["until"]) for window in windows] == [
+        ("2024-01-01", "2024-01-30"), ("2024-01-31", "2024-02-29"), ("2024-03-01", "2024-03-30"),
+        ("2024-03-31", "2024-03-31")]
+    assert split_date_range("2024-02-29", "2024-02-29", 30) == [{"since": "2024-02-29", "until": "2024-02-29"}]
+    assert split_date_range("2024-03-01", "2024-02-29", 30) == []
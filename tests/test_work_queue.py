@@ -0,0 +1,77 @@
+import pytest
+
+from state import work_queue
+from state.work_queue import WorkQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(work_queue.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=60, max_attempts=2)
+    queue.enqueue({"lists": [], "insights:1": ["lists"], "insights:2": ["lists"]})
+    return queue
+
+
+def test_units_wait_for_their_dependencies(queue):
+    assert queue.lease("a") == "lists"
+    assert queue.lease("b") is None
+    assert queue.ack("lists", "a", 1.0)
+    assert {queue.lease("b"), queue.lease("b")} == {"insights:1", "insights:2"}
+
+
+def test_expired_lease_goes_back_to_the_queue_and_the_old_owner_cannot_ack(queue, clock):
+    assert queue.lease("a") == "lists"
+    clock[0] += 61
+    assert queue.lease("b") == "lists"
+
+    assert not queue.ack("lists", "a", 1.0)
+    assert not queue.renew("lists", "a")
+    assert queue.results()["lists"]["status"] == "leased"
+    assert queue.ack("lists", "b", 2.0)
+    assert queue.results()["lists"] == {"status": "done", "seconds": 2.0, "error": None}
+
+
+def test_ack_after_another_worker_finished_keeps_its_result(queue, clock):
+    assert queue.lease("a") == "lists"
+    clock[0] += 61
+    assert queue.lease("b") == "lists"
+    assert queue.ack("lists", "b", 2.0)
+
+    assert not queue.ack("lists", "a", 5.0)
+    assert queue.results()["lists"]["seconds"] == 2.0
+
+
+def test_renewed_lease_does_not_expire(queue, clock):
+    assert queue.lease("a") == "lists"
+    clock[0] += 50
+    assert queue.renew("lists", "a")
+    clock[0] += 50
+    assert queue.lease("b") is None
+
+
+def test_failed_units_are_retried_then_failed_and_block_their_dependents(queue):
+    assert queue.lease("a") == "lists"
+    assert not queue.fail("lists", "a", 1.0, "boom")
+    assert queue.lease("a") == "lists"
+    assert queue.fail("lists", "a", 1.0, "boom")
+
+    assert queue.drained()
+    statuses = {name: result["status"] for name, result in queue.results().items()}
+    assert statuses == {"lists": "failed", "insights:1": "skipped", "insights:2": "skipped"}
+
+
+def test_enqueue_keeps_existing_state_and_meta_round_trips(queue):
+    assert queue.lease("a") == "lists"
+    assert queue.ack("lists", "a", 1.0)
+    queue.enqueue({"lists": []})
+    queue.set_meta("workers", 4)
+
+    assert queue.results()["lists"]["status"] == "done"
+    assert queue.get_meta("workers") == 4
+    assert queue.get_meta("missing") is None